@@ -0,0 +1,133 @@
+"""Per-request logging cost: direct handlers vs the queued pipeline, eager vs lazy payloads.
+
+Simulates the records a Bond state request emits (`Request for ...` plus the device state dump)
+and times how long the calling thread spends inside `logging`, which is what the event loop and
+the `to_thread` workers pay per request. Requests are spaced out like real traffic so the
+listener thread drains the queue between them; `--io-latency` adds a per-write delay to model a
+slow SD card or a blocked terminal.
+
+Usage:
+    python benchmarks/bench_logging.py [--requests N] [--io-latency SECONDS]
+"""
+
+import argparse
+import logging
+import logging.handlers
+import queue
+import sys
+import tempfile
+import time
+import typing as _t
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from mkhome.utils.logging_utils import DeferredQueueHandler, lazy
+
+
+class DeviceState(BaseModel):
+    device_id: str
+    power: bool | None = None
+    timer: int | None = None
+    speed: int | None = None
+    light: int | None = None
+    brightness: int | None = None
+    breeze: list[int] = Field(default_factory=list)
+
+
+STATE = DeviceState(device_id="ed114b082534cffc", power=True, speed=3, light=1, breeze=[0, 50, 50])
+
+
+class SlowStream:
+    def __init__(self, file: _t.TextIO, latency: float) -> None:
+        self.file = file
+        self.latency = latency
+
+    def write(self, data: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.file.write(data)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def build_handlers(log: _t.TextIO, terminal: _t.TextIO, latency: float) -> list[logging.Handler]:
+    formatter = logging.Formatter("%(levelname)s: %(message)s")
+    file_handler = logging.StreamHandler(SlowStream(log, latency))
+    console = logging.StreamHandler(SlowStream(terminal, latency))
+    for handler in (file_handler, console):
+        handler.setFormatter(formatter)
+    return [file_handler, console]
+
+
+def simulate_request(logger: logging.Logger, eager: bool) -> None:
+    logger.debug("Request for %s", "/v2/devices/ed114b082534cffc/state")
+    if eager:
+        logger.debug("Device state: %s", STATE.model_dump_json(indent=4))
+    else:
+        logger.debug("Device state: %s", lazy(STATE.model_dump_json, indent=4))
+    logger.info("Button %s: Toggling on office light", "140")
+
+
+def run(name: str, logger: logging.Logger, requests: int, eager: bool) -> float:
+    elapsed = 0.0
+    for _ in range(requests):
+        start = time.perf_counter()
+        simulate_request(logger, eager)
+        elapsed += time.perf_counter() - start
+        time.sleep(0.001)
+    per_request = elapsed / requests * 1e6
+    print(f"{name:<44} {per_request:>9.2f} us/request")
+    return per_request
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--io-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        open(Path(tmp, "application.log"), "w") as log,
+        open(Path(tmp, "console.log"), "w") as terminal,
+    ):
+        handlers = build_handlers(log, terminal, args.io_latency)
+
+        direct = logging.getLogger("bench.direct")
+        direct.propagate = False
+        for handler in handlers:
+            direct.addHandler(handler)
+
+        queued = logging.getLogger("bench.queued")
+        queued.propagate = False
+        q: queue.Queue[logging.LogRecord] = queue.Queue()
+        queued.addHandler(DeferredQueueHandler(q))
+        listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        listener.start()
+
+        print(f"Python {sys.version.split()[0]}, {args.requests} simulated requests, ", end="")
+        print(f"{args.io_latency * 1e6:.0f} us per write\n")
+        print("DEBUG enabled")
+        for logger in (direct, queued):
+            logger.setLevel(logging.DEBUG)
+        before = run("direct handlers, eager payload (before)", direct, args.requests, True)
+        run("direct handlers, lazy payload", direct, args.requests, False)
+        after = run("queued handlers, lazy payload (after)", queued, args.requests, False)
+        print(f"{'speedup':<44} {before / after:>9.2f}x\n")
+
+        print("DEBUG disabled (INFO)")
+        for logger in (direct, queued):
+            logger.setLevel(logging.INFO)
+        before = run("direct handlers, eager payload (before)", direct, args.requests, True)
+        after = run("queued handlers, lazy payload (after)", queued, args.requests, False)
+        print(f"{'speedup':<44} {before / after:>9.2f}x")
+
+        listener.stop()
+        for handler in handlers:
+            handler.close()
+
+
+if __name__ == "__main__":
+    main()
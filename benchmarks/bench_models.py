@@ -0,0 +1,149 @@
+"""Per-call CPU cost of validating bridge payloads and serializing route responses.
+
+Compares the full validation each call used to do with the fast paths: reusing the cached Bond
+model while the bridge reports the same resource hash, validating a Lutron device table with one
+prebuilt `TypeAdapter` call instead of one `model_validate` per device, and writing a route's
+response straight to JSON bytes instead of through FastAPI's validate, convert and encode steps.
+
+Usage:
+    python benchmarks/bench_models.py [--calls N] [--devices N]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import typing as _t
+
+
+def bond_payload(i: int) -> dict[str, _t.Any]:
+    return {
+        "name": f"Ceiling Fan {i}",
+        "type": "CF",
+        "location": "Master Bedroom",
+        "template": "A1",
+        "actions": ["TurnOn", "TurnOff", "SetSpeed", "IncreaseSpeed", "DecreaseSpeed", "SetBreeze"],
+        "_": "7fc1e84b",
+        "properties": {"_": "84cd8a43"},
+        "state": {"_": "ad9bcde4"},
+        "commands": {"_": "ad9bcde4"},
+        "device_id": f"ed114b08253{i:05}",
+    }
+
+
+def lutron_payload(i: int) -> dict[str, _t.Any]:
+    return {
+        "device_id": str(i),
+        "current_state": 100 if i % 2 else 0,
+        "fan_speed": None,
+        "tilt": None,
+        "zone": str(i),
+        "name": f"Kitchen_Light {i}",
+        "button_groups": None,
+        "occupancy_sensors": None,
+        "type": "WallDimmer",
+        "model": "PD-6WCL-XX",
+        "serial": 45678900 + i,
+        "device_name": f"Light {i}",
+        "area": "3",
+    }
+
+
+def timed(name: str, func: _t.Callable[[], _t.Any], calls: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    per_call = (time.perf_counter() - start) / calls * 1e6
+    print(f"{name:<52} {per_call:>9.2f} us/call")
+    return per_call
+
+
+def run_now[T](coroutine: _t.Coroutine[_t.Any, _t.Any, T]) -> T:
+    """Run a coroutine that never suspends, e.g. `serialize_response`, without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("The coroutine suspended")
+
+
+def compare(
+    title: str, calls: int, before: tuple[str, _t.Callable], after: tuple[str, _t.Callable]
+) -> None:
+    print(title)
+    slow = timed(f"{before[0]} (before)", before[1], calls)
+    fast = timed(f"{after[0]} (after)", after[1], calls)
+    print(f"{'speedup':<52} {slow / fast:>9.2f}x\n")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--devices", type=int, default=40)
+    args = parser.parse_args()
+
+    # Imported here because the Lutron bridge client is created on import and needs a loop
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from pydantic import TypeAdapter
+
+    from mkhome.bridges.bond import BondDevice, BondDeviceState
+    from mkhome.bridges.lutron import LutronDevice
+    from mkhome.utils.responses import adapter
+
+    print(f"Python {sys.version.split()[0]}, {args.calls} calls, {args.devices} Lutron devices\n")
+
+    data = bond_payload(0)
+    cached = ("7fc1e84b", BondDevice.model_validate(data))
+    compare(
+        "Bond device response",
+        args.calls,
+        ("model_validate", lambda: BondDevice.model_validate(data)),
+        ("hash unchanged, cached model", lambda: cached[1] if cached[0] == data["_"] else None),
+    )
+
+    state = {"power": 1, "speed": 3, "light": 1, "brightness": 50, "breeze": [0, 50, 50]}
+    state_data = {**state, "_": "ad9bcde4", "device_id": "ed114b0825300000"}
+
+    def validate_state() -> dict[str, _t.Any]:
+        return BondDeviceState.model_validate(state_data).model_dump(exclude={"device_id"})
+
+    cached_state = ("ad9bcde4", BondDeviceState.model_validate(state_data), validate_state())
+    compare(
+        "Bond state response",
+        args.calls,
+        ("model_validate + model_dump", validate_state),
+        ("hash unchanged, cached model", lambda: cached_state[2]),
+    )
+
+    table = [lutron_payload(i) for i in range(args.devices)]
+    devices = TypeAdapter(list[LutronDevice])
+    compare(
+        f"Lutron device table ({args.devices} devices)",
+        args.calls // 10,
+        ("model_validate per device", lambda: [LutronDevice.model_validate(d) for d in table]),
+        ("one TypeAdapter call", lambda: devices.validate_python(table)),
+    )
+
+    models = devices.validate_python(table)
+    field = create_model_field("Response_get_devices", list[LutronDevice], mode="serialization")
+
+    def fastapi_response() -> bytes:
+        content = run_now(serialize_response(field=field, response_content=models))
+        return json.dumps(content, separators=(",", ":")).encode()
+
+    def direct_response() -> bytes:
+        return adapter(list[LutronDevice]).dump_json(models)
+
+    compare(
+        f"GET /lutron/devices response ({args.devices} devices)",
+        args.calls // 10,
+        ("FastAPI validate, convert, encode", fastapi_response),
+        ("TypeAdapter.dump_json", direct_response),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
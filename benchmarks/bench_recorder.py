@@ -0,0 +1,79 @@
+"""Query latency of the recorder's analytics over a year of device state history.
+
+Fills a temporary recorder directory with transitions spread over a year, then times the
+aggregations behind `/app/analytics/on-time`, `/app/analytics/levels` and
+`/app/analytics/activity` once their full segments are cached, plus the cost of recording a
+transition.
+
+Usage:
+    python benchmarks/bench_recorder.py [--records N] [--devices N] [--calls N]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import typing as _t
+
+YEAR = 365 * 86400
+
+
+def timed(name: str, func: _t.Callable[[], _t.Any], calls: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    per_call = (time.perf_counter() - start) / calls * 1e3
+    print(f"{name:<40} {per_call:>9.3f} ms/call")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--devices", type=int, default=40)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    from mkhome import recorder
+
+    print(f"Python {sys.version.split()[0]}, {args.records} records, {args.devices} devices\n")
+    with tempfile.TemporaryDirectory(prefix="mkhome-bench-") as directory:
+        rec = recorder.Recorder(directory, segment_size=16384, retention=2 * YEAR)
+        recorder.RECORDER = rec
+        rng = random.Random(0)
+        until = time.time()
+        since = until - YEAR
+        values: dict[tuple[str, str], int] = {}
+        clock, real_time = [since], time.time
+        # The recorder stamps transitions with the current time
+        time.time = lambda: clock[0]
+        try:
+            start = time.perf_counter()
+            for i in range(args.records):
+                device = f"device{rng.randrange(args.devices)}"
+                field = rng.choice(("power", "speed"))
+                # Each transition changes the value, so every one is recorded
+                last = values.get((device, field), 0)
+                values[(device, field)] = 1 - last if field == "power" else last % 6 + 1
+                clock[0] = since + i * YEAR / args.records
+                rec.record("bond", device, {field: values[(device, field)]})
+            elapsed = (time.perf_counter() - start) / args.records * 1e6
+        finally:
+            time.time = real_time
+        print(f"{'record':<40} {elapsed:>9.2f} us/call")
+        print(f"{'segments':<40} {len(rec.segments()):>9}\n")
+
+        timed("on_time(power)", lambda: recorder.on_time("power", since, until), args.calls)
+        timed(
+            "time_at_value(speed)",
+            lambda: recorder.time_at_value("speed", since, until),
+            args.calls,
+        )
+        timed("activity", lambda: recorder.activity(since, until), args.calls)
+        rec.close()
+
+
+if __name__ == "__main__":
+    main()
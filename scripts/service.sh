@@ -1,2 +1 @@
-.venv/bin/python3 -m uvicorn mkhome:app --host 0.0.0.0 --port 8582 --log-config config/logging.yaml --log-level info
- 
\ No newline at end of file
+.venv/bin/python3 -m mkhome.supervisor --host 0.0.0.0 --port 8582
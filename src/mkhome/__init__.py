@@ -1,4 +1,14 @@
-from .__main__ import app
+import typing as _t
+
+
+def __getattr__(name: str) -> _t.Any:
+    # Build the application on first access so `mkhome.utils` can be imported (by benchmarks and
+    # tooling) without loading settings or connecting bridges.
+    if name == "app":
+        from .__main__ import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __all__ = ["app"]
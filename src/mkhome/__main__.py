@@ -5,12 +5,14 @@ import os
 
 from fastapi import FastAPI
 
-from mkhome import bridges, routes
+from mkhome import bridges, bus, deploy, leader, reconcile, recorder, routes, state
 from mkhome.settings import settings
+from mkhome.utils import executors, logging_utils, profiling
 import mkhome.events
 
 
 LOGGER = logging.getLogger(__name__)
+logging_utils.start_queue_listeners()
 
 
 ### Lifecycle
@@ -18,21 +20,33 @@ LOGGER = logging.getLogger(__name__)
 
 async def startup(_: FastAPI) -> None:
     LOGGER.debug("Running startup hooks")
+    await leader.startup()
+    await state.startup()
+    await bus.startup()
+    await recorder.startup()
     await asyncio.gather(
         bridges.bond.startup(),
         bridges.lutron.startup(),
     )
+    await reconcile.startup()
     await mkhome.events.startup()
+    await deploy.ready()
     LOGGER.debug("Startup hooks complete")
 
 
 async def shutdown(_: FastAPI) -> None:
     LOGGER.debug("Running shutdown hooks")
+    await leader.shutdown()
     await asyncio.gather(
         bridges.bond.shutdown(),
         bridges.lutron.shutdown(),
     )
+    await reconcile.shutdown()
     await mkhome.events.shutdown()
+    await bus.shutdown()
+    await recorder.shutdown()
+    await state.shutdown()
+    executors.shutdown()
     LOGGER.debug("Shutdown hooks complete")
 
 
@@ -57,6 +71,9 @@ app = FastAPI(
     version=settings.application_settings.version,
     lifespan=lifespan,
 )
+if settings.application_settings.profiling:
+    app.add_middleware(profiling.ProfilingMiddleware)
 app.include_router(routes.bond.ROUTER)
 app.include_router(routes.lutron.ROUTER)
-app.include_router(routes.app.ROUTER)
\ No newline at end of file
+app.include_router(routes.groups.ROUTER)
+app.include_router(routes.app.ROUTER)
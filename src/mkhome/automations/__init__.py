@@ -0,0 +1,7 @@
+from . import actions
+from . import bindings
+from . import rules
+from . import scheduler
+
+
+__all__ = ["actions", "bindings", "rules", "scheduler"]
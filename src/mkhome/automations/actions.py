@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import logging
+import typing as _t
+
+from filelock import FileLock, Timeout
+from pydantic import BaseModel, Field, field_validator
+
+from mkhome.bridges import bond, lutron
+from mkhome.utils.logging_utils import lazy
+
+
+LOGGER = logging.getLogger(__name__)
+
+type Action = _t.Callable[..., _t.Awaitable[_t.Any]]
+
+EVENT_LOCK = FileLock("mkhome.lock", thread_local=False)
+"""Paces Bond commands across workers: one automation at a time, with a pause after each"""
+_LOCAL_LOCK = asyncio.Lock()
+"""Queues this worker's automations, so one at a time contends for `EVENT_LOCK`"""
+LOCK_POLL_INTERVAL = 0.01
+
+
+@contextlib.asynccontextmanager
+async def event_lock() -> _t.AsyncIterator[None]:
+    """Hold `EVENT_LOCK` without blocking the event loop while another worker holds it.
+
+    Leader election only keeps button gestures on one worker, while rules react to Bond state
+    read by any worker, so pacing needs a lock shared by every worker.
+    """
+    async with _LOCAL_LOCK:
+        while True:
+            try:
+                EVENT_LOCK.acquire(blocking=False)
+                break
+            except Timeout:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            EVENT_LOCK.release()
+
+
+async def sleep(_: str, seconds: float) -> None:
+    await asyncio.sleep(seconds)
+
+
+ACTIONS: dict[str, Action] = {
+    "power_on": bond.power_on,
+    "power_off": bond.power_off,
+    "toggle_power": bond.toggle_power,
+    "set_timer": bond.set_timer,
+    "set_speed": bond.set_speed,
+    "increase_speed": bond.increase_speed,
+    "decrease_speed": bond.decrease_speed,
+    "breeze_on": bond.breeze_on,
+    "breeze_off": bond.breeze_off,
+    "set_breeze": bond.set_breeze,
+    "set_direction": bond.set_direction,
+    "toggle_direction": bond.toggle_direction,
+    "light_on": bond.light_on,
+    "light_off": bond.light_off,
+    "toggle_light": bond.toggle_light,
+    "set_light_belief_state": bond.set_light_belief_state,
+    "toggle_light_belief_state": bond.toggle_light_belief_state,
+    "set_brightness": bond.set_brightness,
+    "increase_brightness": bond.increase_brightness,
+    "decrease_brightness": bond.decrease_brightness,
+    "dim_mode": bond.dim_mode,
+    "lutron_on": lutron.turn_on_device,
+    "lutron_off": lutron.turn_off_device,
+    "lutron_set_level": lutron.set_level,
+    "lutron_tap": lutron.tap_button,
+    "sleep": sleep,
+}
+"""Actions an automation can run, by name. Each takes the device ID and keyword arguments.
+Actions starting with `lutron_` take a Lutron device (or button) ID, the others a Bond device."""
+
+
+### Devices
+
+
+_DEVICE_IDS: dict[str, str] = {}
+
+
+async def resolve_device(device: str) -> str:
+    """Get the ID of a Bond device from its ID or name. Names are looked up once and cached.
+
+    Raises:
+        RuntimeError: If no device has that ID or name
+    """
+    device_id = _DEVICE_IDS.get(device)
+    if device_id is not None:
+        return device_id
+    device_ids = await bond.get_devices()
+    if device in device_ids:
+        device_id = device
+    else:
+        for candidate in device_ids:
+            info = await bond.get_device(candidate)
+            if info.name == device:
+                LOGGER.debug("Device information: %s", lazy(info.model_dump_json, indent=4))
+                device_id = candidate
+                break
+        else:
+            raise RuntimeError(f"Bond device '{device}' not found")
+    _DEVICE_IDS[device] = device_id
+    return device_id
+
+
+def forget_devices() -> None:
+    """Look device names up again, e.g. after a device was renamed."""
+    _DEVICE_IDS.clear()
+
+
+async def resolve_args(device_id: str, args: _t.Mapping[str, _t.Any]) -> dict[str, _t.Any]:
+    """Replace `$property` argument values with the device's Bond properties, e.g. `$max_speed`."""
+    if not any(isinstance(v, str) and v.startswith("$") for v in args.values()):
+        return dict(args)
+    props = await bond.get_properties(device_id)
+    return {
+        k: getattr(props, v[1:]) if isinstance(v, str) and v.startswith("$") else v
+        for k, v in args.items()
+    }
+
+
+### Steps
+
+
+class Step(BaseModel):
+    action: str
+    """A name from `ACTIONS`"""
+    args: dict[str, _t.Any] = Field(default_factory=dict)
+    """Keyword arguments for the action. `$name` values are read from the device's properties."""
+
+    @field_validator("action")
+    @classmethod
+    def validate_action(cls, v: str) -> str:
+        if v not in ACTIONS:
+            raise ValueError(f"Unknown action '{v}'")
+        return v
+
+
+def parse_steps(v: _t.Any) -> _t.Any:
+    """Allow a single step as `action` or `{action: ..., args: ...}` where a list is expected."""
+    if isinstance(v, str):
+        v = {"action": v}
+    return v if isinstance(v, list) else [v]
+
+
+async def run(device: str, steps: _t.Iterable[Step], pause: float = 0.0) -> None:
+    """Run steps against a device, then pause, holding `EVENT_LOCK` throughout."""
+    async with event_lock():
+        for step in steps:
+            if step.action.startswith("lutron_"):
+                await ACTIONS[step.action](device, **step.args)
+                continue
+            device_id = await resolve_device(device)
+            args = await resolve_args(device_id, step.args)
+            await ACTIONS[step.action](device_id, **args)
+        await asyncio.sleep(pause)
@@ -0,0 +1,191 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing as _t
+
+import yaml
+from pydantic import BaseModel, Field, field_validator
+
+from mkhome.automations import actions
+from mkhome.bridges import lutron
+from mkhome.bus import BUS, ButtonGesture
+from mkhome.settings import settings
+from mkhome.utils import admission, dedup, files
+
+
+LOGGER = logging.getLogger(__name__)
+BINDING = "bindings"
+"""The name the button gestures for bindings are published under"""
+
+Gesture = lutron.ButtonAction | _t.Literal["UNDO"]
+
+
+### Configuration
+
+
+class Binding(BaseModel):
+    name: str
+    buttons: list[str]
+    device: str
+    """The Bond device ID or name the actions are sent to"""
+    gestures: dict[Gesture, list[actions.Step]]
+    speculate: lutron.Speculation = "none"
+    pause: float | None = None
+    """Seconds to wait after the actions before the next binding runs. Defaults to the file's."""
+
+    @field_validator("buttons", mode="before")
+    @classmethod
+    def parse_buttons(cls, v: _t.Any) -> _t.Any:
+        return [str(button) for button in v] if isinstance(v, list) else v
+
+    @field_validator("gestures", mode="before")
+    @classmethod
+    def parse_gestures(cls, v: _t.Any) -> _t.Any:
+        # Allow `GESTURE: action` and `GESTURE: {action: ..., args: ...}` for a single step
+        if not isinstance(v, dict):
+            return v
+        return {gesture: actions.parse_steps(steps) for gesture, steps in v.items()}
+
+
+class BindingsFile(BaseModel):
+    pause: float = 2.0
+    bindings: list[Binding] = Field(default_factory=list)
+
+
+### Dispatch Table
+
+
+class Dispatch(_t.NamedTuple):
+    binding: str
+    device: str
+    steps: tuple[actions.Step, ...]
+    pause: float
+
+
+class DispatchTable(_t.NamedTuple):
+    entries: dict[tuple[str, str], Dispatch]
+    """What to run, by button ID and gesture"""
+    speculation: dict[str, lutron.Speculation]
+    """The speculation policy of every bound button"""
+    loaded: float
+    """The `time.time()` the table was compiled"""
+
+
+TABLE = DispatchTable({}, {}, 0.0)
+
+
+def compile_bindings(config: BindingsFile) -> DispatchTable:
+    """Flatten bindings into a lookup by button and gesture.
+
+    Raises:
+        ValueError: If two bindings claim the same gesture of a button, give a button
+            different speculation policies, or compensate without an `UNDO` gesture
+    """
+    entries: dict[tuple[str, str], Dispatch] = {}
+    speculation: dict[str, lutron.Speculation] = {}
+    for binding in config.bindings:
+        if binding.speculate == "compensate" and "UNDO" not in binding.gestures:
+            raise ValueError(f"Binding '{binding.name}' compensates without an UNDO gesture")
+        pause = config.pause if binding.pause is None else binding.pause
+        for button_id in binding.buttons:
+            if speculation.setdefault(button_id, binding.speculate) != binding.speculate:
+                raise ValueError(f"Button {button_id} has conflicting speculation policies")
+            for gesture, steps in binding.gestures.items():
+                if (button_id, gesture) in entries:
+                    other = entries[(button_id, gesture)].binding
+                    raise ValueError(
+                        f"Button {button_id} {gesture} is bound by '{other}' and '{binding.name}'"
+                    )
+                entries[(button_id, gesture)] = Dispatch(
+                    binding.name, binding.device, tuple(steps), pause
+                )
+    return DispatchTable(entries, speculation, time.time())
+
+
+def load_bindings(path: str) -> BindingsFile:
+    with open(path) as f:
+        return BindingsFile.model_validate(yaml.safe_load(f) or {})
+
+
+def install(table: DispatchTable) -> None:
+    """Swap in a dispatch table and update the buttons' gesture recognizers to match it."""
+    global TABLE
+    previous, TABLE = TABLE, table
+    for button_id in previous.speculation.keys() - table.speculation.keys():
+        lutron.watch_button(button_id, BINDING, "none")
+    for button_id, speculate in table.speculation.items():
+        lutron.watch_button(button_id, BINDING, speculate)
+
+
+async def reload(path: str | None = None) -> dict[str, _t.Any]:
+    """Load, compile and install the bindings file. The old table stays if the file is invalid.
+
+    Raises:
+        ValidationError | ValueError: If the file is invalid
+        OSError: If the file cannot be read
+
+    Returns:
+        dict: The number of bindings and dispatch entries loaded
+    """
+    path = path or settings.application_settings.bindings_file
+    config = await asyncio.to_thread(load_bindings, path)
+    table = compile_bindings(config)
+    started = time.perf_counter()
+    install(table)
+    elapsed = time.perf_counter() - started
+    actions.forget_devices()
+    LOGGER.info(
+        "Loaded %s binding(s) with %s dispatch entries from %s in %.0f us",
+        len(config.bindings),
+        len(table.entries),
+        path,
+        elapsed * 1e6,
+    )
+    return {"bindings": len(config.bindings), "entries": len(table.entries), "path": path}
+
+
+### Dispatch
+
+
+async def dispatch(event: ButtonGesture) -> None:
+    entry = TABLE.entries.get((event.button_id, event.action))
+    if entry is None:
+        return
+    LOGGER.info("Button %s: %s %s", event.button_id, event.action, entry.binding)
+    with (
+        admission.priority(admission.Priority.BUTTON),
+        dedup.source(f"button:{event.button_id}"),
+    ):
+        await actions.run(entry.device, entry.steps, entry.pause)
+
+
+### Lifecycle
+
+
+_WATCH: asyncio.Task | None = None
+
+
+async def startup() -> None:
+    global _WATCH
+    LOGGER.debug("Running bindings startup hook")
+    BUS.subscribe(
+        BINDING, dispatch, ButtonGesture, predicate=lambda event: event.binding == BINDING
+    )
+    path = settings.application_settings.bindings_file
+    try:
+        await reload(path)
+    except Exception:
+        # Keep running with no bindings, so the rest of the server and a fixed file still work
+        LOGGER.exception("Failed to load bindings from %s", path)
+    interval = settings.application_settings.bindings_watch_interval
+    if interval > 0:
+        _WATCH = asyncio.create_task(files.watch(path, interval, reload))
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running bindings shutdown hook")
+    if _WATCH is not None:
+        _WATCH.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _WATCH
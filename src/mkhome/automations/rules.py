@@ -0,0 +1,350 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import operator
+import time
+import typing as _t
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from mkhome.automations import actions
+from mkhome.automations.actions import Step
+from mkhome.bridges import lutron
+from mkhome.bus import BUS, BondStateChanged, ButtonGesture, Event, ZoneLevelChanged
+from mkhome.history import HISTORY
+from mkhome.settings import settings
+from mkhome.state import STORE
+from mkhome.utils import admission, dedup, files, metrics
+
+
+LOGGER = logging.getLogger(__name__)
+BINDING = "rules"
+"""The name the button gestures for rules are published under"""
+
+SELF_TRIGGER_WINDOW = 10.0
+"""Seconds after a rule acted on a Bond device during which that device's state changes do not
+trigger it again"""
+EVALUATION_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+OPERATORS: dict[str, _t.Callable[[_t.Any, _t.Any], bool]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda a, b: a in b,
+}
+
+type TriggerKey = tuple[str, ...]
+type Check = _t.Callable[[datetime.datetime], bool]
+
+
+### Configuration
+
+
+class ButtonTrigger(BaseModel):
+    button: str
+    gesture: lutron.ButtonAction = "SINGLE_CLICK"
+
+    @field_validator("button", mode="before")
+    @classmethod
+    def parse_button(cls, v: _t.Any) -> _t.Any:
+        return str(v) if isinstance(v, int) else v
+
+
+class StateTrigger(BaseModel):
+    source: _t.Literal["bond", "lutron"]
+    device: str
+    """The device ID, or for Bond also the name"""
+
+
+class StateCondition(BaseModel):
+    source: _t.Literal["bond", "lutron"]
+    device: str
+    field: str
+    """A field of the device's state, e.g. `light` or `current_state`"""
+    op: _t.Literal["eq", "ne", "lt", "le", "gt", "ge", "in"] = "eq"
+    value: _t.Any = None
+    max_age: float | None = None
+    """Fail the condition if the state is older than this many seconds"""
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class TimeCondition(BaseModel):
+    after: datetime.time | None = None
+    before: datetime.time | None = None
+    """Wraps past midnight when earlier than `after`"""
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class WeekdayCondition(BaseModel):
+    weekdays: list[_t.Literal["mon", "tue", "wed", "thu", "fri", "sat", "sun"]]
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class Rule(BaseModel):
+    name: str
+    trigger: ButtonTrigger | StateTrigger
+    conditions: list[StateCondition | TimeCondition | WeekdayCondition] = Field(
+        default_factory=list
+    )
+    """All must hold for the rule to run"""
+    device: str
+    """The Bond device ID or name the actions are sent to"""
+    actions: list[Step]
+    priority: int = 0
+    """Rules with the same trigger are evaluated in ascending priority"""
+    pause: float = 0.0
+
+    @field_validator("actions", mode="before")
+    @classmethod
+    def parse_actions(cls, v: _t.Any) -> _t.Any:
+        return actions.parse_steps(v)
+
+
+class RulesFile(BaseModel):
+    rules: list[Rule] = Field(default_factory=list)
+
+
+### Decision Table
+
+
+class CompiledRule:
+    """A rule with its trigger key and its conditions compiled to closures, plus statistics."""
+
+    def __init__(self, rule: Rule, checks: list[Check], self_triggered: bool = False) -> None:
+        self.rule = rule
+        self.checks = checks
+        self.self_triggered = self_triggered
+        """Whether the rule acts on the Bond device whose state triggers it"""
+        self.acted = float("-inf")
+        """When the rule's actions last finished, infinite while they run"""
+        self.evaluations = 0
+        self.matches = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self._evaluated = metrics.counter("rule_evaluations_total", rule=rule.name)
+        self._matched = metrics.counter("rule_matches_total", rule=rule.name)
+        self._latency = metrics.histogram(
+            "rule_evaluation_seconds", EVALUATION_BUCKETS, rule=rule.name
+        )
+        self._suppressed = metrics.counter("rule_self_triggers_suppressed_total", rule=rule.name)
+
+    def evaluate(self, now: datetime.datetime) -> bool:
+        started = time.perf_counter_ns()
+        matched = all(check(now) for check in self.checks)
+        elapsed = time.perf_counter_ns() - started
+        self.evaluations += 1
+        self.matches += matched
+        self.total_ns += elapsed
+        self.max_ns = max(self.max_ns, elapsed)
+        self._evaluated.inc()
+        self._matched.inc(matched)
+        self._latency.observe(elapsed / 1e9)
+        return matched
+
+    def retriggered(self, event: Event) -> bool:
+        """Whether the event is likely the rule's own actions changing its trigger device."""
+        if not self.self_triggered or not isinstance(event, BondStateChanged):
+            return False
+        if time.monotonic() - self.acted >= SELF_TRIGGER_WINDOW:
+            return False
+        self._suppressed.inc()
+        return True
+
+    def stats(self) -> dict[str, _t.Any]:
+        return {
+            "name": self.rule.name,
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "mean_us": self.total_ns / self.evaluations / 1e3 if self.evaluations else None,
+            "max_us": self.max_ns / 1e3,
+        }
+
+
+TABLE: dict[TriggerKey, tuple[CompiledRule, ...]] = {}
+"""Rules by trigger key, in evaluation order"""
+
+
+async def resolve(source: str, device: str) -> str:
+    return await actions.resolve_device(device) if source == "bond" else device
+
+
+def state_check(condition: StateCondition, device_id: str) -> Check:
+    compare = OPERATORS[condition.op]
+    field, value, max_age = condition.field, condition.value, condition.max_age
+
+    def check(_: datetime.datetime) -> bool:
+        record = STORE.get(condition.source, device_id)
+        if record is None or field not in record.data:
+            return False
+        if max_age is not None and record.age > max_age:
+            return False
+        return compare(record.data[field], value)
+
+    return check
+
+
+def time_check(condition: TimeCondition) -> Check:
+    after, before = condition.after or datetime.time.min, condition.before or datetime.time.max
+    if after <= before:
+        return lambda now: after <= now.time() < before
+    return lambda now: now.time() >= after or now.time() < before
+
+
+def weekday_check(condition: WeekdayCondition) -> Check:
+    days = frozenset(WEEKDAYS.index(day) for day in condition.weekdays)
+    return lambda now: now.weekday() in days
+
+
+async def compile_rules(config: RulesFile) -> dict[TriggerKey, tuple[CompiledRule, ...]]:
+    """Index rules by trigger and compile their conditions.
+
+    Device names are resolved here, so evaluating the rules never calls a bridge.
+    """
+    table: dict[TriggerKey, list[CompiledRule]] = {}
+    for rule in config.rules:
+        checks: list[Check] = []
+        for condition in rule.conditions:
+            if isinstance(condition, StateCondition):
+                device_id = await resolve(condition.source, condition.device)
+                checks.append(state_check(condition, device_id))
+            elif isinstance(condition, TimeCondition):
+                checks.append(time_check(condition))
+            else:
+                checks.append(weekday_check(condition))
+        trigger = rule.trigger
+        self_triggered = False
+        if isinstance(trigger, ButtonTrigger):
+            key: TriggerKey = ("button", trigger.button, trigger.gesture)
+        else:
+            key = (trigger.source, await resolve(trigger.source, trigger.device))
+            # Only Bond steps resolve the device; Lutron steps take it as a zone ID
+            bond_steps = any(not step.action.startswith("lutron_") for step in rule.actions)
+            if trigger.source == "bond" and bond_steps:
+                self_triggered = await resolve("bond", rule.device) == key[1]
+        table.setdefault(key, []).append(CompiledRule(rule, checks, self_triggered))
+    return {
+        key: tuple(sorted(rules, key=lambda compiled: compiled.rule.priority))
+        for key, rules in table.items()
+    }
+
+
+def trigger_key(event: Event) -> TriggerKey | None:
+    match event:
+        case ButtonGesture():
+            return ("button", event.button_id, event.action)
+        case ZoneLevelChanged():
+            return ("lutron", event.device_id)
+        case BondStateChanged():
+            return ("bond", event.device_id)
+    return None
+
+
+def evaluate(event: Event, now: datetime.datetime | None = None) -> list[CompiledRule]:
+    """Get the rules an event triggers whose conditions hold. Never calls a bridge."""
+    key = trigger_key(event)
+    if key is None:
+        return []
+    now = now or datetime.datetime.now()
+    return [rule for rule in TABLE.get(key, ()) if rule.evaluate(now)]
+
+
+def stats() -> list[dict[str, _t.Any]]:
+    return [rule.stats() for rules in TABLE.values() for rule in rules]
+
+
+def load_rules(path: str) -> RulesFile:
+    with open(path) as f:
+        return RulesFile.model_validate(yaml.safe_load(f) or {})
+
+
+async def reload(path: str | None = None) -> dict[str, _t.Any]:
+    """Load, compile and install the rules file. The old rules stay if the file is invalid."""
+    global TABLE
+    path = path or settings.application_settings.rules_file
+    config = await asyncio.to_thread(load_rules, path)
+    table = await compile_rules(config)
+    for key in table:
+        if key[0] == "button":
+            lutron.watch_button(key[1], BINDING)
+    TABLE = table
+    LOGGER.info("Loaded %s rule(s) for %s trigger(s) from %s", len(config.rules), len(table), path)
+    return {"rules": len(config.rules), "triggers": len(table), "path": path}
+
+
+### Dispatch
+
+
+def accepts(event: Event) -> bool:
+    if isinstance(event, ButtonGesture):
+        return event.binding == BINDING
+    # Every worker sees state changes; only the one dispatching gestures acts on them
+    return lutron.GATE.active
+
+
+async def dispatch(event: Event) -> None:
+    # Rules a button press triggers are as interactive as bindings
+    pressed = isinstance(event, ButtonGesture)
+    level = admission.Priority.BUTTON if pressed else admission.Priority.SCENE
+    for compiled in evaluate(event):
+        rule = compiled.rule
+        if compiled.retriggered(event):
+            LOGGER.debug("Rule %s ignored its own change %r", rule.name, event)
+            continue
+        LOGGER.info("Rule %s matched %r", rule.name, event)
+        compiled.acted = float("inf")
+        try:
+            with (
+                HISTORY.timed("automation", BINDING, rule.device, rule.name),
+                admission.priority(level),
+                dedup.source(f"rule:{rule.name}"),
+            ):
+                await actions.run(rule.device, rule.actions, rule.pause)
+        finally:
+            compiled.acted = time.monotonic()
+
+
+### Lifecycle
+
+
+_WATCH: asyncio.Task | None = None
+
+
+async def startup() -> None:
+    global _WATCH
+    LOGGER.debug("Running rules startup hook")
+    BUS.subscribe(
+        BINDING,
+        dispatch,
+        ButtonGesture,
+        ZoneLevelChanged,
+        BondStateChanged,
+        policy="merge",
+        predicate=accepts,
+    )
+    path = settings.application_settings.rules_file
+    try:
+        await reload(path)
+    except FileNotFoundError:
+        LOGGER.info("No rules file at %s", path)
+    except Exception:
+        # Like a bad edit picked up by the watch, a bad file must not stop the application
+        LOGGER.exception("Failed to load rules from %s", path)
+    interval = settings.application_settings.bindings_watch_interval
+    if interval > 0:
+        _WATCH = asyncio.create_task(files.watch(path, interval, reload))
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running rules shutdown hook")
+    if _WATCH is not None:
+        _WATCH.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _WATCH
@@ -0,0 +1,362 @@
+import asyncio
+import contextlib
+import datetime
+import functools
+import heapq
+import itertools
+import logging
+import os
+import time
+import typing as _t
+import uuid
+
+from filelock import FileLock
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+
+from mkhome.automations import actions
+from mkhome.automations.actions import Step
+from mkhome.bridges import lutron
+from mkhome.history import HISTORY
+from mkhome.settings import settings
+from mkhome.utils import admission, dedup, files, metrics
+from mkhome.utils.schedules import CronExpression, sun_times
+
+
+LOGGER = logging.getLogger(__name__)
+JITTER_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+
+
+### Triggers
+
+
+class Once(BaseModel):
+    kind: _t.Literal["once"] = "once"
+    at: datetime.datetime
+    """Naive values are local time"""
+
+    def next_after(self, ts: float) -> float | None:
+        at = self.at.timestamp()
+        return at if at > ts else None
+
+
+class Interval(BaseModel):
+    kind: _t.Literal["interval"] = "interval"
+    every: float = Field(gt=0)
+    """Seconds between runs"""
+    start: datetime.datetime | None = None
+    """The first run. Defaults to one interval after the job is created."""
+
+    def next_after(self, ts: float, created: float = 0.0) -> float:
+        start = self.start.timestamp() if self.start else created + self.every
+        if ts < start:
+            return start
+        return start + ((ts - start) // self.every + 1) * self.every
+
+
+class Cron(BaseModel):
+    kind: _t.Literal["cron"] = "cron"
+    cron: str
+    """A five field cron expression in local time, e.g. `30 6 * * 1-5`"""
+
+    @field_validator("cron")
+    @classmethod
+    def validate_cron(cls, v: str) -> str:
+        CronExpression(v)
+        return v
+
+    def next_after(self, ts: float) -> float:
+        expression = _cron_expression(self.cron)
+        return expression.next_after(datetime.datetime.fromtimestamp(ts)).timestamp()
+
+
+@functools.lru_cache(maxsize=1024)
+def _cron_expression(expression: str) -> CronExpression:
+    return CronExpression(expression)
+
+
+class Solar(BaseModel):
+    kind: _t.Literal["solar"] = "solar"
+    event: _t.Literal["sunrise", "sunset"]
+    offset: float = 0.0
+    """Seconds after (or, if negative, before) the event"""
+
+    def next_after(self, ts: float) -> float | None:
+        latitude = settings.application_settings.latitude
+        longitude = settings.application_settings.longitude
+        if latitude is None or longitude is None:
+            raise ValueError("Solar schedules need the latitude and longitude settings")
+        today = datetime.datetime.fromtimestamp(ts).date()
+        for days in range(-1, 366):
+            day = today + datetime.timedelta(days=days)
+            sunrise, sunset = sun_times(day, latitude, longitude)
+            event = sunrise if self.event == "sunrise" else sunset
+            if event is not None and event.timestamp() + self.offset > ts:
+                return event.timestamp() + self.offset
+        return None
+
+
+type Trigger = Once | Interval | Cron | Solar
+
+
+### Jobs
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    name: str
+    trigger: Trigger = Field(discriminator="kind")
+    device: str
+    """The Bond device ID or name, or the Lutron ID for `lutron_` actions"""
+    actions: list[Step]
+    enabled: bool = True
+    catch_up: bool = True
+    """Run once on startup (or failover) if runs were missed, rather than wait for the next"""
+    misfire_grace: float = 3600.0
+    """Seconds late a run may start. Later runs are skipped."""
+    created: float = Field(default_factory=time.time)
+    last_run: float | None = None
+    """The scheduled time of the last run"""
+
+    @field_validator("actions", mode="before")
+    @classmethod
+    def parse_actions(cls, v: _t.Any) -> _t.Any:
+        return actions.parse_steps(v)
+
+    def next_after(self, ts: float) -> float | None:
+        if isinstance(self.trigger, Interval):
+            return self.trigger.next_after(ts, self.created)
+        return self.trigger.next_after(ts)
+
+    def first_due(self, now: float) -> float | None:
+        """The next run, or a missed run to catch up on."""
+        due = self.next_after(self.last_run or self.created)
+        if due is None or due > now:
+            return due
+        if self.catch_up and now - due <= self.misfire_grace:
+            return due
+        return self.next_after(now)
+
+
+_JOBS = TypeAdapter(dict[str, Job])
+
+
+class Scheduler:
+    """Runs timed jobs from a single min-heap with one task that sleeps until the next is due.
+
+    Job definitions and their last run are kept in a JSON file shared by the workers. Every worker
+    keeps the heap, but only the one dispatching button gestures runs jobs; the others wait for
+    it to record the run and take over a due run if it fails over first.
+
+    Args:
+        path (str): The file the jobs are persisted to
+        poll (float): Seconds a worker that is not dispatching waits before checking a due job again
+    """
+
+    def __init__(self, path: str, poll: float = 1.0) -> None:
+        self.path = path
+        self.poll = poll
+        self.jobs: dict[str, Job] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._due: dict[str, tuple[float, int]] = {}
+        self._seq = itertools.count()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+        self._unrecorded: dict[str, float] = {}
+        self._record_lock = asyncio.Lock()
+        self._jitter = metrics.histogram("scheduler_jitter_seconds", JITTER_BUCKETS)
+        self._size = metrics.gauge("scheduler_jobs")
+
+    ### Heap
+
+    def _push(self, job_id: str, due: float, check: float | None = None) -> None:
+        seq = next(self._seq)
+        self._due[job_id] = (due, seq)
+        heapq.heappush(self._heap, (check or due, seq, job_id))
+        if self._heap[0][1] == seq:
+            self._wake.set()
+
+    def _schedule(self, job: Job, now: float | None = None) -> None:
+        self._due.pop(job.id, None)
+        if not job.enabled:
+            return
+        due = job.first_due(now or time.time())
+        if due is not None:
+            self._push(job.id, due)
+
+    def next_due(self, job_id: str) -> float | None:
+        due = self._due.get(job_id)
+        return due[0] if due else None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            # Entries are never removed from the heap, they go stale when the job is rescheduled
+            while self._heap and self._due.get(self._heap[0][2], (0, -1))[1] != self._heap[0][1]:
+                heapq.heappop(self._heap)
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(delay):
+                        await self._wake.wait()
+                continue
+            _, _, job_id = heapq.heappop(self._heap)
+            due, _ = self._due.pop(job_id)
+            self._fire(self.jobs[job_id], due)
+
+    def _fire(self, job: Job, due: float) -> None:
+        now = time.time()
+        if not lutron.GATE.active:
+            # Check again shortly: the dispatching worker records the run, or this one takes over
+            if job.last_run is None or job.last_run < due:
+                self._push(job.id, due, now + self.poll)
+            else:
+                self._schedule(job, now)
+            return
+        if now - due > job.misfire_grace:
+            LOGGER.warning("Skipping run of job %s due %.0f s ago", job.name, now - due)
+            metrics.counter("scheduler_runs_total", outcome="misfired").inc()
+        else:
+            self._jitter.observe(now - due)
+            task = asyncio.create_task(self._execute(job, due))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        job.last_run = due
+        next_due = job.next_after(max(due, now))
+        if next_due is not None:
+            self._push(job.id, next_due)
+
+    async def _execute(self, job: Job, due: float) -> None:
+        LOGGER.info("Running job %s (late by %.3f s)", job.name, time.time() - due)
+        try:
+            await self._record_run(job.id, due)
+            with (
+                HISTORY.timed("automation", "scheduler", job.device, job.name),
+                admission.priority(admission.Priority.SCENE),
+                dedup.source(f"job:{job.name}"),
+            ):
+                await actions.run(job.device, job.actions)
+            metrics.counter("scheduler_runs_total", outcome="success").inc()
+        except Exception:
+            metrics.counter("scheduler_runs_total", outcome="failure").inc()
+            LOGGER.exception("Job %s failed", job.name)
+
+    async def _record_run(self, job_id: str, due: float) -> None:
+        """Persist a run before it starts. Runs recorded meanwhile are written together."""
+        self._unrecorded[job_id] = due
+        async with self._record_lock:
+            if not self._unrecorded:
+                return
+            runs, self._unrecorded = self._unrecorded, {}
+
+            def record(jobs: dict[str, Job]) -> None:
+                for run_id, run_due in runs.items():
+                    if run_id in jobs:
+                        jobs[run_id].last_run = max(run_due, jobs[run_id].last_run or run_due)
+
+            await self._update(record)
+
+    ### Persistence
+
+    def _read(self) -> dict[str, Job]:
+        try:
+            with open(self.path, "rb") as f:
+                return _JOBS.validate_json(f.read())
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, jobs: dict[str, Job]) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_JOBS.dump_json(jobs, indent=2))
+        os.replace(tmp, self.path)
+
+    def _modify(self, change: _t.Callable[[dict[str, Job]], _t.Any]) -> dict[str, Job]:
+        with self._file_lock:
+            jobs = self._read()
+            change(jobs)
+            self._write(jobs)
+        return jobs
+
+    async def _update(self, change: _t.Callable[[dict[str, Job]], _t.Any]) -> None:
+        """Apply a change to the persisted jobs and install the result."""
+        self.install(await asyncio.to_thread(self._modify, change))
+
+    def install(self, jobs: dict[str, Job]) -> None:
+        """Replace the jobs, rescheduling those whose definition or last run changed."""
+        previous, self.jobs = self.jobs, jobs
+        now = time.time()
+        for job_id in previous.keys() - jobs.keys():
+            self._due.pop(job_id, None)
+        for job_id, job in jobs.items():
+            old = previous.get(job_id)
+            # This worker may already have run a job whose run is not in the file yet
+            if old is not None and (old.last_run or 0) > (job.last_run or 0):
+                job.last_run = old.last_run
+            if old != job:
+                self._schedule(job, now)
+        self._size.set(len(jobs))
+
+    async def reload(self, _: str | None = None) -> None:
+        self.install(await asyncio.to_thread(self._read))
+
+    ### Jobs
+
+    async def add(self, job: Job) -> Job:
+        job.next_after(time.time())  # Fail early, e.g. on solar jobs without a location
+        await self._update(lambda jobs: jobs.__setitem__(job.id, job))
+        return self.jobs[job.id]
+
+    async def remove(self, job_id: str) -> bool:
+        removed = False
+
+        def remove(jobs: dict[str, Job]) -> None:
+            nonlocal removed
+            removed = jobs.pop(job_id, None) is not None
+
+        await self._update(remove)
+        return removed
+
+    ### Lifecycle
+
+    async def startup(self) -> None:
+        await self.reload()
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        for task in (self._task, *self._running):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._task = None
+
+
+SCHEDULER = Scheduler(
+    settings.application_settings.scheduler_file, settings.application_settings.leader_interval
+)
+
+
+### Lifecycle
+
+
+_WATCH: asyncio.Task | None = None
+
+
+async def startup() -> None:
+    global _WATCH
+    LOGGER.debug("Running scheduler startup hook")
+    await SCHEDULER.startup()
+    interval = settings.application_settings.bindings_watch_interval
+    if interval > 0:
+        _WATCH = asyncio.create_task(files.watch(SCHEDULER.path, interval, SCHEDULER.reload))
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running scheduler shutdown hook")
+    if _WATCH is not None:
+        _WATCH.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _WATCH
+    await SCHEDULER.shutdown()
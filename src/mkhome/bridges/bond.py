@@ -1,15 +1,21 @@
+import asyncio
+import contextvars
 import logging
+import time
 import typing as _t
 
 from fastapi import HTTPException
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
-from mkhome.utils import async_utils, requests
-from mkhome.settings import settings
+from mkhome.bus import BUS, BondCommandSent, BondStateChanged
+from mkhome.history import HISTORY
+from mkhome.utils import admission, async_utils, dedup, executors, health, requests, resilience
+from mkhome.utils.logging_utils import lazy
+from mkhome.settings import DEFAULT_BRIDGE, BondBridgeConfig, settings
+from mkhome.state import STORE
 
 
 LOGGER = logging.getLogger(__name__)
-BASE_URL = settings.bond_settings.bridge_url
 
 
 DEVICE_TYPE = _t.Literal[
@@ -29,21 +35,65 @@ DEVICE_SUB_TYPE = _t.Literal[
 
 DIRECTION = _t.Literal["FORWARD", "REVERSE"]
 
+# Actions that change a device relative to its state, each with the action that undoes it
+RELATIVE_ACTIONS = {
+    "TogglePower": "TogglePower",
+    "ToggleLight": "ToggleLight",
+    "ToggleDirection": "ToggleDirection",
+    "IncreaseSpeed": "DecreaseSpeed",
+    "DecreaseSpeed": "IncreaseSpeed",
+    "IncreaseBrightness": "DecreaseBrightness",
+    "DecreaseBrightness": "IncreaseBrightness",
+}
+# The device types an action applies to, for devices that do not list the actions they support
+_FAN_TYPES: frozenset[DEVICE_TYPE] = frozenset({"CF"})
+_LIGHT_TYPES: frozenset[DEVICE_TYPE] = frozenset({"CF", "FP", "LT", "GX"})
+ACTION_DEVICE_TYPES: dict[str, frozenset[DEVICE_TYPE]] = {
+    "SetSpeed": _FAN_TYPES,
+    "IncreaseSpeed": _FAN_TYPES,
+    "DecreaseSpeed": _FAN_TYPES,
+    "BreezeOn": _FAN_TYPES,
+    "BreezeOff": _FAN_TYPES,
+    "SetBreeze": _FAN_TYPES,
+    "SetDirection": _FAN_TYPES,
+    "ToggleDirection": _FAN_TYPES,
+    "TurnLightOn": _LIGHT_TYPES,
+    "TurnLightOff": _LIGHT_TYPES,
+    "ToggleLight": _LIGHT_TYPES,
+    "SetBrightness": _LIGHT_TYPES,
+    "IncreaseBrightness": _LIGHT_TYPES,
+    "DecreaseBrightness": _LIGHT_TYPES,
+}
+
 
 class BondBridgeAuth(requests.AuthBase):
-    def __init__(self, token_url: str) -> None:
+    def __init__(
+        self, token_url: str, token: str | None, guard: resilience.BridgeGuard, setting: str
+    ) -> None:
         self.token_url = token_url
-        self.token: str | None = "09b9a6def7b0acde"
+        self.token = token
+        self.guard = guard
+        self.setting = setting
+        """Where the token is configured, for the error raised when the bridge is locked"""
+
+    async def fetch_token(self) -> str:
+        """Read the token from the bridge, which only gives it out shortly after being powered on.
+
+        Raises:
+            HTTPException: A 502 if the bridge did not answer the request, or a 401 if it is locked
+        """
+        timeout = (self.guard.connect_timeout, self.guard.read_timeout)
+        res = await requests.get(self.token_url, timeout=timeout)
+        if not (200 <= res.status_code <= 299):
+            raise HTTPException(502, f"Could not read the Bond token: {res.text}")
+        data = res.json()
+        if not isinstance(data, dict) or "token" not in data:
+            raise HTTPException(401, f"The Bond Bridge is locked; set {self.setting}")
+        return data["token"]
 
     def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
         if self.token is None:
-            res = async_utils.run_sync(requests.get(self.token_url))
-            if not (200 <= res.status_code <= 299):
-                raise HTTPException(res.status_code, res.text)
-            data = res.json()
-            if "token" not in data:
-                raise HTTPException(res.status_code, data)
-            self.token = data["token"]
+            self.token = async_utils.run_sync(self.fetch_token())
         r.headers["BOND-Token"] = self.token  # type: ignore
         return r
 
@@ -71,6 +121,21 @@ class BondDevice(BaseModel):
         return None
 
 
+class Capabilities(_t.NamedTuple):
+    """What a device supports, as last read from the bridge."""
+
+    type: DEVICE_TYPE | None
+    actions: frozenset[str]
+    fetched: float
+    """The `time.monotonic()` value when the device was read"""
+
+    def supports(self, action: str) -> bool:
+        if self.actions:
+            return action in self.actions
+        types = ACTION_DEVICE_TYPES.get(action)
+        return types is None or self.type is None or self.type in types
+
+
 class BondDeviceState(BaseModel):
     device_id: str
     power: bool | None = None
@@ -91,40 +156,224 @@ class BondDeviceProperties(BaseModel):
     max_speed: int = 0
 
 
-def get_auth() -> requests.AuthBase:
-    """Get an authentication object for Bond Bridge API requests.
+### Bridges
 
-    Returns:
-        AuthBase: The generated authentication object
+
+class BondBridge:
+    """One Bond Bridge: its address and token, and the threads, admission control, command
+    deduplication and health monitoring of the calls made to it.
+
+    Args:
+        name (str): The name of the bridge in the settings
+        config (BondBridgeConfig): Its address and token
     """
-    LOGGER.debug("Generating bond bridge authentication")
-    return BondBridgeAuth(f"{BASE_URL}/v2/token")
+
+    def __init__(self, name: str, config: BondBridgeConfig) -> None:
+        options = settings.bond_settings
+        self.name = name
+        default = name == DEFAULT_BRIDGE
+        self.label = "bond" if default else f"bond:{name}"
+        """The name used in logs and metric labels"""
+        self.title = "Bond" if default else f"Bond {name}"
+        self.url = config.bridge_url
+        self.guard = resilience.BridgeGuard(self.label, **options.resilience.model_dump())
+        setting = (
+            "BOND_TOKEN or token under [tool.project.bond]"
+            if default
+            else f"token under [tool.project.bond.bridges.{name}]"
+        )
+        self.auth = BondBridgeAuth(f"{self.url}/v2/token", config.token, self.guard, setting)
+        self.io = executors.executor(self.label, **options.executor.model_dump())
+        self.admission = admission.controller(self.label, **options.admission.model_dump())
+        self.dedup = dedup.CommandDeduplicator(self.label, options.dedup_window, RELATIVE_ACTIONS)
+        self.health = health.HealthMonitor(
+            self.label,
+            self.probe,
+            min_interval=options.health.min_interval,
+            max_interval=options.health.max_interval,
+            degraded_rtt=options.health.degraded_rtt,
+            down_after=options.health.down_after,
+            timeouts=health.RttEstimator(
+                options.health.min_timeout, options.resilience.read_timeout
+            ),
+        )
+        if options.health.adaptive_timeout:
+            self.guard.rtt = self.health.rtt
+
+    def __str__(self) -> str:
+        return f"{self.title} Bridge"
+
+    async def send_request(
+        self, method: str, endpoint: str, *, idempotent: bool = False, **kwargs: _t.Any
+    ) -> requests.Response:
+        """Send a request to the bridge through its timeout, retry and circuit breaker policy.
+
+        The request first waits for a slot of the bridge's admission controller, at the priority
+        set by the caller or, for API traffic, as a read or a write depending on the method.
+
+        Args:
+            method (str): The HTTP method
+            endpoint (str): The API path, e.g. `/v2/devices`
+            idempotent (bool): Whether the request may be retried. Defaults to False.
+
+        Raises:
+            HTTPException: If the bridge returns a 5xx response, times out or is unavailable, or
+                if the bridge is too busy for a read
+
+        Returns:
+            Response: The bridge response (which may still be a 4xx)
+        """
+        if self.health.state == "down":
+            raise resilience.BridgeDownError(self.title, self.health.min_interval)
+        url = f"{self.url}{endpoint}"
+
+        async def send() -> requests.Response:
+            started = time.monotonic()
+            res = await requests.send(
+                self.io, method, url, auth=self.auth, timeout=self.guard.timeout, **kwargs
+            )
+            if res.status_code >= 500:
+                raise HTTPException(res.status_code, res.text)
+            # Actions wait for the radio transmission, so only reads measure the round trip
+            if method == "GET":
+                self.health.observe(time.monotonic() - started)
+            return res
+
+        try:
+            async with self.admission.slot(admission.classify(write=method != "GET")):
+                label = f"{method} {endpoint}"
+                return await self.guard.call(send, idempotent=idempotent, label=label)
+        except Exception as e:
+            if resilience.is_transient(e):
+                self.health.fail()
+            raise
+
+    async def check_token(self) -> None:
+        """Read the token now if none is configured, so a locked bridge fails startup.
+
+        Raises:
+            RuntimeError: If the bridge is locked and no token is configured
+        """
+        if self.auth.token is not None:
+            return
+        try:
+            self.auth.token = await self.auth.fetch_token()
+        except HTTPException as e:
+            if e.status_code == 401:
+                raise RuntimeError(f"{self} has no token: {e.detail}") from e
+            LOGGER.warning("Could not read the token of %s: %s", self, e.detail)
+        except Exception as e:
+            # Unreachable for now; the first request reads it instead
+            LOGGER.warning("Could not read the token of %s: %r", self, e)
+
+    async def probe(self) -> None:
+        """Ask the bridge for its firmware version, the cheapest call it answers."""
+        timeout = (self.guard.connect_timeout, self.guard.read_timeout)
+        res = await requests.send(self.io, "GET", f"{self.url}/v2/sys/version", timeout=timeout)
+        if not (200 <= res.status_code <= 299):
+            raise HTTPException(res.status_code, res.text)
+
+    async def list_devices(self) -> list[str]:
+        endpoint = "/v2/devices"
+        LOGGER.debug("Request for %s on %s", endpoint, self)
+        res = await self.send_request("GET", endpoint, idempotent=True)
+        if not (200 <= res.status_code <= 299):
+            raise HTTPException(res.status_code, res.text)
+        data = res.json()
+        if not isinstance(data, dict):
+            raise HTTPException(res.status_code, res.text)
+        return [k for k in data.keys() if not k.startswith("_")]
+
+
+BRIDGES = {
+    name: BondBridge(name, config) for name, config in settings.bond_settings.configs().items()
+}
+BRIDGE = BRIDGES[DEFAULT_BRIDGE]
+"""The bridge configured by the top-level Bond settings"""
 
 
 async def startup() -> None:
     LOGGER.debug("Running Bond Bridge startup hook")
+    await asyncio.gather(*(bridge.check_token() for bridge in BRIDGES.values()))
+    await asyncio.gather(*(bridge.health.startup() for bridge in BRIDGES.values()))
 
 
 async def shutdown() -> None:
     LOGGER.debug("Running Bond Bridge shutdown hook")
+    await asyncio.gather(*(bridge.health.shutdown() for bridge in BRIDGES.values()))
+    for task in list(_REFRESHES.values()):
+        task.cancel()
+
+
+### Routing
+
+
+ROUTES: dict[str, BondBridge] = {}
+"""The bridge each device is paired with, by device ID"""
+MISS_TTL = 5.0
+"""Seconds a device no bridge has is answered with a 404 before the bridges are listed again"""
+_MISSES: dict[str, float] = {}
+"""When each recently missed device ID may be looked up again, by `time.monotonic()`"""
+_DISCOVERY = asyncio.Lock()
+
+
+async def route(device_id: str) -> BondBridge:
+    """Get the bridge a device is paired with.
+
+    Known devices take a dictionary lookup. The first call for any other device lists the
+    devices of every bridge at once; with a single bridge there is nothing to look up. A device
+    no bridge has is not looked up again for `MISS_TTL` seconds, so repeated calls for it do not
+    list every bridge each time.
+
+    Raises:
+        HTTPException: A 404 if no bridge has the device
+    """
+    bridge = ROUTES.get(device_id)
+    if bridge is not None:
+        return bridge
+    if len(BRIDGES) == 1:
+        return BRIDGE
+    async with _DISCOVERY:
+        if device_id not in ROUTES and time.monotonic() >= _MISSES.get(device_id, 0.0):
+            await get_devices()
+            if device_id not in ROUTES:
+                now = time.monotonic()
+                for missed in [k for k, until in _MISSES.items() if until <= now]:
+                    del _MISSES[missed]
+                _MISSES[device_id] = now + MISS_TTL
+    bridge = ROUTES.get(device_id)
+    if bridge is None:
+        raise HTTPException(404, f"Bond device {device_id} not found")
+    return bridge
 
 
 async def get_devices() -> list[str]:
-    """Get all devices attached to Bond Bridge
+    """Get all devices attached to the Bond Bridges, recording which bridge each is paired with.
+
+    The bridges are listed concurrently. One that cannot be listed is left out, unless none can.
 
     Returns:
-        list[str]: A list of device IDs for the Bond Bridge
+        list[str]: A list of device IDs for the Bond Bridges
     """
-    endpoint = "/v2/devices"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s", endpoint)
-    res = await requests.get(url, auth=get_auth())
-    if not (200 <= res.status_code <= 299):
-        raise HTTPException(res.status_code, res.text)
-    data = res.json()
-    if not isinstance(data, dict):
-        raise HTTPException(res.status_code, res.text)
-    return [k for k in data.keys() if not k.startswith("_")]
+    bridges = list(BRIDGES.values())
+    results = await asyncio.gather(
+        *(bridge.list_devices() for bridge in bridges), return_exceptions=True
+    )
+    device_ids: list[str] = []
+    for bridge, result in zip(bridges, results):
+        if isinstance(result, BaseException):
+            if len(bridges) == 1 or all(isinstance(r, BaseException) for r in results):
+                raise result
+            LOGGER.warning("Could not list the devices of %s: %r", bridge, result)
+            continue
+        for device_id in result:
+            ROUTES[device_id] = bridge
+            _MISSES.pop(device_id, None)
+        device_ids.extend(result)
+    return device_ids
+
+
+### Devices
 
 
 async def get_device(device_id: str) -> BondDevice:
@@ -137,70 +386,294 @@ async def get_device(device_id: str) -> BondDevice:
         BondBridgeDevice: The data for the retrieved Bond Bridge device
     """
     endpoint = f"/v2/devices/{device_id}"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s", endpoint)
-    res = await requests.get(url, auth=get_auth())
+    bridge = await route(device_id)
+    LOGGER.debug("Request for %s on %s", endpoint, bridge)
+    res = await bridge.send_request("GET", endpoint, idempotent=True)
     if not (200 <= res.status_code <= 299):
         raise HTTPException(res.status_code, res.text)
     data = res.json()
     if not isinstance(data, dict):
         raise HTTPException(res.status_code, res.text)
-    return BondDevice.model_validate({**data, "device_id": device_id})
+    cached = _DEVICES.get(device_id)
+    if cached is not None and data.get("_") is not None and cached[0] == data["_"]:
+        device = cached[1]
+    else:
+        device = BondDevice.model_validate({**data, "device_id": device_id})
+        _DEVICES[device_id] = (data.get("_"), device)
+    _CAPABILITIES[device_id] = Capabilities(
+        device.type, frozenset(device.actions), time.monotonic()
+    )
+    return device
+
+
+# The bridge hashes each resource into its `_` field, so an unchanged hash means the cached
+# model is still valid and the response need not be validated again. Cached models are shared
+# and must not be modified.
+_DEVICES: dict[str, tuple[str | None, BondDevice]] = {}
+_STATES: dict[str, tuple[str | None, BondDeviceState, dict[str, _t.Any]]] = {}
+
+
+### Capabilities
+
+
+_CAPABILITIES: dict[str, Capabilities] = {}
+
+
+async def get_capabilities(device_id: str) -> Capabilities:
+    """Get what a device supports, reading the device from the bridge at most once per
+    `capabilities_ttl` seconds.
+
+    Raises:
+        HTTPException: If the device cannot be read, e.g. a 404 if it does not exist
+    """
+    capabilities = _CAPABILITIES.get(device_id)
+    ttl = settings.bond_settings.capabilities_ttl
+    if capabilities is None or time.monotonic() - capabilities.fetched > ttl:
+        await get_device(device_id)
+        capabilities = _CAPABILITIES[device_id]
+    return capabilities
+
+
+async def check_action(device_id: str, action: str) -> None:
+    """Reject an action the device does not support without sending it to the bridge.
+
+    Devices list the actions they support; for those that do not, the action must apply to the
+    device type (see `ACTION_DEVICE_TYPES`).
+
+    Args:
+        device_id (str): The ID of the device
+        action (str): The Bond action, e.g. `SetBreeze`
+
+    Raises:
+        HTTPException: A 400 if the device does not support the action
+    """
+    capabilities = await get_capabilities(device_id)
+    if not capabilities.supports(action):
+        kind = f"{capabilities.type} " if capabilities.type else ""
+        raise HTTPException(400, f"Bond {kind}device {device_id} does not support {action}")
+
+
+def forget_capabilities(device_id: str | None = None) -> None:
+    """Read a device's capabilities (or every device's) from the bridge again on next use."""
+    if device_id is None:
+        _CAPABILITIES.clear()
+    else:
+        _CAPABILITIES.pop(device_id, None)
+
+
+### State
+
+
+_STATE_FIELDS = frozenset(BondDeviceState.model_fields) - {"device_id"}
+
+
+def _update_state(args: _t.Mapping[str, _t.Any]) -> dict[str, _t.Any]:
+    return {k: v for k, v in args.items() if k in _STATE_FIELDS}
+
+
+EFFECTS: dict[str, _t.Callable[[_t.Mapping[str, _t.Any]], dict[str, _t.Any]]] = {
+    "TurnOn": lambda _: {"power": True},
+    "TurnOff": lambda _: {"power": False},
+    "SetSpeed": lambda args: {"power": True, "speed": args["argument"]},
+    "TurnLightOn": lambda _: {"light": 1},
+    "TurnLightOff": lambda _: {"light": 0},
+    "SetBrightness": lambda args: {"light": 1, "brightness": args["argument"]},
+    "SetBreeze": lambda args: {"breeze": [args["mode"], args["mean"], args["var"]]},
+    "UpdateState": _update_state,
+}
+"""The belief state an action leaves a device in, from the action's arguments"""
+RELATIVE_EFFECTS: dict[str, tuple[str, ...]] = {
+    "TogglePower": ("power",),
+    "ToggleLight": ("light",),
+    "IncreaseSpeed": ("power", "speed"),
+    "DecreaseSpeed": ("power", "speed"),
+    "IncreaseBrightness": ("light", "brightness"),
+    "DecreaseBrightness": ("light", "brightness"),
+    "DimMode": ("brightness",),
+    "BreezeOn": ("breeze",),
+    "BreezeOff": ("breeze",),
+    "SetTimer": ("power", "timer"),
+}
+"""The fields an action changes depending on their current value, which only a read tells"""
 
 
 async def get_state(device_id: str) -> BondDeviceState:
     endpoint = f"/v2/devices/{device_id}/state"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s", endpoint)
-    res = await requests.get(url, auth=get_auth())
+    bridge = await route(device_id)
+    LOGGER.debug("Request for %s on %s", endpoint, bridge)
+    res = await bridge.send_request("GET", endpoint, idempotent=True)
     if not (200 <= res.status_code <= 299):
         raise HTTPException(res.status_code, res.text)
     data = res.json()
     if not isinstance(data, dict):
         raise HTTPException(res.status_code, res.text)
-    state = BondDeviceState.model_validate({**data, "device_id": device_id})
-    LOGGER.debug("Device state: %s", state.model_dump_json(indent=4))
+    cached = _STATES.get(device_id)
+    if cached is not None and data.get("_") is not None and cached[0] == data["_"]:
+        _, state, values = cached
+    else:
+        state = BondDeviceState.model_validate({**data, "device_id": device_id})
+        values = state.model_dump(exclude={"device_id"})
+        _STATES[device_id] = (data.get("_"), state, values)
+    previous = STORE.get("bond", device_id)
+    record = STORE.update("bond", device_id, values)
+    if record is not previous:
+        BUS.publish(BondStateChanged(device_id=device_id, state=record.data))
+    LOGGER.debug("Device state: %s", lazy(state.model_dump_json, indent=4))
     return state
 
 
+def state_hash(device_id: str) -> str | None:
+    """Get the hash of a device's state as last read, which the bridge changes with the state."""
+    cached = _STATES.get(device_id)
+    return cached[0] if cached is not None else None
+
+
+_REFRESHES: dict[str, asyncio.Task] = {}
+_STALE: set[str] = set()
+
+
+def refresh_state(device_id: str) -> None:
+    """Read a device's state in the background, once for however many commands ask meanwhile."""
+    if device_id in _REFRESHES:
+        # Read again after the read in progress, which may predate the latest command
+        _STALE.add(device_id)
+        return
+    # A fresh context, so the read neither inherits the priority nor the deadline of the command
+    task = asyncio.create_task(_refresh(device_id), context=contextvars.Context())
+    _REFRESHES[device_id] = task
+
+
+async def _refresh(device_id: str) -> None:
+    try:
+        with admission.priority(admission.Priority.READ):
+            while True:
+                _STALE.discard(device_id)
+                try:
+                    await get_state(device_id)
+                except Exception as e:
+                    LOGGER.warning("Failed to refresh state of Bond device %s: %r", device_id, e)
+                    return
+                if device_id not in _STALE:
+                    return
+    finally:
+        _REFRESHES.pop(device_id, None)
+        _STALE.discard(device_id)
+
+
+def apply_effect(device_id: str, action: str, args: _t.Mapping[str, _t.Any]) -> None:
+    """Update the shared state of a device with what an accepted command did to it.
+
+    The bridge changes its belief state as soon as it accepts a command, so the effect of an
+    absolute command is applied without a read. Relative commands, and devices with no known
+    state yet, are read once in the background instead. Either way, requests long-polling the
+    device's state are woken by the change.
+    """
+    effect = EFFECTS.get(action)
+    previous = STORE.get("bond", device_id)
+    if effect is not None and previous is not None:
+        record = STORE.update("bond", device_id, effect(args))
+        if record is not previous:
+            BUS.publish(BondStateChanged(device_id=device_id, state=record.data))
+    elif effect is not None or action in RELATIVE_EFFECTS:
+        refresh_state(device_id)
+
+
 async def get_properties(device_id: str) -> BondDeviceProperties:
     endpoint = f"/v2/devices/{device_id}/properties"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s", endpoint)
-    res = await requests.get(url, auth=get_auth())
+    bridge = await route(device_id)
+    LOGGER.debug("Request for %s on %s", endpoint, bridge)
+    res = await bridge.send_request("GET", endpoint, idempotent=True)
     if not (200 <= res.status_code <= 299):
         raise HTTPException(res.status_code, res.text)
     data = res.json()
     if not isinstance(data, dict):
         raise HTTPException(res.status_code, res.text)
     props = BondDeviceProperties.model_validate({**data, "device_id": device_id})
-    LOGGER.debug("Device properties: %s", props.model_dump_json(indent=4))
+    LOGGER.debug("Device properties: %s", lazy(props.model_dump_json, indent=4))
     return props
 
 
 async def update_state(device_id: str, **payload) -> None:
     endpoint = f"/v2/devices/{device_id}/state"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s with payload %s", endpoint, payload)
-    res = await requests.patch(url, json=payload, auth=get_auth())
-    LOGGER.debug("[%s] %s", res.status_code, res.text)
-    if not (200 <= res.status_code <= 299):
-        raise HTTPException(res.status_code, res.text)
+    bridge = await route(device_id)
+    LOGGER.debug("Request for %s on %s with payload %s", endpoint, bridge, payload)
+    with HISTORY.timed("command", "bond", device_id, "UpdateState"):
+        res = await bridge.send_request("PATCH", endpoint, idempotent=True, json=payload)
+        LOGGER.debug("[%s] %s", res.status_code, res.text)
+        if not (200 <= res.status_code <= 299):
+            raise HTTPException(res.status_code, res.text)
+    # Correcting the belief state is deliberate, so the next action must not be deduplicated
+    bridge.dedup.forget(device_id)
+    BUS.publish(
+        BondCommandSent(
+            device_id=device_id,
+            action="UpdateState",
+            args=payload,
+            state_hash=state_hash(device_id),
+        )
+    )
+    apply_effect(device_id, "UpdateState", payload)
+
+
+async def execute_action(
+    device_id: str, action: str, *, dedup: bool = True, **payload: _t.Any
+) -> None:
+    """Execute an action on a Bond Bridge device, with its payload as keyword arguments.
+
+    See `send_action`.
+    """
+    await send_action(device_id, action, payload, dedup=dedup)
 
 
-async def execute_action(device_id: str, action: str, **payload: _t.Any) -> None:
-    endpoint = f"/v2/devices/{device_id}/actions/{action}"
-    url = f"{BASE_URL}{endpoint}"
-    LOGGER.debug("Request for %s with payload %s", endpoint, payload)
+async def send_action(
+    device_id: str, action: str, payload: _t.Mapping[str, _t.Any], *, dedup: bool = True
+) -> None:
+    """Execute an action on a Bond Bridge device.
 
-    res = await requests.put(url, json=payload, auth=get_auth())
-    try:
-        body = res.json()
-    except Exception:
-        body = res.text
-    LOGGER.debug("[%s] %s", res.status_code, body)
-    if not (200 <= res.status_code <= 299):
-        raise HTTPException(res.status_code, body)
+    The action is first checked against the device's capabilities (see `check_action`). Unless
+    `dedup` is False, an action another source sent to the device within `dedup_window` seconds
+    is dropped (see `BondBridge.dedup`).
+
+    Args:
+        device_id (str): The ID of the device
+        action (str): The Bond action, e.g. `ToggleLight`
+        payload (Mapping[str, Any]): The body sent to the bridge, e.g. `{"argument": 3}`
+        dedup (bool): Whether to suppress duplicates from other sources. Defaults to True.
+
+    Raises:
+        HTTPException: If the device does not support the action or the bridge rejects it
+    """
+    payload = dict(payload)
+    await check_action(device_id, action)
+    bridge = await route(device_id)
+    if dedup and not bridge.dedup.admit(device_id, action, payload):
+        HISTORY.record("command", "bond", device_id, action, "suppressed")
+        return
+    endpoint = f"/v2/devices/{device_id}/actions/{action}"
+    LOGGER.debug("Request for %s on %s with payload %s", endpoint, bridge, payload)
+
+    with HISTORY.timed("command", "bond", device_id, action):
+        try:
+            res = await bridge.send_request("PUT", endpoint, json=payload)
+        except BaseException:
+            bridge.dedup.forget(device_id)
+            raise
+        try:
+            body = res.json()
+        except Exception:
+            body = res.text
+        LOGGER.debug("[%s] %s", res.status_code, body)
+        if not (200 <= res.status_code <= 299):
+            bridge.dedup.forget(device_id)
+            # The device may have been reconfigured since its capabilities were read
+            forget_capabilities(device_id)
+            raise HTTPException(res.status_code, body)
+    BUS.publish(
+        BondCommandSent(
+            device_id=device_id, action=action, args=payload, state_hash=state_hash(device_id)
+        )
+    )
+    apply_effect(device_id, action, payload)
 
 
 async def power_on(device_id: str) -> None:
@@ -242,7 +715,7 @@ async def breeze_off(device_id: str) -> None:
     await execute_action(device_id, "BreezeOff")
 
 
-async def set_breeze(device_id: str, enabled: bool, mean: int, var: int) -> None:
+async def set_breeze(device_id: str, enabled: bool, mean: int = 50, var: int = 50) -> None:
     await execute_action(device_id, "SetBreeze", mode=int(enabled), mean=mean, var=var)
 
 
@@ -1,100 +1,379 @@
 import asyncio
+import contextlib
+import functools
+import inspect
 import logging
 import threading
 import time
 import typing as _t
+from collections import deque
 
 from fastapi import HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter
 from pylutron_caseta.smartbridge import Smartbridge
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception_type,
+    stop_after_attempt,
+    stop_never,
+    wait_random_exponential,
+)
 
-from mkhome.settings import settings
+from mkhome.bus import BUS, HANDLER_EXECUTOR, ButtonGesture, ZoneLevelChanged
+from mkhome.history import HISTORY
+from mkhome.settings import DEFAULT_BRIDGE, ButtonTimingSettings, LutronBridgeConfig, settings
+from mkhome.state import STORE
+from mkhome.utils import admission, dedup, executors, metrics, resilience
 
 
 LOGGER = logging.getLogger(__name__)
-BRIDGE = Smartbridge.create_tls(
-    settings.lutron_settings.bridge_ip,
-    settings.lutron_settings.client_key,
-    settings.lutron_settings.client_certificate,
-    settings.lutron_settings.bridge_certificate,
-)
 
 
 ButtonAction = _t.Literal["SINGLE_CLICK", "DOUBLE_CLICK", "LONG_PRESS"]
+Speculation = _t.Literal["none", "absorb", "supersede", "compensate"]
+"""How a button dispatches a single click before the double-click window has passed.
+
+- `none`: wait for the window, then dispatch either `SINGLE_CLICK` or `DOUBLE_CLICK`.
+- `absorb`: dispatch `SINGLE_CLICK` on release and ignore a second click. Safe when the
+  double-click does the same as the single click, e.g. a toggle bound to both.
+- `supersede`: dispatch `SINGLE_CLICK` on release and `DOUBLE_CLICK` if a second click follows.
+  Safe when the double-click sets an absolute state whatever the single click did, e.g. a single
+  click stepping a fan up and a double-click setting it to full speed.
+- `compensate`: like `supersede`, but an `undo` listener reverses the single click before the
+  double-click is dispatched. For single clicks that would otherwise leave a visible side effect.
+"""
 
 
 class LutronButtonListener(_t.Protocol):
     def __call__(self, button_id: str, action: ButtonAction, /) -> _t.Any: ...
 
 
+class LutronButtonUndo(_t.Protocol):
+    def __call__(self, button_id: str, /) -> _t.Any: ...
+
+
+def listener_name(listener: _t.Callable[..., _t.Any]) -> str:
+    name = getattr(listener, "__name__", None) or type(listener).__name__
+    return f"{getattr(listener, '__module__', None) or 'unknown'}.{name}"
+
+
+STAMP_TOLERANCE = 0.1
+"""Seconds apart two workers may see the start of the same gesture"""
+
+
+class GestureStamp(_t.NamedTuple):
+    """Identifies a gesture across workers, which each see a press a little later or earlier."""
+
+    binding: str
+    button_id: str
+    action: str
+    started: float
+    """The `time.time()` of the first press of the gesture"""
+
+    def matches(self, other: "GestureStamp") -> bool:
+        return self[:3] == other[:3] and abs(self.started - other.started) <= STAMP_TOLERANCE
+
+
+class DispatchGate:
+    """Decides whether this process acts on a button gesture, by the time the gesture started.
+
+    During a handoff between two workers both are subscribed to the bridge. The retiring worker
+    keeps dispatching gestures that started before the handoff time and the successor dispatches
+    the ones that started after it, so no press is lost or handled twice. Gestures a held gate
+    receives before it learns the handoff time are kept and replayed on release, except those
+    another worker already dispatched. For that, `acknowledge` records each gesture before it is
+    dispatched (see `mkhome.leader`).
+    """
+
+    def __init__(self, max_pending: int = 256) -> None:
+        self.after = float("-inf")
+        self.until = float("inf")
+        self.holding = False
+        self.acknowledge: _t.Callable[[GestureStamp], None] | None = None
+        self._pending: deque[tuple[GestureStamp, _t.Callable[[], _t.Any]]] = deque(
+            maxlen=max_pending
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether this process is currently the one dispatching new gestures."""
+        return not self.holding and self.until == float("inf")
+
+    def hold(self) -> None:
+        """Buffer gestures instead of dispatching them until `release` is called."""
+        with self._lock:
+            self.holding = True
+
+    def release(
+        self, after: float = float("-inf"), dispatched: _t.Iterable[GestureStamp] = ()
+    ) -> None:
+        """Dispatch buffered and future gestures that started after `after` (a `time.time()`).
+
+        Args:
+            after (float): Gestures up to this time were another worker's to handle
+            dispatched (Iterable[GestureStamp]): Gestures another worker dispatched after `after`
+        """
+        done: dict[tuple[str, ...], list[GestureStamp]] = {}
+        for stamp in dispatched:
+            done.setdefault(stamp[:3], []).append(stamp)
+        with self._lock:
+            self.after = after
+            self.holding = False
+            pending = [
+                (stamp, dispatch)
+                for stamp, dispatch in self._pending
+                if stamp.started > after
+                and not any(stamp.matches(other) for other in done.get(stamp[:3], ()))
+            ]
+            self._pending.clear()
+        LOGGER.info("Releasing button dispatch with %s held gesture(s)", len(pending))
+        for stamp, dispatch in pending:
+            self._dispatch(stamp, dispatch)
+
+    def retire(self, until: float) -> None:
+        """Stop dispatching gestures that start after `until` (a `time.time()`)."""
+        with self._lock:
+            self.until = until
+
+    def submit(self, stamp: GestureStamp, dispatch: _t.Callable[[], _t.Any]) -> bool:
+        """Dispatch a gesture now, hold it, or drop it.
+
+        Args:
+            stamp (GestureStamp): The gesture
+            dispatch (Callable): Publishes the gesture, without blocking
+
+        Returns:
+            bool: Whether `dispatch` was called
+        """
+        with self._lock:
+            if stamp.started <= self.after or stamp.started > self.until:
+                LOGGER.debug("Gesture at %s belongs to another worker", stamp.started)
+                return False
+            if self.holding:
+                self._pending.append((stamp, dispatch))
+                return False
+        self._dispatch(stamp, dispatch)
+        return True
+
+    def _dispatch(self, stamp: GestureStamp, dispatch: _t.Callable[[], _t.Any]) -> None:
+        # Recorded first: a worker dying in between loses the gesture rather than running it twice
+        if self.acknowledge is not None:
+            self.acknowledge(stamp)
+        dispatch()
+
+
+GATE = DispatchGate()
+
+GESTURE_BUCKETS = tuple(round(0.05 * i, 2) for i in range(1, 41))
+"""50 ms buckets up to 2 s, beyond the longest sensible gesture window"""
+RARE_DOUBLE_CLICKS = 0.02
+"""Share of presses following a release below which a button is treated as never double-clicked"""
+DEBOUNCE = 0.05
+"""Seconds within which a second press or release is the same event seen by another handler"""
+
+
+class ButtonTiming:
+    """Gesture durations for one button, optionally adapted to how the button is pressed.
+
+    Every press records how long it was held and how soon it followed the previous release, in
+    rolling histograms that favour recent presses. Once enough presses are seen, the double-click
+    window shrinks to cover `quantile` of the observed gaps (with `margin`), or to its minimum if
+    the button is almost never double-clicked, and the long press threshold shrinks to cover
+    `quantile` of the holds of presses released as clicks. Long presses are left out, otherwise a
+    button mostly clicked would pull the threshold down to its clicks. Neither duration ever
+    exceeds its configured value. Gaps up to the configured window are recorded even when they
+    missed the adapted one, so a user who starts double-clicking widens the window again. Every
+    handler of a button shares its timing (see `get_button_timing`) and records each press once.
+
+    Args:
+        button_id (str): The button, used for metric labels
+        config (ButtonTimingSettings): The configured durations and adaptation parameters
+    """
+
+    def __init__(self, button_id: str, config: ButtonTimingSettings) -> None:
+        self.config = config
+        self.gaps = metrics.rolling_histogram(
+            "button_gap_seconds", GESTURE_BUCKETS, config.halflife, button=button_id
+        )
+        self.holds = metrics.rolling_histogram(
+            "button_click_hold_seconds", GESTURE_BUCKETS, config.halflife, button=button_id
+        )
+        """How long clicks, as opposed to long presses, were held"""
+        self._double_click = metrics.gauge("button_double_click_seconds", button=button_id)
+        self._long_press = metrics.gauge("button_long_press_seconds", button=button_id)
+        self._last_press = float("-inf")
+        self._last_release = float("-inf")
+        self._lock = threading.Lock()
+        self.update()
+
+    def record_press(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_press < DEBOUNCE:
+                return
+            self._last_press = now
+            gap = now - self._last_release
+            if gap != float("inf"):
+                self.gaps.observe(gap if gap <= self.config.double_click_duration else float("inf"))
+
+    def record_release(self, now: float, pressed: float, long_press: bool = False) -> None:
+        """Record a release, and how long the button was held if the press was a click."""
+        with self._lock:
+            if now - self._last_release < DEBOUNCE:
+                return
+            self._last_release = now
+            if not long_press:
+                self.holds.observe(now - pressed)
+            self.update()
+
+    def update(self) -> None:
+        self.double_click_duration = self.config.double_click_duration
+        self.long_press_duration = self.config.long_press_duration
+        if self.config.adaptive and self.gaps.count >= self.config.min_samples:
+            doubles = self.gaps.count - self.gaps.counts[-1]
+            gap = self.gaps.quantile(self.config.quantile, bounded=True)
+            if doubles < RARE_DOUBLE_CLICKS * self.gaps.count or gap is None:
+                gap = 0.0
+            self.double_click_duration = min(
+                self.config.double_click_duration,
+                max(self.config.min_double_click_duration, gap * self.config.margin),
+            )
+        if self.config.adaptive and self.holds.count >= self.config.min_samples:
+            hold = self.holds.quantile(self.config.quantile) or float("inf")
+            self.long_press_duration = min(
+                self.config.long_press_duration,
+                max(self.config.min_long_press_duration, hold * self.config.margin),
+            )
+        self._double_click.set(self.double_click_duration)
+        self._long_press.set(self.long_press_duration)
+
+
+_TIMINGS: dict[str, ButtonTiming] = {}
+
+
+def get_button_timing(button_id: str) -> ButtonTiming:
+    """Get the gesture timing of a button, configured by `button_timing(_overrides)`."""
+    timing = _TIMINGS.get(button_id)
+    if timing is None:
+        lutron_settings = settings.lutron_settings
+        config = lutron_settings.button_timing_overrides.get(
+            button_id, lutron_settings.button_timing
+        )
+        timing = _TIMINGS.setdefault(button_id, ButtonTiming(button_id, config))
+    return timing
+
+
 @_t.final
 class LutronButtonHandler:
-    def __init__(self, button_id: str, listener: LutronButtonListener) -> None:
+    """Recognizes gestures from a button's presses and releases and publishes them on the bus.
+
+    Presses arrive on the event loop, so the gesture timers are event loop callbacks and
+    publishing never blocks. The listener bound to the gesture runs in its own bus subscription.
+
+    Args:
+        button_id (str): The button
+        binding (str): The name of the listener the gestures are for
+        speculate (Speculation): Whether to publish single clicks before the double-click window
+            closes. Defaults to "none".
+    """
+
+    def __init__(self, button_id: str, binding: str, speculate: Speculation = "none") -> None:
         self.button_id = button_id
-        self.listener = listener
-        self._long_press_duration = 1.0
-        self._double_click_duration = 0.5
-        self._long_press_task = None
-        self._double_click_task = None
-        self._click_time = 0
+        self.binding = binding
+        self.speculate = speculate
+        self.timing = get_button_timing(button_id)
+        self._long_press_duration = self.timing.long_press_duration
+        self._double_click_duration = self.timing.double_click_duration
+        self._long_press_task: asyncio.TimerHandle | None = None
+        self._double_click_task: asyncio.TimerHandle | None = None
+        self._click_time = 0.0
+        self._gesture_time = 0.0
         self._click_count = 0
-        self._lock = threading.Lock()
+        self._speculated = False
 
     def __str__(self) -> str:
-        if hasattr(self.listener, "__str__"):
-            name = str(self.listener)
-        if hasattr(self.listener, "__name__"):
-            name = self.listener.__name__  # type: ignore
-        elif hasattr(self.listener, "__class__") and hasattr(self.listener.__class__, "__name__"):
-            name = self.listener.__class__.__name__
-        else:
-            name = "UNKNOWN"
-        return f"ButtonHandler<{name}>"
+        return f"ButtonHandler<{self.binding}>"
 
     def button_down_handler(self):
-        with self._lock:
-            self._click_time = time.time()
-            self._click_count += 1
-            self._long_press_task = threading.Timer(
-                self._long_press_duration, self.long_press_handler
-            )
-            self._long_press_task.start()
+        self._click_time = time.time()
+        self.timing.record_press(self._click_time)
+        if self._click_count == 0:
+            self._gesture_time = self._click_time
+            self._long_press_duration = self.timing.long_press_duration
+            self._double_click_duration = self.timing.double_click_duration
+        self._click_count += 1
+        self._long_press_task = asyncio.get_running_loop().call_later(
+            self._long_press_duration, self.long_press_handler
+        )
 
     def button_up_handler(self):
-        with self._lock:
-            if self._click_count == 1:
-                self._double_click_timer = threading.Timer(
-                    self._double_click_duration, self.double_click_handler
-                )
-                self._double_click_timer.start()
+        # The long press timer is cleared once it fires
+        long_press = self._long_press_task is None
+        self.timing.record_release(time.time(), self._click_time, long_press)
+        if self._click_count == 1:
+            self._double_click_task = asyncio.get_running_loop().call_later(
+                self._double_click_duration, self.double_click_handler
+            )
+            if self.speculate != "none":
+                self._speculated = True
+                self.button_listener(self.button_id, "SINGLE_CLICK")
 
-            if self._long_press_task:
-                self._long_press_task.cancel()
-                self._long_press_task = None
+        if self._long_press_task:
+            self._long_press_task.cancel()
+            self._long_press_task = None
 
     def long_press_handler(self):
-        with self._lock:
-            if time.time() - self._click_time >= self._long_press_duration:
-                self.button_listener(self.button_id, "LONG_PRESS")
-                self._click_count = 0
-            self._long_press_task = None
+        if time.time() - self._click_time >= self._long_press_duration:
+            self.button_listener(self.button_id, "LONG_PRESS")
+            self._click_count = 0
+        self._long_press_task = None
 
     def double_click_handler(self):
-        with self._lock:
-            if self._click_count == 1:
-                self.button_listener(self.button_id, "SINGLE_CLICK")
-            elif self._click_count == 2:
-                self.button_listener(self.button_id, "DOUBLE_CLICK")
-            self._click_count = 0
-            self._double_click_timer = None
+        if self._speculated:
+            self.resolve_speculation()
+        elif self._click_count == 1:
+            self.button_listener(self.button_id, "SINGLE_CLICK")
+        elif self._click_count == 2:
+            self.button_listener(self.button_id, "DOUBLE_CLICK")
+        self._click_count = 0
+        self._speculated = False
+        self._double_click_task = None
+
+    def resolve_speculation(self) -> None:
+        """Follow up on a single click that was published before the double-click window closed.
 
-    def button_listener(self, button_id: str, action: ButtonAction) -> _t.Any:
+        The follow-ups are queued behind the single click in the listener's subscription, so they
+        never overtake it.
+        """
+        if self._click_count != 2:
+            outcome = "confirmed"
+        elif self.speculate == "absorb":
+            outcome = "absorbed"
+        else:
+            outcome = "superseded"
+            if self.speculate == "compensate":
+                outcome = "compensated"
+                self.button_listener(self.button_id, "UNDO")
+            self.button_listener(self.button_id, "DOUBLE_CLICK")
+        metrics.counter("button_speculations_total", outcome=outcome).inc()
+        LOGGER.debug("Speculative single click on %s %s", self.button_id, outcome)
+
+    def button_listener(self, button_id: str, action: ButtonAction | _t.Literal["UNDO"]) -> None:
         LOGGER.info("Button Event: <%s | %s>", button_id, action)
-        try:
-            return self.listener(button_id, action)
-        except BaseException:
-            LOGGER.exception("Exception occurred in listener %s", self)
-            return None
+        event = ButtonGesture(
+            button_id=button_id, action=action, started=self._gesture_time, binding=self.binding
+        )
+        stamp = GestureStamp(self.binding, button_id, action, self._gesture_time)
+        dispatched = GATE.submit(stamp, functools.partial(BUS.publish, event))
+        HISTORY.record(
+            "gesture",
+            "lutron",
+            button_id,
+            action,
+            "ok" if dispatched else "deferred",
+            time.time() - self._gesture_time,
+        )
 
     def __call__(self, state: str) -> None:
         match state:
@@ -105,7 +384,8 @@ class LutronButtonHandler:
 
 
 class LutronDevice(BaseModel):
-    device_id: int
+    device_id: int | str = Field(union_mode="left_to_right")
+    """The ID on the default bridge, or `<bridge>:<ID>` on another"""
     current_state: int | str
     fan_speed: _t.Any = None
     tilt: _t.Any = None
@@ -120,8 +400,19 @@ class LutronDevice(BaseModel):
     area: str | None = None
 
 
+class LutronDeviceState(BaseModel):
+    device_id: str
+    current_state: int | str | None = None
+    fan_speed: _t.Any = None
+    tilt: _t.Any = None
+
+
+STATE_FIELDS = ("current_state", "fan_speed", "tilt")
+"""The fields of a device that make up its state in the state store"""
+
+
 class LutronButton(BaseModel):
-    device_id: int
+    device_id: int | str = Field(union_mode="left_to_right")
     current_state: int | str
     button_number: str | int
     name: str | None = None
@@ -131,52 +422,371 @@ class LutronButton(BaseModel):
     parent_device: str | None = None
 
 
+DEVICE_REFS = ("device_id", "area")
+"""The fields of a device table entry holding IDs local to its bridge"""
+BUTTON_REFS = ("device_id", "parent_device")
+"""The fields of a button table entry holding IDs local to its bridge"""
+
+# Validating a whole table in one call avoids a round trip into pydantic-core per device
+_DEVICE_LIST = TypeAdapter(list[LutronDevice])
+_BUTTON_LIST = TypeAdapter(list[LutronButton])
+
+
+### Connection
+
+
+OUTAGE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+class ConnectionSupervisor:
+    """Watches a bridge connection and restores it, and everything subscribed to it, when lost.
+
+    The bridge client reconnects by itself after a dropped session. If it has not logged in
+    again within `grace` seconds (its monitor died, or the login failed on a live connection) the
+    connection is reset, retrying with jittered exponential backoff. Once logged in again the
+    device registry is refreshed and the button subscriptions are replayed.
+
+    Args:
+        bridge (LutronBridge): The bridge to supervise
+        interval (float): Seconds between checks of the connection
+        grace (float): Seconds to let the client reconnect by itself
+        max_wait (float): Upper bound of the backoff between reconnection attempts
+        login_timeout (float): Seconds a connection attempt may take
+    """
+
+    def __init__(
+        self,
+        bridge: "LutronBridge",
+        interval: float,
+        grace: float,
+        max_wait: float,
+        login_timeout: float,
+    ):
+        self.bridge = bridge
+        self.interval = interval
+        self.grace = grace
+        self.max_wait = max_wait
+        self.login_timeout = login_timeout
+        self.down_since: float | None = time.monotonic()
+        self.reconnects = 0
+        self.zones: set[str] = set()
+        self._task: asyncio.Task | None = None
+        self._connected = metrics.gauge("bridge_connected", bridge=bridge.label)
+        self._outages = metrics.histogram(
+            "bridge_outage_seconds", OUTAGE_BUCKETS, bridge=bridge.label
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self.down_since is None
+
+    def status(self) -> dict[str, _t.Any]:
+        down_for = time.monotonic() - self.down_since if self.down_since is not None else 0.0
+        return {"connected": self.connected, "down_for": down_for, "reconnects": self.reconnects}
+
+    def _before_sleep(self, retry_state: RetryCallState) -> None:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        LOGGER.warning(
+            "%s connection attempt %s failed: %r", self.bridge, retry_state.attempt_number, exc
+        )
+
+    async def _connect(self) -> None:
+        async with asyncio.timeout(self.login_timeout):
+            await self.bridge.client.connect()
+
+    async def connect(self, attempts: int | None = None) -> None:
+        """Reset the connection and log in, retrying until it succeeds or `attempts` run out."""
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(attempts) if attempts else stop_never,
+            wait=wait_random_exponential(multiplier=1.0, max=self.max_wait),
+            retry=retry_if_exception_type(Exception),
+            before_sleep=self._before_sleep,
+            reraise=True,
+        )
+        await retrying(self._connect)
+
+    def refresh(self) -> None:
+        """Subscribe to devices added since the last refresh, publish any state that changed
+        while disconnected and replay the button subscriptions."""
+        bridge = self.bridge
+        devices = bridge.client.get_devices()
+        for device_id in devices.keys() - self.zones:
+            publish = functools.partial(publish_device_state, bridge.qualify(device_id))
+            bridge.client.add_subscriber(device_id, publish)
+        if removed := self.zones - devices.keys():
+            LOGGER.warning("Lutron devices %s are no longer on %s", sorted(removed), bridge)
+        for device_id in devices:
+            publish_device_state(bridge.qualify(device_id), force=device_id not in self.zones)
+        self.zones = set(devices)
+        for button_id in BUTTONS:
+            owner, local_id = route(button_id)
+            if owner is bridge:
+                bridge.client.add_button_subscriber(
+                    local_id, functools.partial(on_button, button_id)
+                )
+
+    def _lost(self) -> None:
+        LOGGER.warning("%s connection lost", self.bridge)
+        self.down_since = time.monotonic()
+        self._connected.set(0)
+
+    def _recovered(self, by: str) -> None:
+        if self.down_since is not None:
+            outage = time.monotonic() - self.down_since
+            self._outages.observe(outage)
+            LOGGER.warning("%s connection restored after %.1f s", self.bridge, outage)
+        metrics.counter("bridge_reconnects_total", bridge=self.bridge.label, by=by).inc()
+        self.down_since = None
+        self.reconnects += 1
+        self._connected.set(1)
+        self.refresh()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if self.bridge.client.logged_in:
+                    if not self.connected:
+                        self._recovered("client")
+                elif self.connected:
+                    self._lost()
+                elif time.monotonic() - (self.down_since or 0.0) > self.grace:
+                    LOGGER.warning("%s did not reconnect by itself, resetting", self.bridge)
+                    await self.connect()
+                    self._recovered("supervisor")
+            except Exception:
+                LOGGER.exception("%s connection supervision failed", self.bridge)
+
+    async def startup(self) -> None:
+        try:
+            await self.connect(attempts=1)
+        except Exception:
+            LOGGER.exception("%s unavailable, connecting in the background", self.bridge)
+            self.down_since = time.monotonic()
+        else:
+            self.down_since = None
+            self._connected.set(1)
+            self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+### Bridges
+
+
+class LutronBridge:
+    """One Lutron bridge: its client connection and the threads, pacing and supervision of the
+    calls made to it.
+
+    Every bridge numbers its devices, buttons and areas from 1, so outside this module the IDs of
+    a bridge other than the default one are prefixed with its name, e.g. `upstairs:12`. The
+    prefix routes a call to its bridge without a lookup.
+
+    Args:
+        name (str): The name of the bridge in the settings
+        config (LutronBridgeConfig): Its address and credentials
+    """
+
+    def __init__(self, name: str, config: LutronBridgeConfig) -> None:
+        options = settings.lutron_settings
+        self.name = name
+        default = name == DEFAULT_BRIDGE
+        self.label = "lutron" if default else f"lutron:{name}"
+        """The name used in logs and metric labels"""
+        self.prefix = "" if default else f"{name}:"
+        self.title = "Lutron" if default else f"Lutron {name}"
+        self.client = Smartbridge.create_tls(
+            config.bridge_ip,
+            config.client_key,
+            config.client_certificate,
+            config.bridge_certificate,
+        )
+        self.guard = resilience.BridgeGuard(self.label, **options.resilience.model_dump())
+        self.io = executors.executor(self.label, **options.executor.model_dump())
+        self.admission = admission.controller(self.label, **options.admission.model_dump())
+        self.supervisor = ConnectionSupervisor(
+            self,
+            options.supervise_interval,
+            options.reconnect_grace,
+            options.reconnect_max_wait,
+            options.login_timeout,
+        )
+
+    def __str__(self) -> str:
+        return f"{self.title} bridge"
+
+    def qualify(self, local_id: _t.Any) -> str:
+        """Get the ID used outside this module for an ID on this bridge."""
+        return f"{self.prefix}{local_id}"
+
+    def qualify_entry(self, entry: dict[str, _t.Any], refs: tuple[str, ...]) -> dict[str, _t.Any]:
+        """Qualify the IDs in a copy of a device or button table entry."""
+        if not self.prefix:
+            return entry
+        return {**entry, **{k: self.qualify(entry[k]) for k in refs if entry.get(k) is not None}}
+
+
+BRIDGES = {
+    name: LutronBridge(name, config) for name, config in settings.lutron_settings.configs().items()
+}
+BRIDGE = BRIDGES[DEFAULT_BRIDGE]
+"""The bridge configured by the top-level Lutron settings"""
+
+
+def route(qualified_id: str) -> tuple[LutronBridge, str]:
+    """Get the bridge of a device, button or area and its ID on that bridge.
+
+    Raises:
+        HTTPException: A 404 if the ID is prefixed with an unknown bridge
+    """
+    name, _, local_id = str(qualified_id).rpartition(":")
+    bridge = BRIDGES.get(name or DEFAULT_BRIDGE)
+    if bridge is None:
+        raise HTTPException(404, f"Lutron bridge {name} not found")
+    return bridge, local_id
+
+
 ### Lifecycle
 
 
 async def startup() -> None:
     LOGGER.debug("Running Lutron startup hook")
-    await BRIDGE.connect()
+    await asyncio.gather(*(bridge.supervisor.startup() for bridge in BRIDGES.values()))
 
 
 async def shutdown() -> None:
     LOGGER.debug("Running Lutron shutdown hook")
-    await BRIDGE.close()
+    await asyncio.gather(*(bridge.supervisor.shutdown() for bridge in BRIDGES.values()))
+    await asyncio.gather(*(bridge.client.close() for bridge in BRIDGES.values()))
 
 
 ### Devices
 
 
+def publish_device_state(device_id: str, force: bool = False) -> None:
+    """Copy a device's level from the bridge into the shared state store and the event bus.
+
+    Every worker receives zone updates on its own connection, so only the one dispatching
+    events publishes them unless `force` is set.
+    """
+    if not (force or GATE.active):
+        return
+    bridge, local_id = route(device_id)
+    device = bridge.client.get_devices().get(local_id)
+    if device is not None:
+        previous = STORE.get("lutron", device_id)
+        record = STORE.update(
+            "lutron",
+            device_id,
+            {k: device.get(k) for k in STATE_FIELDS},
+        )
+        if record is not previous:
+            BUS.publish(ZoneLevelChanged(device_id=str(device_id), state=record.data))
+
+
+async def _read_table(
+    bridge: LutronBridge, table: str, refs: tuple[str, ...]
+) -> list[dict[str, _t.Any]]:
+    entries = await bridge.io.run(getattr(bridge.client, table))
+    return [bridge.qualify_entry(entry, refs) for entry in entries.values()]
+
+
+async def _read_tables(table: str, refs: tuple[str, ...]) -> list[dict[str, _t.Any]]:
+    """Read a table, e.g. `get_devices`, from every bridge concurrently, in bridge order."""
+    tables = await asyncio.gather(
+        *(_read_table(bridge, table, refs) for bridge in BRIDGES.values())
+    )
+    return [entry for table in tables for entry in table]
+
+
 async def get_devices() -> list[LutronDevice]:
-    devices = (await asyncio.to_thread(BRIDGE.get_devices)).values()
-    return [LutronDevice.model_validate(device) for device in devices]
+    devices = await _read_tables("get_devices", DEVICE_REFS)
+    return _DEVICE_LIST.validate_python(devices)
 
 
 async def get_device(device_id: str) -> LutronDevice:
+    bridge, local_id = route(device_id)
     try:
-        device = await asyncio.to_thread(BRIDGE.get_device_by_id, device_id)
-        return LutronDevice.model_validate(device)
+        device = await bridge.io.run(bridge.client.get_device_by_id, local_id)
+        return LutronDevice.model_validate(bridge.qualify_entry(device, DEVICE_REFS))
     except KeyError:
         raise HTTPException(404, f"Lutron device {device_id} not found")
 
 
+async def get_state(device_id: str) -> LutronDeviceState:
+    """Get a device's level from the client's copy of the device table, which the bridge keeps
+    up to date, and record it in the state store."""
+    device = await get_device(device_id)
+    values = device.model_dump(include=set(STATE_FIELDS))
+    STORE.update("lutron", device_id, values)
+    return LutronDeviceState.model_validate({**values, "device_id": device_id})
+
+
+def get_area_name(area_id: str) -> str | None:
+    """Get the name of an area (room) from the ID in `LutronDevice.area`."""
+    try:
+        bridge, local_id = route(area_id)
+    except HTTPException:
+        return None
+    area = bridge.client.areas.get(local_id)
+    return area["name"] if area else None
+
+
 ### Switches
 
 
+async def send_command(
+    bridge: LutronBridge, func: _t.Callable[[], _t.Awaitable[_t.Any]], label: str
+) -> None:
+    """Send a command once the bridge's admission controller has a slot for its priority.
+
+    Reads are served from the client's copy of the device tables, so only commands are admitted.
+    """
+    async with bridge.admission.slot(admission.classify(write=True)):
+        await bridge.guard.call(func, label=label)
+
+
+async def set_value(device_id: str, value: int) -> None:
+    bridge, local_id = route(device_id)
+    await send_command(bridge, lambda: bridge.client.set_value(local_id, value), "set_value")
+
+
 async def turn_on_device(device_id: str) -> None:
-    await BRIDGE.set_value(device_id, 100)
+    with HISTORY.timed("command", "lutron", device_id, "turn_on"):
+        await set_value(device_id, 100)
 
 
 async def turn_off_device(device_id: str) -> None:
-    await BRIDGE.set_value(device_id, 0)
+    with HISTORY.timed("command", "lutron", device_id, "turn_off"):
+        await set_value(device_id, 0)
+
+
+async def set_level(device_id: str, level: int) -> None:
+    with HISTORY.timed("command", "lutron", device_id, "set_level"):
+        await set_value(device_id, level)
+
+
+FAN_SPEED_LEVELS = (0, 25, 50, 75, 100)
+"""The levels of a fan controller's speeds: off, low, medium, medium-high and high"""
+
+
+def fan_level(speed: int) -> int:
+    """Get the level that sets a fan controller to a speed. Speeds above high are high."""
+    return FAN_SPEED_LEVELS[max(0, min(speed, len(FAN_SPEED_LEVELS) - 1))]
 
 
 ### Buttons
 
 
 async def get_buttons() -> list[LutronButton]:
-    buttons = (await asyncio.to_thread(BRIDGE.get_buttons)).values()
-    return [LutronButton.model_validate(button) for button in buttons]
+    buttons = await _read_tables("get_buttons", BUTTON_REFS)
+    return _BUTTON_LIST.validate_python(buttons)
 
 
 async def get_button(device_id: str) -> LutronButton:
@@ -187,8 +797,10 @@ async def get_button(device_id: str) -> LutronButton:
 
 
 async def tap_button(button_id: str) -> None:
+    bridge, local_id = route(button_id)
     try:
-        await BRIDGE.tap_button(button_id)
+        with HISTORY.timed("command", "lutron", button_id, "tap_button"):
+            await send_command(bridge, lambda: bridge.client.tap_button(local_id), "tap_button")
     except KeyError:
         raise HTTPException(404, f"Button {button_id} not found")
 
@@ -196,8 +808,89 @@ async def tap_button(button_id: str) -> None:
 ### Events
 
 
-def add_button_listener(*button_ids: str, listener: LutronButtonListener):
+def add_button_listener(
+    *button_ids: str,
+    listener: LutronButtonListener,
+    speculate: Speculation = "none",
+    undo: LutronButtonUndo | None = None,
+):
+    """Subscribe a listener to button gestures.
+
+    Each listener gets one bus subscription for all of its buttons, so its gestures are handled
+    in order and a slow listener only delays itself. Coroutine function listeners run on the
+    event loop, others in the default executor.
+
+    Args:
+        *button_ids (str): The buttons to listen to. Defaults to every button on every bridge.
+        listener (LutronButtonListener): Called with the button ID and the gesture
+        speculate (Speculation): Whether to dispatch single clicks without waiting for the
+            double-click window. See `Speculation` for which listeners are safe to speculate on.
+        undo (LutronButtonUndo | None): Reverses a single click, for `compensate` only
+    """
+    if speculate == "compensate" and undo is None:
+        raise ValueError("Compensating speculation needs an undo listener")
     if not len(button_ids):
-        button_ids = tuple(btn["device_id"] for btn in BRIDGE.get_buttons().values())
+        button_ids = tuple(
+            bridge.qualify(btn["device_id"])
+            for bridge in BRIDGES.values()
+            for btn in bridge.client.get_buttons().values()
+        )
+    binding = listener_name(listener)
+
+    async def handle(event: ButtonGesture) -> None:
+        with (
+            admission.priority(admission.Priority.BUTTON),
+            dedup.source(f"button:{event.button_id}"),
+        ):
+            if event.action == "UNDO":
+                if undo is not None:
+                    await call_listener(undo, event.button_id)
+            else:
+                await call_listener(listener, event.button_id, event.action)
+
+    if not any(sub.name == binding for sub in BUS.subscriptions):
+        BUS.subscribe(
+            binding, handle, ButtonGesture, predicate=lambda event: event.binding == binding
+        )
     for button_id in button_ids:
-        BRIDGE.add_button_subscriber(button_id, LutronButtonHandler(button_id, listener))
+        watch_button(button_id, binding, speculate)
+
+
+HANDLERS: dict[tuple[str, str], LutronButtonHandler] = {}
+"""Gesture recognizers by binding and button"""
+BUTTONS: dict[str, list[LutronButtonHandler]] = {}
+"""Gesture recognizers by button. The bridge client takes one subscriber per button."""
+
+
+def on_button(button_id: str, state: str) -> None:
+    """Pass a button's press or release to every recognizer watching it."""
+    for handler in BUTTONS.get(button_id, ()):
+        handler(state)
+
+
+def watch_button(
+    button_id: str, binding: str, speculate: Speculation = "none"
+) -> LutronButtonHandler:
+    """Publish the gestures of a button for `binding`, or update an existing recognizer.
+
+    Recognizers are only ever added: updating one takes effect from the next gesture, without
+    touching the bridge connection.
+    """
+    handler = HANDLERS.get((binding, button_id))
+    if handler is None:
+        handler = HANDLERS[(binding, button_id)] = LutronButtonHandler(
+            button_id, binding, speculate
+        )
+        if button_id not in BUTTONS:
+            bridge, local_id = route(button_id)
+            bridge.client.add_button_subscriber(local_id, functools.partial(on_button, button_id))
+        BUTTONS.setdefault(button_id, []).append(handler)
+    handler.speculate = speculate
+    return handler
+
+
+async def call_listener(listener: _t.Callable[..., _t.Any], *args: _t.Any) -> _t.Any:
+    """Await a coroutine function listener, or run a blocking one on the handler threads."""
+    if inspect.iscoroutinefunction(listener):
+        return await listener(*args)
+    return await HANDLER_EXECUTOR.run(listener, *args)
@@ -0,0 +1,294 @@
+import asyncio
+import contextlib
+import inspect
+import logging
+import threading
+import time
+import typing as _t
+from collections import deque
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from mkhome.settings import settings
+from mkhome.utils import executors, metrics, profiling
+
+
+LOGGER = logging.getLogger(__name__)
+HANDLER_EXECUTOR = executors.executor(
+    "automations", **settings.application_settings.automation_executor.model_dump()
+)
+"""Runs blocking event handlers and button listeners"""
+
+
+### Events
+
+
+class Event(BaseModel):
+    """Something that happened on a bridge. Events are immutable and cheap to fan out."""
+
+    published: float = Field(default_factory=time.monotonic)
+    """The `time.monotonic()` the event was created"""
+
+    model_config = ConfigDict(frozen=True)
+
+    priority: _t.ClassVar[int] = 1
+    """Queued events with a lower priority are delivered first"""
+
+    @property
+    def key(self) -> _t.Hashable | None:
+        """Events with the same key supersede each other under the `merge` policy."""
+        return None
+
+
+class ButtonGesture(Event):
+    priority: _t.ClassVar[int] = 0
+
+    button_id: str
+    action: str
+    """The gesture, e.g. `SINGLE_CLICK`, or `UNDO` to reverse a speculative single click"""
+    started: float
+    """The `time.time()` of the first press of the gesture"""
+    binding: str = ""
+    """The listener the gesture was recognized for"""
+
+
+class DeviceStateChanged(Event):
+    device_id: str
+    state: dict[str, _t.Any]
+
+    @property
+    def key(self) -> _t.Hashable | None:
+        return (type(self).__name__, self.device_id)
+
+
+class ZoneLevelChanged(DeviceStateChanged):
+    pass
+
+
+class BondStateChanged(DeviceStateChanged):
+    pass
+
+
+class BondCommandSent(Event):
+    """A command the bridge accepted for a Bond device, which changes its belief state."""
+
+    device_id: str
+    action: str
+    """The Bond action, or `UpdateState` for a change of the belief state itself"""
+    args: dict[str, _t.Any]
+    state_hash: str | None
+    """The hash of the device's state as last read before the command"""
+
+
+### Subscriptions
+
+
+Policy = _t.Literal["drop_oldest", "drop_newest", "merge"]
+"""What a full queue does with a new event.
+
+- `drop_oldest`: discard the oldest queued event of the lowest priority.
+- `drop_newest`: discard the new event.
+- `merge`: replace a queued event with the same key, otherwise discard the oldest.
+"""
+
+type Handler[E: Event] = _t.Callable[[E], _t.Awaitable[_t.Any] | _t.Any]
+
+
+class Subscription[E: Event]:
+    """A subscriber's bounded queue and the task delivering it.
+
+    Args:
+        name (str): Used for logs and metric labels
+        handler (Handler): Called with each event. Coroutine functions are awaited on the event
+            loop, other callables run in the default executor.
+        types (tuple[type[Event], ...]): The event types to receive, including subclasses
+        maxsize (int): Events the queue holds before `policy` applies
+        policy (Policy): What to do with an event when the queue is full
+        predicate (Callable | None): Only events it returns True for are queued
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Handler[E],
+        types: tuple[type[E], ...],
+        maxsize: int = 256,
+        policy: Policy = "drop_oldest",
+        predicate: _t.Callable[[E], bool] | None = None,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.types = types
+        self.maxsize = maxsize
+        self.policy = policy
+        self.predicate = predicate
+        self._queues: dict[int, deque[E]] = {}
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._busy = False
+        self._is_async = inspect.iscoroutinefunction(handler)
+        self._depth = metrics.gauge("bus_queue_depth", subscriber=name)
+        self._latency = metrics.histogram("bus_handler_seconds", subscriber=name)
+        self._lag = metrics.histogram("bus_lag_seconds", subscriber=name)
+
+    def __str__(self) -> str:
+        return f"Subscription<{self.name}>"
+
+    def accepts(self, event: Event) -> bool:
+        return isinstance(event, self.types) and (
+            self.predicate is None or self.predicate(event)  # type: ignore[arg-type]
+        )
+
+    def _drop(self, reason: str) -> None:
+        metrics.counter("bus_events_dropped_total", subscriber=self.name, reason=reason).inc()
+
+    def offer(self, event: E) -> None:
+        """Queue an event without waiting. Must be called on the event loop."""
+        queue = self._queues.setdefault(event.priority, deque())
+        if self.policy == "merge" and event.key is not None:
+            for i, queued in enumerate(queue):
+                if queued.key == event.key:
+                    queue[i] = event
+                    metrics.counter("bus_events_merged_total", subscriber=self.name).inc()
+                    return
+        if self._size >= self.maxsize:
+            if self.policy == "drop_newest":
+                return self._drop("full")
+            lowest = self._queues[max(p for p, q in self._queues.items() if q)]
+            lowest.popleft()
+            self._size -= 1
+            self._drop("full")
+        queue.append(event)
+        self._size += 1
+        self._depth.set(self._size)
+        self._ready.set()
+
+    def _take(self) -> E:
+        queue = self._queues[min(p for p, q in self._queues.items() if q)]
+        self._size -= 1
+        self._depth.set(self._size)
+        if not self._size:
+            self._ready.clear()
+        return queue.popleft()
+
+    async def _deliver(self, event: E) -> None:
+        self._lag.observe(time.monotonic() - event.published)
+        started = time.perf_counter()
+        gesture = isinstance(event, ButtonGesture)
+        tracked = profiling.track("events") if gesture else contextlib.nullcontext()
+        try:
+            with tracked:
+                if self._is_async:
+                    await self.handler(event)  # type: ignore[misc]
+                else:
+                    await HANDLER_EXECUTOR.run(self.handler, event)
+        except Exception:
+            LOGGER.exception("Exception occurred in subscriber %s handling %r", self, event)
+        finally:
+            self._latency.observe(time.perf_counter() - started)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._busy = True
+            try:
+                await self._deliver(self._take())
+            finally:
+                self._busy = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=str(self))
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Deliver what is queued (for up to `timeout` seconds), then stop."""
+        if self._task is None:
+            return
+        with contextlib.suppress(TimeoutError):
+            async with asyncio.timeout(timeout):
+                while self._size or self._busy:
+                    await asyncio.sleep(0.05)
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+
+### Bus
+
+
+class EventBus:
+    """Fans events out from bridges to automations without ever blocking the publisher.
+
+    Every subscriber has its own bounded queue and task, so a slow automation only delays
+    itself. `publish` may be called from any thread; the events are queued on the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.subscriptions: list[Subscription] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: int | None = None
+
+    def subscribe[E: Event](
+        self,
+        name: str,
+        handler: Handler[E],
+        *types: type[E],
+        maxsize: int = 256,
+        policy: Policy = "drop_oldest",
+        predicate: _t.Callable[[E], bool] | None = None,
+    ) -> Subscription[E]:
+        """Deliver events of the given types to `handler`. See `Subscription` for the arguments."""
+        types = types or _t.cast(tuple[type[E], ...], (Event,))
+        subscription = Subscription(name, handler, types, maxsize, policy, predicate)
+        self.subscriptions = [*self.subscriptions, subscription]
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(subscription.start)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions = [sub for sub in self.subscriptions if sub is not subscription]
+        await subscription.stop()
+
+    def publish(self, event: Event) -> None:
+        """Queue an event for every interested subscriber. Never blocks."""
+        metrics.counter("bus_events_published_total", event=type(event).__name__).inc()
+        if self._loop is None:
+            LOGGER.debug("Event bus is not running, dropping %r", event)
+            return
+        if threading.get_ident() == self._thread:
+            self._fan_out(event)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: Event) -> None:
+        for subscription in self.subscriptions:
+            if subscription.accepts(event):
+                subscription.offer(event)
+
+    async def startup(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.get_ident()
+        for subscription in self.subscriptions:
+            subscription.start()
+
+    async def shutdown(self) -> None:
+        self._loop = None
+        await asyncio.gather(*(sub.stop() for sub in self.subscriptions))
+
+
+BUS = EventBus()
+
+
+### Lifecycle
+
+
+async def startup() -> None:
+    LOGGER.debug("Running event bus startup hook")
+    await BUS.startup()
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running event bus shutdown hook")
+    await BUS.shutdown()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+import signal
+
+from fastapi import HTTPException
+
+from mkhome.supervisor import READY_FILE_ENV, SUPERVISOR_ENV, uvicorn_command
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+### Git
+
+
+async def run_git(*args: str) -> str:
+    """Run a git command without blocking the event loop.
+
+    Raises:
+        HTTPException: If git exits with a non-zero status
+
+    Returns:
+        str: The command's standard output
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        LOGGER.error("git %s failed: %s", " ".join(args), stderr.decode().strip())
+        raise HTTPException(500, f"git {args[0]} failed")
+    LOGGER.info("git %s: %s", " ".join(args), stdout.decode().strip())
+    return stdout.decode()
+
+
+async def update() -> None:
+    """Check out and pull the `main` branch."""
+    await run_git("checkout", "main")
+    await run_git("pull", "origin", "main")
+
+
+### Restart
+
+
+def exec_restart() -> None:
+    """Replace this process with a fresh server. Drops the socket and the Lutron session."""
+    cmd = uvicorn_command("--host", "0.0.0.0", "--port", "8582")
+    os.execvp(cmd[0], cmd)
+
+
+async def restart() -> None:
+    """Replace this server with a fresh one.
+
+    Under `mkhome.supervisor` the supervisor starts a successor on the same listening socket and
+    retires this server once every successor worker is ready, so no connection is refused. Every
+    worker starts with button dispatch held until it wins the leader election; this server's
+    leader resigns as it shuts down and the successor replays the gestures it held that nobody
+    dispatched, so no press is lost or handled twice. Otherwise this process is replaced in place,
+    keeping its pid for whatever supervises it.
+    """
+    supervisor = os.environ.get(SUPERVISOR_ENV)
+    if supervisor is None or os.name != "posix":
+        LOGGER.warning("Not running under mkhome.supervisor, restarting in place")
+        await asyncio.to_thread(exec_restart)
+        return
+    LOGGER.info("Asking supervisor %s to hand off to a new server", supervisor)
+    os.kill(int(supervisor), signal.SIGHUP)
+
+
+### Successor Lifecycle
+
+
+def _append_pid(path: str) -> None:
+    with open(path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+
+
+async def ready() -> None:
+    """Tell the server that started this one that this worker's startup is complete."""
+    ready_file = os.environ.pop(READY_FILE_ENV, None)
+    if ready_file is None:
+        return
+    LOGGER.info("Successor worker %s is ready", os.getpid())
+    await asyncio.to_thread(_append_pid, ready_file)
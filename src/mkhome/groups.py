@@ -0,0 +1,259 @@
+import asyncio
+import functools
+import logging
+import math
+import re
+import time
+import typing as _t
+
+import yaml
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, field_validator
+
+from mkhome.automations import actions
+from mkhome.bridges import bond, lutron
+from mkhome.settings import settings
+from mkhome.utils import files
+
+
+LOGGER = logging.getLogger(__name__)
+
+Bridge = _t.Literal["bond", "lutron"]
+Command = _t.Literal["off", "set-speed", "set-level"]
+
+type Step = _t.Callable[[str], _t.Awaitable[None]]
+
+PARTIAL_AREAS_TTL = 10.0
+"""Seconds area groups missing the Bond devices are cached, so an unreachable Bond Bridge is
+not read on every request"""
+
+
+### Configuration
+
+
+class Member(BaseModel):
+    bridge: Bridge
+    device: str
+    """The device ID, or for Bond devices the device name"""
+
+
+class Group(BaseModel):
+    name: str
+    source: _t.Literal["file", "area"]
+    """Whether the group is defined in the groups file or is a room of either bridge"""
+    members: list[Member] = Field(default_factory=list)
+
+
+class GroupsFile(BaseModel):
+    groups: dict[str, list[Member]] = Field(default_factory=dict)
+
+    @field_validator("groups", mode="before")
+    @classmethod
+    def parse_members(cls, v: _t.Any) -> _t.Any:
+        # Allow `bridge:device` strings, e.g. `bond:Office Ceiling Fan` or `lutron:5`
+        if not isinstance(v, dict):
+            return v
+        return {
+            name: [
+                dict(zip(("bridge", "device"), m.split(":", 1))) if isinstance(m, str) else m
+                for m in members or []
+            ]
+            for name, members in v.items()
+        }
+
+
+def group_key(name: str) -> str:
+    """Normalize a group name, so that the `Master Bedroom` area is found as `master-bedroom`."""
+    return re.sub(r"[\s_]+", "-", name.strip().lower())
+
+
+def load_groups(path: str) -> GroupsFile:
+    try:
+        with open(path) as f:
+            return GroupsFile.model_validate(yaml.safe_load(f) or {})
+    except FileNotFoundError:
+        return GroupsFile()
+
+
+_FILE_GROUPS: tuple[int, dict[str, Group]] = (0, {})
+_AREA_GROUPS: tuple[float, dict[str, Group]] = (-math.inf, {})
+"""When the area groups expire, and the groups"""
+
+
+async def file_groups() -> dict[str, Group]:
+    """Get the groups defined in the groups file, reading it again whenever it changes."""
+    global _FILE_GROUPS
+    path = settings.application_settings.groups_file
+    mtime = await asyncio.to_thread(files.mtime_ns, path)
+    if mtime != _FILE_GROUPS[0]:
+        config = await asyncio.to_thread(load_groups, path)
+        groups = {
+            group_key(name): Group(name=name, source="file", members=members)
+            for name, members in config.groups.items()
+        }
+        _FILE_GROUPS = (mtime, groups)
+        LOGGER.info("Loaded %s group(s) from %s", len(groups), path)
+    return _FILE_GROUPS[1]
+
+
+async def area_groups() -> dict[str, Group]:
+    """Get a group for each Bond device location and Lutron area.
+
+    Every Bond device has to be read for its location, so the groups are cached for
+    `group_areas_ttl` seconds. If the Bond Bridge could not be read, the Lutron areas are cached
+    for `PARTIAL_AREAS_TTL` seconds instead.
+    """
+    global _AREA_GROUPS
+    if time.monotonic() < _AREA_GROUPS[0]:
+        return _AREA_GROUPS[1]
+    groups: dict[str, Group] = {}
+
+    def add(area: str, member: Member) -> None:
+        group = groups.setdefault(group_key(area), Group(name=area, source="area"))
+        group.members.append(member)
+
+    complete = True
+    try:
+        device_ids = await bond.get_devices()
+        for bond_device in await asyncio.gather(*(bond.get_device(i) for i in device_ids)):
+            if bond_device.location:
+                add(bond_device.location, Member(bridge="bond", device=bond_device.device_id))
+    except Exception as e:
+        LOGGER.warning("Failed to read Bond device locations: %r", e)
+        complete = False
+    for device in await lutron.get_devices():
+        area = lutron.get_area_name(device.area) if device.area else None
+        if area and device.zone is not None:
+            add(area, Member(bridge="lutron", device=str(device.device_id)))
+    ttl = settings.application_settings.group_areas_ttl if complete else PARTIAL_AREAS_TTL
+    _AREA_GROUPS = (time.monotonic() + ttl, groups)
+    return groups
+
+
+async def get_groups() -> dict[str, Group]:
+    """Get every group by key. A group in the file replaces an area group of the same name."""
+    return {**await area_groups(), **await file_groups()}
+
+
+async def get_group(name: str) -> Group:
+    group = (await get_groups()).get(group_key(name))
+    if group is None:
+        raise HTTPException(404, f"Group {name} not found")
+    return group
+
+
+### Commands
+
+
+class MemberResult(BaseModel):
+    bridge: Bridge
+    device: str
+    outcome: _t.Literal["ok", "failed", "skipped"]
+    detail: _t.Any = None
+    """Why the command failed or was skipped"""
+    elapsed: float
+    """Seconds the device took to complete the command"""
+
+
+class GroupResult(BaseModel):
+    group: str
+    command: Command
+    value: int | None = None
+    elapsed: float
+    results: list[MemberResult]
+
+
+def bond_steps(capabilities: bond.Capabilities, command: Command, value: int) -> list[Step]:
+    """The calls that carry out a group command on a Bond device, if it supports it."""
+    if command == "off":
+        return [
+            step
+            for action, step in (("TurnOff", bond.power_off), ("TurnLightOff", bond.light_off))
+            if capabilities.supports(action)
+        ]
+    if command == "set-speed" and capabilities.supports("SetSpeed"):
+        return [functools.partial(bond.set_speed, speed=value) if value else bond.power_off]
+    if command == "set-level" and capabilities.supports("SetBrightness"):
+        return [functools.partial(bond.set_brightness, brightness=value)]
+    return []
+
+
+def lutron_steps(device: lutron.LutronDevice, command: Command, value: int) -> list[Step]:
+    """The calls that carry out a group command on a Lutron zone, if it supports it."""
+    if device.zone is None:
+        return []
+    if command == "off":
+        return [lutron.turn_off_device]
+    is_fan = device.fan_speed is not None
+    if command == "set-speed" and is_fan:
+        return [functools.partial(lutron.set_level, level=lutron.fan_level(value))]
+    if command == "set-level" and not is_fan:
+        return [functools.partial(lutron.set_level, level=value)]
+    return []
+
+
+async def run_member(member: Member, command: Command, value: int | None) -> MemberResult:
+    started = time.monotonic()
+    outcome: _t.Literal["ok", "failed", "skipped"] = "ok"
+    detail: _t.Any = None
+    try:
+        if member.bridge == "bond":
+            device_id = await actions.resolve_device(member.device)
+            steps = bond_steps(await bond.get_capabilities(device_id), command, value or 0)
+        else:
+            device_id = member.device
+            steps = lutron_steps(await lutron.get_device(device_id), command, value or 0)
+        if not steps:
+            outcome, detail = "skipped", f"Device does not support {command}"
+        for step in steps:
+            await step(device_id)
+    except HTTPException as e:
+        LOGGER.warning(
+            "Failed to run %s on %s device %s: %s", command, member.bridge, member.device, e
+        )
+        outcome, detail = "failed", e.detail
+    except Exception:
+        LOGGER.exception("Failed to run %s on %s device %s", command, member.bridge, member.device)
+        outcome, detail = "failed", "Internal service error"
+    return MemberResult(
+        bridge=member.bridge,
+        device=member.device,
+        outcome=outcome,
+        detail=detail,
+        elapsed=round(time.monotonic() - started, 4),
+    )
+
+
+async def run(name: str, command: Command, value: int | None = None) -> GroupResult:
+    """Send a command to every device in a group at once.
+
+    Devices that do not support the command are skipped, and a device that fails does not stop
+    the others; each device's outcome and timing is in the result.
+
+    Args:
+        name (str): The group name
+        command (Command): What to do, e.g. `set-speed`
+        value (int | None): The speed or level for `set-speed` and `set-level`
+
+    Raises:
+        HTTPException: A 404 if there is no such group
+    """
+    group = await get_group(name)
+    started = time.monotonic()
+    results = await asyncio.gather(*(run_member(m, command, value) for m in group.members))
+    elapsed = time.monotonic() - started
+    LOGGER.info(
+        "Group %s: %s %s on %s device(s) in %.3f s",
+        group.name,
+        command,
+        "" if value is None else value,
+        len(results),
+        elapsed,
+    )
+    return GroupResult(
+        group=group.name,
+        command=command,
+        value=value,
+        elapsed=round(elapsed, 4),
+        results=list(results),
+    )
@@ -0,0 +1,188 @@
+import array
+import bisect
+import contextlib
+import datetime
+import threading
+import time
+import typing as _t
+
+from pydantic import BaseModel
+
+from mkhome.settings import settings
+
+
+Kind = _t.Literal["gesture", "command", "automation"]
+Outcome = _t.Literal["ok", "failed", "suppressed", "deferred"]
+"""What became of the event.
+
+- `ok`: the gesture was dispatched, the command accepted or the automation completed.
+- `failed`: the command or automation raised.
+- `suppressed`: the command was dropped as a repeat, see `mkhome.utils.dedup`.
+- `deferred`: the gesture was held for, or belongs to, another worker.
+"""
+
+KINDS: tuple[Kind, ...] = _t.get_args(Kind)
+OUTCOMES: tuple[Outcome, ...] = _t.get_args(Outcome)
+
+
+class HistoryEntry(BaseModel):
+    timestamp: datetime.datetime
+    kind: Kind
+    source: str
+    """The bridge or automation type, e.g. `lutron`, `bond`, `rules` or `scheduler`"""
+    device: str
+    """The button or device ID"""
+    action: str
+    """The gesture, command or automation name"""
+    outcome: Outcome
+    latency: float
+    """Seconds the gesture took to recognize, or the command or automation to complete"""
+
+
+class _Symbols:
+    """Interns the strings an entry refers to, so entries store a two byte index instead.
+
+    Devices, commands and automations are few, but the table is capped so a flood of unknown IDs
+    cannot grow it without limit; later strings are all stored as `?`.
+    """
+
+    LIMIT = 2**16
+
+    def __init__(self) -> None:
+        self.names: list[str] = ["?"]
+        self.index: dict[str, int] = {"?": 0}
+
+    def intern(self, name: str) -> int:
+        index = self.index.get(name)
+        if index is None:
+            if len(self.names) >= self.LIMIT:
+                return 0
+            index = self.index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+class _Timestamps:
+    """The timestamp column in logical (oldest first) order, for bisecting."""
+
+    def __init__(self, history: "EventHistory") -> None:
+        self.history = history
+
+    def __len__(self) -> int:
+        return self.history.size
+
+    def __getitem__(self, i: int) -> float:
+        return self.history._timestamp[self.history._slot(i)]
+
+
+class EventHistory:
+    """A fixed-capacity ring buffer of gestures, commands and automation runs.
+
+    Entries are stored column by column in preallocated arrays (about 24 bytes each), so memory
+    is constant and recording never allocates. Entries are appended in time order, which lets a
+    time range be found by bisection; the other filters scan back from the newest entry until
+    `limit` matches are found. History is per worker and is lost on restart.
+
+    Args:
+        capacity (int): Entries kept before the oldest is overwritten
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.size = 0
+        self._head = 0
+        self._timestamp = array.array("d", bytes(8 * capacity))
+        self._latency = array.array("f", bytes(4 * capacity))
+        self._kind = array.array("B", bytes(capacity))
+        self._outcome = array.array("B", bytes(capacity))
+        self._source = array.array("H", bytes(2 * capacity))
+        self._device = array.array("H", bytes(2 * capacity))
+        self._action = array.array("H", bytes(2 * capacity))
+        self._symbols = _Symbols()
+        self._lock = threading.Lock()
+
+    def _slot(self, i: int) -> int:
+        """The array index of the `i`th oldest entry."""
+        return (self._head - self.size + i) % self.capacity
+
+    def record(
+        self,
+        kind: Kind,
+        source: str,
+        device: str,
+        action: str,
+        outcome: Outcome = "ok",
+        latency: float = 0.0,
+    ) -> None:
+        with self._lock:
+            slot = self._head
+            self._timestamp[slot] = time.time()
+            self._latency[slot] = latency
+            self._kind[slot] = KINDS.index(kind)
+            self._outcome[slot] = OUTCOMES.index(outcome)
+            self._source[slot] = self._symbols.intern(source)
+            self._device[slot] = self._symbols.intern(str(device))
+            self._action[slot] = self._symbols.intern(action)
+            self._head = (slot + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    @contextlib.contextmanager
+    def timed(self, kind: Kind, source: str, device: str, action: str) -> _t.Iterator[None]:
+        """Record the enclosed block with its duration, as `failed` if it raises."""
+        started = time.perf_counter()
+        outcome: Outcome = "failed"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.record(kind, source, device, action, outcome, time.perf_counter() - started)
+
+    def _entry(self, slot: int) -> HistoryEntry:
+        names = self._symbols.names
+        return HistoryEntry.model_construct(
+            timestamp=datetime.datetime.fromtimestamp(self._timestamp[slot]).astimezone(),
+            kind=KINDS[self._kind[slot]],
+            source=names[self._source[slot]],
+            device=names[self._device[slot]],
+            action=names[self._action[slot]],
+            outcome=OUTCOMES[self._outcome[slot]],
+            latency=round(self._latency[slot], 6),
+        )
+
+    def query(
+        self,
+        device: str | None = None,
+        kind: Kind | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int = 100,
+    ) -> list[HistoryEntry]:
+        """Get matching entries, newest first.
+
+        Args:
+            device (str | None): Only entries for this button or device ID
+            kind (Kind | None): Only entries of this kind
+            since (float | None): Only entries at or after this `time.time()`
+            until (float | None): Only entries before this `time.time()`
+            limit (int): The most entries to return. Defaults to 100.
+        """
+        with self._lock:
+            timestamps = _Timestamps(self)
+            start = bisect.bisect_left(timestamps, since) if since is not None else 0
+            stop = bisect.bisect_left(timestamps, until) if until is not None else self.size
+            device_index = self._symbols.index.get(device, -1) if device is not None else None
+            kind_index = KINDS.index(kind) if kind is not None else None
+            entries: list[HistoryEntry] = []
+            for i in range(stop - 1, start - 1, -1):
+                if len(entries) >= limit:
+                    break
+                slot = self._slot(i)
+                if device_index is not None and self._device[slot] != device_index:
+                    continue
+                if kind_index is not None and self._kind[slot] != kind_index:
+                    continue
+                entries.append(self._entry(slot))
+            return entries
+
+
+HISTORY = EventHistory(settings.application_settings.history_size)
@@ -0,0 +1,174 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import typing as _t
+from collections import deque
+
+from filelock import FileLock, Timeout
+
+from mkhome.bridges import lutron
+from mkhome.settings import settings
+from mkhome.supervisor import SUPERVISOR_ENV
+from mkhome.utils import metrics
+
+
+LOGGER = logging.getLogger(__name__)
+LOCK = FileLock(f"{settings.application_settings.leader_file}.lock", thread_local=False)
+STATUS_FILE = f"{settings.application_settings.leader_file}.json"
+INTERVAL = settings.application_settings.leader_interval
+DISPATCH_WINDOW = 60.0
+"""Seconds the leader keeps a gesture in the status file after dispatching it"""
+
+_TASK: asyncio.Task | None = None
+_IS_LEADER = metrics.gauge("leader")
+_PROMOTIONS = metrics.counter("leader_promotions_total")
+
+_DISPATCHED: deque[lutron.GestureStamp] = deque()
+"""The gestures dispatched by this worker and the leaders before it, oldest first"""
+_SINCE = float("-inf")
+"""The `time.time()` from which `_DISPATCHED` holds every gesture the leaders dispatched"""
+_WRITE_LOCK = threading.Lock()
+
+
+def is_leader() -> bool:
+    """Check whether this worker owns button event dispatch."""
+    return LOCK.is_locked
+
+
+def read_status() -> dict[str, _t.Any]:
+    try:
+        with open(STATUS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_status(**status: _t.Any) -> None:
+    """Write the status file, with the gestures dispatched in the last `DISPATCH_WINDOW` seconds."""
+    with _WRITE_LOCK:
+        since = max(_SINCE, time.time() - DISPATCH_WINDOW)
+        while _DISPATCHED and _DISPATCHED[0].started <= since:
+            _DISPATCHED.popleft()
+        tmp = f"{STATUS_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {"pid": os.getpid(), **status, "since": since, "dispatched": list(_DISPATCHED)}, f
+            )
+        os.replace(tmp, STATUS_FILE)
+
+
+def acknowledge(stamp: lutron.GestureStamp) -> None:
+    """Record a gesture as dispatched before it is, so no successor replays it.
+
+    Writes the status file on the calling thread: the write must finish before the dispatch, and
+    one small file per gesture is cheap next to how often buttons are pressed.
+    """
+    if not is_leader():
+        return
+    with _WRITE_LOCK:
+        _DISPATCHED.append(stamp)
+    write_status(heartbeat=time.time())
+
+
+def _promote() -> None:
+    # A leader that resigned handled every gesture up to its resignation. One that died may have
+    # dispatched gestures after its last heartbeat, so the held gestures it recorded as dispatched
+    # are skipped and the others replayed: presses during a failover are neither lost nor run
+    # twice. Its record is kept, so a leader dying right after this one took over is covered too.
+    global _SINCE
+    status = read_status()
+    previous = [lutron.GestureStamp(*stamp) for stamp in status.get("dispatched", ())]
+    _SINCE = float(status.get("since", float("-inf")))
+    if status.get("resigned"):
+        after = float(status["heartbeat"])
+    else:
+        after = _SINCE
+    _DISPATCHED.clear()
+    _DISPATCHED.extend(previous)
+    write_status(heartbeat=time.time())
+    _IS_LEADER.set(1)
+    _PROMOTIONS.inc()
+    LOGGER.warning("Worker %s is now the leader (previous: %s)", os.getpid(), status.get("pid"))
+    lutron.GATE.release(after, previous)
+
+
+async def _campaign() -> None:
+    while True:
+        try:
+            if is_leader():
+                await asyncio.to_thread(write_status, heartbeat=time.time())
+            else:
+                with contextlib.suppress(Timeout):
+                    LOCK.acquire(timeout=0)
+                    _promote()
+        except Exception:
+            LOGGER.exception("Leader election failed")
+        await asyncio.sleep(INTERVAL)
+
+
+async def resign() -> None:
+    """Stop campaigning, stop dispatching gestures and hand leadership to another worker."""
+    if _TASK is not None and _TASK is not asyncio.current_task():
+        _TASK.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _TASK
+    if not is_leader():
+        return
+    until = time.time()
+    lutron.GATE.retire(until)
+    await asyncio.to_thread(write_status, heartbeat=until, resigned=True)
+    LOCK.release(force=True)
+    _IS_LEADER.set(0)
+    LOGGER.warning("Worker %s resigned leadership", os.getpid())
+
+
+### Lifecycle
+
+
+def uvicorn_workers(argv: _t.Sequence[str]) -> int:
+    """Get the number of workers uvicorn was started with, from its command line."""
+    for i, arg in enumerate(argv):
+        if arg == "--workers" and i + 1 < len(argv):
+            return int(argv[i + 1])
+        if arg.startswith("--workers="):
+            return int(arg.partition("=")[2])
+    return int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+
+def check_workers() -> None:
+    """Check that uvicorn runs as many workers as `application.workers` says.
+
+    Raises:
+        RuntimeError: If it runs another number, or several workers without `mkhome.supervisor`,
+            which passes `application.workers` to uvicorn
+    """
+    expected = settings.application_settings.workers
+    # Worker processes are spawned by multiprocessing, which copies uvicorn's command line
+    workers = uvicorn_workers(sys.argv)
+    if workers != expected:
+        raise RuntimeError(
+            f"uvicorn runs {workers} worker(s) but application.workers is {expected}; start the"
+            " server with scripts/service.sh"
+        )
+    if workers > 1 and SUPERVISOR_ENV not in os.environ:
+        raise RuntimeError("Several workers must be started by mkhome.supervisor")
+
+
+async def startup() -> None:
+    """Hold button dispatch and start campaigning for leadership."""
+    global _TASK
+    LOGGER.debug("Running leader election startup hook")
+    check_workers()
+    lutron.GATE.acknowledge = acknowledge
+    lutron.GATE.hold()
+    _TASK = asyncio.create_task(_campaign())
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running leader election shutdown hook")
+    await resign()
@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing as _t
+
+from mkhome.bridges import bond
+from mkhome.bus import BUS, BondCommandSent
+from mkhome.settings import settings
+from mkhome.utils import admission, metrics
+
+
+LOGGER = logging.getLogger(__name__)
+BINDING = "reconcile"
+
+
+### Expectations
+
+
+class Expectation:
+    """The belief state fields a device should have after the commands sent to it."""
+
+    def __init__(self) -> None:
+        self.fields: dict[str, _t.Any] = {}
+        self.issued = 0.0
+        """The `time.monotonic()` the last command was published"""
+
+
+### Reconciliation
+
+
+class Reconciler:
+    """Reports Bond devices whose belief state was changed by someone else after our commands.
+
+    RF devices report no state, so the bridge believes what it last transmitted, and it updates
+    that belief as soon as it accepts a command. A lost transmission therefore never shows in the
+    belief state; a belief that differs from our commands means another client (the Bond app, a
+    Bond remote or another integration) changed the device since, which is legitimate and is left
+    alone. Every command the bridge accepts is tracked as the fields it should have set, e.g.
+    `light=1` for `TurnLightOn`. Once a device has settled, a pass reads its state (cheaply while
+    the bridge's state hash is unchanged) and either confirms the fields or logs and counts the
+    change. Either way the device is not checked again until the next command. All settled
+    devices are checked concurrently, as API reads, so buttons are never delayed by a pass.
+
+    Commands that change a field relative to its value (toggles, increments) make the field
+    unknown, so it is not checked until a command sets it again. Expectations older than `window`
+    seconds are dropped unchecked.
+
+    Args:
+        interval (float): Seconds between passes
+        settle (float): Seconds after the last command before a device is checked
+        window (float): Seconds after the last command after which a device is no longer checked
+    """
+
+    def __init__(self, interval: float, settle: float, window: float) -> None:
+        self.interval = interval
+        self.settle = settle
+        self.window = window
+        self.expected: dict[str, Expectation] = {}
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._passes = metrics.histogram("bond_reconcile_seconds")
+
+    def status(self) -> dict[str, _t.Any]:
+        now = time.monotonic()
+        return {
+            "interval": self.interval,
+            "pending": {
+                device_id: {"fields": e.fields, "age": round(now - e.issued, 3)}
+                for device_id, e in self.expected.items()
+            },
+        }
+
+    def _outcome(self, outcome: str) -> None:
+        metrics.counter("bond_reconcile_total", outcome=outcome).inc()
+
+    async def expect(self, event: BondCommandSent) -> None:
+        """Track the state a command should leave its device in."""
+        effect = bond.EFFECTS.get(event.action)
+        relative = bond.RELATIVE_EFFECTS.get(event.action, ())
+        if effect is None and not relative:
+            return
+        expectation = self.expected.get(event.device_id)
+        if expectation is None:
+            expectation = self.expected[event.device_id] = Expectation()
+        for field in relative:
+            expectation.fields.pop(field, None)
+        if effect is not None:
+            expectation.fields.update(effect(event.args))
+        expectation.issued = event.published
+        if not expectation.fields:
+            del self.expected[event.device_id]
+
+    def _forget(self, device_id: str, expectation: Expectation) -> None:
+        if self.expected.get(device_id) is expectation:
+            del self.expected[device_id]
+
+    async def _check(self, device_id: str, expectation: Expectation) -> str:
+        issued = expectation.issued
+        state = await bond.get_state(device_id)
+        if expectation.issued != issued:
+            return "superseded"
+        self._forget(device_id, expectation)
+        values = state.model_dump()
+        changed = {k: v for k, v in expectation.fields.items() if values.get(k) != v}
+        if not changed:
+            return "match"
+        # The bridge applied our commands on accepting them, so only another client explains this
+        LOGGER.warning(
+            "Bond device %s was changed by another client after our commands: %s, we set %s",
+            device_id,
+            {k: values.get(k) for k in changed},
+            changed,
+        )
+        for field in changed:
+            metrics.counter("bond_external_changes_total", field=field).inc()
+        return "changed"
+
+    async def reconcile(self) -> dict[str, str]:
+        """Check every settled device once and report those another client changed.
+
+        Returns:
+            dict[str, str]: The outcome for each device checked
+        """
+        async with self._lock:
+            return await self._reconcile()
+
+    async def _reconcile(self) -> dict[str, str]:
+        started = now = time.monotonic()
+        due: dict[str, Expectation] = {}
+        for device_id, expectation in list(self.expected.items()):
+            if now - expectation.issued > self.window:
+                del self.expected[device_id]
+                self._outcome("expired")
+            elif now - expectation.issued >= self.settle:
+                due[device_id] = expectation
+        if not due:
+            return {}
+        with admission.priority(admission.Priority.READ):
+            results = await asyncio.gather(
+                *(self._check(device_id, e) for device_id, e in due.items()),
+                return_exceptions=True,
+            )
+        outcomes = {}
+        for device_id, result in zip(due, results):
+            if isinstance(result, BaseException):
+                # Left for the next pass, until the window runs out
+                LOGGER.warning("Could not reconcile Bond device %s: %r", device_id, result)
+                result = "error"
+            outcomes[device_id] = result
+            self._outcome(result)
+        self._passes.observe(time.monotonic() - started)
+        return outcomes
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception:
+                LOGGER.exception("Exception occurred reconciling Bond belief state")
+
+    async def startup(self) -> None:
+        if self.interval <= 0:
+            return
+        BUS.subscribe(BINDING, self.expect, BondCommandSent)
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+RECONCILER = Reconciler(
+    settings.bond_settings.reconcile.interval,
+    settings.bond_settings.reconcile.settle,
+    settings.bond_settings.reconcile.window,
+)
+
+
+### Lifecycle
+
+
+async def startup() -> None:
+    LOGGER.debug("Running reconciliation startup hook")
+    await RECONCILER.startup()
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running reconciliation shutdown hook")
+    await RECONCILER.shutdown()
@@ -0,0 +1,389 @@
+import glob
+import json
+import logging
+import math
+import os
+import time
+import typing as _t
+
+import numpy as np
+
+from mkhome.bus import BUS, DeviceStateChanged, ZoneLevelChanged
+from mkhome.settings import settings
+from mkhome.state import StateStore
+from mkhome.utils import executors, metrics
+
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"MKTS"
+VERSION = 1
+HEADER_SIZE = 64
+"""Bytes before the first column, which keeps every column aligned"""
+COLUMNS = (
+    ("timestamp", np.dtype("<f8")),
+    ("device", np.dtype("<u2")),
+    ("field", np.dtype("<u2")),
+    ("value", np.dtype("<f4")),
+)
+RECORD_SIZE = sum(dtype.itemsize for _, dtype in COLUMNS)
+WRITER = executors.executor("recorder", workers=1, queue_size=8)
+"""Runs every write to the segments: appends, symbol tables, rotation and pruning. One thread
+keeps appends in order and off the event loop."""
+
+
+### Transitions
+
+
+class Transitions(_t.NamedTuple):
+    """State transitions, with devices and fields as indexes into `names`."""
+
+    timestamp: np.ndarray
+    device: np.ndarray
+    field: np.ndarray
+    value: np.ndarray
+    names: list[str]
+
+    @classmethod
+    def empty(cls) -> "Transitions":
+        return cls(np.empty(0), np.empty(0, np.uint16), np.empty(0, np.uint16), np.empty(0), [])
+
+    def select(self, mask: np.ndarray) -> "Transitions":
+        return Transitions(
+            self.timestamp[mask], self.device[mask], self.field[mask], self.value[mask], self.names
+        )
+
+    def symbol(self, name: str) -> int:
+        return self.names.index(name) if name in self.names else -1
+
+    def changes(self) -> "Transitions":
+        """Drop records repeating the previous value of the device's field, e.g. the same change
+        seen by two workers."""
+        order = np.lexsort((self.timestamp, self.field, self.device))
+        device, field, value = self.device[order], self.field[order], self.value[order]
+        repeated = (
+            (device[1:] == device[:-1]) & (field[1:] == field[:-1]) & (value[1:] == value[:-1])
+        )
+        return self.select(np.sort(order[np.append(True, ~repeated)]))
+
+    def spans(self, field: str, since: float, until: float) -> tuple[np.ndarray, ...]:
+        """Get how long each device held each value of a field between `since` and `until`.
+
+        Returns:
+            tuple: Device, value and duration arrays, one element per transition
+        """
+        mask = (self.field == self.symbol(field)) & (self.timestamp < until)
+        timestamp, device = self.timestamp[mask], self.device[mask]
+        order = np.lexsort((timestamp, device))
+        timestamp, device, value = timestamp[order], device[order], self.value[mask][order]
+        # A value holds until the device's next transition, or `until` after its last one
+        last = np.append(device[1:] != device[:-1], True)
+        end = np.where(last, until, np.append(timestamp[1:], until))
+        duration = np.clip(end - np.maximum(timestamp, since), 0, None)
+        return device, value, duration
+
+
+def concatenate(parts: _t.Sequence[Transitions]) -> Transitions:
+    """Join transitions, merging their symbol tables."""
+    if len(parts) == 1:
+        return parts[0]
+    names: dict[str, int] = {}
+    devices, fields = [], []
+    for part in parts:
+        remap = np.array([names.setdefault(name, len(names)) for name in part.names], np.uint16)
+        devices.append(remap[part.device] if len(remap) else part.device)
+        fields.append(remap[part.field] if len(remap) else part.field)
+    return Transitions(
+        np.concatenate([part.timestamp for part in parts]),
+        np.concatenate(devices),
+        np.concatenate(fields),
+        np.concatenate([part.value for part in parts]),
+        list(names),
+    )
+
+
+### Segments
+
+
+class Segment:
+    """A fixed-capacity file of state transitions, stored column by column and memory-mapped.
+
+    The header holds the capacity and the number of records written, so a segment can be read
+    while another process appends to it. Devices and fields are stored as indexes into the
+    segment's symbol table, kept next to it as `<segment>.json`.
+
+    Args:
+        path (str): The segment file
+        capacity (int | None): Records the segment holds, to create a new segment. Existing
+            segments are opened read-only.
+    """
+
+    def __init__(self, path: str, capacity: int | None = None) -> None:
+        self.path = path
+        self.symbols_path = f"{path}.json"
+        if capacity is not None:
+            with open(path, "wb") as f:
+                f.truncate(HEADER_SIZE + capacity * RECORD_SIZE)
+                f.write(MAGIC + VERSION.to_bytes(2, "little") + bytes(2))
+                f.write(capacity.to_bytes(4, "little"))
+            self.names: list[str] = []
+            self._write_symbols()
+        else:
+            with open(self.symbols_path) as f:
+                self.names = json.load(f)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._buffer = np.memmap(path, np.uint8, "r" if capacity is None else "r+")
+        if self._buffer[:4].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a recorder segment")
+        self.capacity = int(self._buffer[8:12].view("<u4")[0])
+        self._count = self._buffer[12:16].view("<u4")
+        self.columns: dict[str, np.ndarray] = {}
+        offset = HEADER_SIZE
+        for name, dtype in COLUMNS:
+            size = self.capacity * dtype.itemsize
+            self.columns[name] = self._buffer[offset : offset + size].view(dtype)
+            offset += size
+
+    def __len__(self) -> int:
+        return int(self._count[0])
+
+    @property
+    def full(self) -> bool:
+        return len(self) >= self.capacity
+
+    def _write_symbols(self) -> None:
+        tmp = f"{self.symbols_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.names, f)
+        os.replace(tmp, self.symbols_path)
+
+    def intern(self, name: str) -> int:
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+            # Readers must find the symbol before any record referring to it
+            self._write_symbols()
+        return index
+
+    def append(self, timestamp: float, device: str, field: str, value: float) -> None:
+        i = len(self)
+        self.columns["timestamp"][i] = timestamp
+        self.columns["device"][i] = self.intern(device)
+        self.columns["field"][i] = self.intern(field)
+        self.columns["value"][i] = value
+        self._count[0] = i + 1
+
+    def read(self) -> Transitions:
+        """Copy the records written so far."""
+        count = len(self)
+        timestamp, device, field, value = (self.columns[name][:count].copy() for name, _ in COLUMNS)
+        return Transitions(timestamp, device, field, value, list(self.names))
+
+    def flush(self) -> None:
+        self._buffer.flush()
+
+
+_SEALED: dict[str, Segment] = {}
+_MERGED: tuple[tuple[str, ...], Transitions] = ((), Transitions.empty())
+
+
+def _open(path: str) -> Segment:
+    """Open a segment read-only. Full segments never change, so they are opened once."""
+    segment = _SEALED.get(path)
+    if segment is None:
+        segment = Segment(path)
+        if segment.full:
+            _SEALED[path] = segment
+    return segment
+
+
+def load(segments: _t.Iterable[Segment | str]) -> Transitions:
+    """Read segments into one set of transitions.
+
+    Full segments are read and joined once and kept in memory until the set of full segments
+    changes, so a query only reads the segments still being written.
+    """
+    global _MERGED
+    sealed: list[Segment] = []
+    live: list[Segment] = []
+    for segment in segments:
+        try:
+            segment = segment if isinstance(segment, Segment) else _open(segment)
+        except (OSError, ValueError):
+            LOGGER.warning("Skipping unreadable segment %s", segment)
+            continue
+        (sealed if segment.full else live).append(segment)
+    key = tuple(segment.path for segment in sealed)
+    if key != _MERGED[0]:
+        _MERGED = (
+            key,
+            concatenate([segment.read() for segment in sealed] or [Transitions.empty()]),
+        )
+    return concatenate([_MERGED[1], *(segment.read() for segment in live)])
+
+
+### Recorder
+
+
+class Recorder:
+    """Appends device state transitions to segment files and rotates them as they fill.
+
+    Every worker records the state changes it sees into its own segments; `load` merges them.
+    Only numeric and boolean state fields are recorded.
+
+    Args:
+        directory (str): Where the segments are kept
+        segment_size (int): Records per segment
+        retention (float): Seconds after which full segments are deleted
+    """
+
+    def __init__(self, directory: str, segment_size: int, retention: float) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        self.retention = retention
+        self._active: Segment | None = None
+        self._last: dict[tuple[str, str], float] = {}
+        self._recorded = metrics.counter("recorder_transitions_total")
+
+    def segments(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.seg")))
+
+    def _rotate(self) -> Segment:
+        if self._active is not None:
+            self._active.flush()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{time.time_ns()}-{os.getpid()}.seg")
+        self._active = Segment(path, self.segment_size)
+        LOGGER.info("Recording device state to %s", path)
+        self.prune()
+        return self._active
+
+    def prune(self) -> None:
+        """Delete full segments whose last record is older than the retention period."""
+        horizon = time.time() - self.retention
+        for path in self.segments():
+            try:
+                segment = _open(path)
+                if not (segment.full and segment.columns["timestamp"][-1] < horizon):
+                    continue
+                _SEALED.pop(path, None)
+                for file in (path, segment.symbols_path):
+                    os.remove(file)
+            except (OSError, ValueError):
+                # Another worker may be deleting it too, or still writing a new segment's header
+                LOGGER.debug("Skipping segment %s while pruning", path, exc_info=True)
+                continue
+            LOGGER.info("Deleted expired segment %s", path)
+
+    def record(self, source: str, device_id: str, state: _t.Mapping[str, _t.Any]) -> int:
+        """Append the fields of a device's state that changed since it was last recorded.
+
+        Returns:
+            int: The number of transitions recorded
+        """
+        now = time.time()
+        device = StateStore.key(source, device_id)
+        recorded = 0
+        for field, value in state.items():
+            if not isinstance(value, (bool, int, float)) or math.isnan(value):
+                continue
+            if self._last.get((device, field)) == value:
+                continue
+            segment = self._active
+            if segment is None or segment.full:
+                segment = self._rotate()
+            segment.append(now, device, field, float(value))
+            self._last[(device, field)] = value
+            recorded += 1
+        self._recorded.inc(recorded)
+        return recorded
+
+    def load(self) -> Transitions:
+        """Load the transitions recorded by every worker."""
+        active = self._active
+        return load(
+            active if active is not None and path == active.path else path
+            for path in self.segments()
+        )
+
+    def close(self) -> None:
+        if self._active is not None:
+            self._active.flush()
+            self._active = None
+
+
+RECORDER = Recorder(
+    settings.application_settings.recorder_dir,
+    settings.application_settings.recorder_segment_size,
+    settings.application_settings.recorder_retention_days * 86400,
+)
+
+
+### Aggregations
+
+
+def _labels(t: Transitions, device: np.ndarray) -> list[str]:
+    return [t.names[i] for i in device]
+
+
+def on_time(field: str, since: float, until: float) -> dict[str, float]:
+    """Get the seconds each device had a field above zero, e.g. `power` or `current_state`."""
+    t = RECORDER.load()
+    device, value, duration = t.spans(field, since, until)
+    seconds = np.bincount(device, weights=duration * (value > 0), minlength=len(t.names))
+    present = np.unique(device)
+    return dict(zip(_labels(t, present), seconds[present].tolist()))
+
+
+def time_at_value(field: str, since: float, until: float) -> dict[str, dict[str, float]]:
+    """Get the seconds each device spent at each value of a field, e.g. each fan `speed`."""
+    t = RECORDER.load()
+    device, value, duration = t.spans(field, since, until)
+    keep = duration > 0
+    levels, level = np.unique(value[keep], return_inverse=True)
+    key = device[keep].astype(int) * len(levels) + level
+    seconds = np.bincount(key, weights=duration[keep], minlength=len(t.names) * len(levels))
+    labels = [f"{float(level):g}" for level in levels]
+    result: dict[str, dict[str, float]] = {}
+    for i in np.flatnonzero(seconds):
+        device_index, level_index = divmod(int(i), len(levels))
+        result.setdefault(t.names[device_index], {})[labels[level_index]] = float(seconds[i])
+    return result
+
+
+def activity(since: float, until: float, field: str | None = None) -> dict[str, list[int]]:
+    """Count each device's transitions by hour of the day (local time)."""
+    t = RECORDER.load()
+    mask = (t.timestamp >= since) & (t.timestamp < until)
+    if field is not None:
+        mask &= t.field == t.symbol(field)
+    t = t.select(mask).changes()
+    # Local offsets are looked up per day rather than per record, which follows DST changes
+    days, day_index = np.unique(t.timestamp // 86400, return_inverse=True)
+    offsets = np.array([time.localtime(day * 86400 + 43200).tm_gmtoff for day in days.tolist()])
+    local = t.timestamp + (offsets[day_index] if len(offsets) else 0)
+    hour = (local // 3600 % 24).astype(int)
+    counts = np.bincount(t.device.astype(int) * 24 + hour, minlength=len(t.names) * 24)
+    present = np.unique(t.device)
+    return dict(zip(_labels(t, present), counts.reshape(-1, 24)[present].tolist()))
+
+
+### Lifecycle
+
+
+async def record(event: DeviceStateChanged) -> None:
+    source = "lutron" if isinstance(event, ZoneLevelChanged) else "bond"
+    # Appending may rotate the segment, which creates files and prunes old ones
+    await WRITER.run(RECORDER.record, source, event.device_id, event.state)
+
+
+async def startup() -> None:
+    LOGGER.debug("Running recorder startup hook")
+    BUS.subscribe("recorder", record, DeviceStateChanged, maxsize=1024)
+    await WRITER.run(RECORDER.prune)
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running recorder shutdown hook")
+    await WRITER.run(RECORDER.close)
@@ -1,6 +1,7 @@
 from . import app
 from . import bond
+from . import groups
 from . import lutron
 
 
-__all__ = ["app", "bond", "lutron"]
+__all__ = ["app", "bond", "groups", "lutron"]
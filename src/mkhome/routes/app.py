@@ -1,53 +1,311 @@
+import asyncio
+import datetime
 import logging
-import os
-import subprocess
-import threading
 import time
+import typing as _t
 
-from fastapi import BackgroundTasks, APIRouter, HTTPException
+import yaml
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from mkhome import deploy, history, leader, recorder, state
+from mkhome.bridges import bond, lutron
+from mkhome.automations import bindings, rules, scheduler
+from mkhome.settings import settings
+from mkhome.utils import admission, executors, metrics, profiling
+from mkhome.utils.responses import json_response
 
 
 LOGGER = logging.getLogger(__name__)
 ROUTER = APIRouter(prefix="/app")
 
 
-def restart() -> None:
-    cmd = [
-        ".venv/bin/python3",
-        "-m",
-        "uvicorn",
-        "mkhome:app",
-        "--host",
-        "0.0.0.0",
-        "--port",
-        "8582",
-        "--log-config",
-        "config/logging.yaml",
-        "--log-level",
-        "info",
-    ]
-    os.execvp(cmd[0], cmd)
+async def restart() -> None:
+    try:
+        await deploy.restart()
+    except Exception:
+        LOGGER.exception("Failed to restart application")
 
 
 @ROUTER.get("/update", status_code=202, tags=["Application"])
 async def update_application(background_tasks: BackgroundTasks) -> None:
+    """Pulls the latest `main` and hands over to a new worker running it"""
     try:
-        subprocess.run(["git", "checkout", "main"])
-        time.sleep(1)
-        subprocess.run(["git", "pull", "origin", "main"])
-        time.sleep(1)
+        await deploy.update()
         background_tasks.add_task(restart)
+    except HTTPException:
+        LOGGER.exception("Failed to update application")
+        raise
     except Exception:
         LOGGER.exception("Failed to update application")
         raise HTTPException(500, "Internal service error")
 
 
 @ROUTER.get("/restart", status_code=202, tags=["Application"])
-async def restart_application() -> None:
+async def restart_application(background_tasks: BackgroundTasks) -> None:
     """Restarts this application"""
     try:
-        t = threading.Thread(target=restart, daemon=False)
-        t.start()
+        background_tasks.add_task(restart)
     except Exception:
         LOGGER.exception("Failed to restart application")
         raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/health", tags=["Application"])
+async def get_health() -> dict[str, _t.Any]:
+    """Get whether each bridge is reachable and how quickly it responds"""
+    bonds = {b.label: b.health.status() for b in bond.BRIDGES.values()}
+    lutrons = {b.label: b.supervisor.status() for b in lutron.BRIDGES.values()}
+    healthy = all(s["state"] == "up" for s in bonds.values()) and all(
+        s["connected"] for s in lutrons.values()
+    )
+    return {"status": "ok" if healthy else "degraded", **bonds, **lutrons}
+
+
+@ROUTER.get("/metrics", tags=["Application"])
+async def get_metrics() -> dict[str, _t.Any]:
+    """Get the current value of every application metric"""
+    return metrics.snapshot()
+
+
+@ROUTER.get("/executors", tags=["Application"])
+async def get_executors() -> dict[str, dict[str, _t.Any]]:
+    """Get how busy each pool of threads for blocking calls is"""
+    return executors.status()
+
+
+@ROUTER.get("/admission", tags=["Application"])
+async def get_admission() -> dict[str, dict[str, _t.Any]]:
+    """Get the calls in flight to each bridge and those waiting for a slot, by priority"""
+    return admission.status()
+
+
+@ROUTER.get("/state", tags=["Application"], response_model=list[state.DeviceRecord])
+async def get_state() -> Response:
+    """Get the last known state of every device, as shared by all workers"""
+    return json_response(state.STORE.snapshot(), list[state.DeviceRecord])
+
+
+@ROUTER.get("/events", tags=["Application"], response_model=list[history.HistoryEntry])
+async def get_events(
+    device: str | None = None,
+    kind: _t.Annotated[history.Kind | None, Query(alias="type")] = None,
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+    limit: _t.Annotated[int, Query(ge=1, le=10000)] = 100,
+) -> Response:
+    """Get recent button gestures, bridge commands and automation runs handled by this worker,
+    newest first"""
+    entries = history.HISTORY.query(
+        device,
+        kind,
+        since.timestamp() if since else None,
+        until.timestamp() if until else None,
+        limit,
+    )
+    return json_response(entries, list[history.HistoryEntry])
+
+
+def time_range(
+    since: datetime.datetime | None = None, until: datetime.datetime | None = None
+) -> tuple[float, float]:
+    return (since.timestamp() if since else 0.0, until.timestamp() if until else time.time())
+
+
+TIME_RANGE = Depends(time_range)
+
+
+@ROUTER.get("/analytics/on-time", tags=["Application"])
+async def get_on_time(
+    field: str = "power",
+    window: tuple[float, float] = TIME_RANGE,
+) -> dict[str, float]:
+    """Get the seconds each device had a state field above zero, e.g. `power`, `light` or the
+    Lutron `current_state`"""
+    try:
+        return await asyncio.to_thread(recorder.on_time, field, *window)
+    except Exception:
+        LOGGER.exception("Failed to aggregate %s on-time", field)
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/analytics/levels", tags=["Application"])
+async def get_levels(
+    field: str = "speed",
+    window: tuple[float, float] = TIME_RANGE,
+) -> dict[str, dict[str, float]]:
+    """Get the seconds each device spent at each value of a state field, e.g. each fan `speed`"""
+    try:
+        return await asyncio.to_thread(recorder.time_at_value, field, *window)
+    except Exception:
+        LOGGER.exception("Failed to aggregate %s levels", field)
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/analytics/activity", tags=["Application"])
+async def get_activity(
+    field: str | None = None,
+    window: tuple[float, float] = TIME_RANGE,
+) -> dict[str, list[int]]:
+    """Count each device's state changes by hour of the day"""
+    try:
+        return await asyncio.to_thread(recorder.activity, *window, field)
+    except Exception:
+        LOGGER.exception("Failed to aggregate activity")
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/leader", tags=["Application"])
+async def get_leader() -> dict[str, _t.Any]:
+    """Get which worker handles button events and whether it is the one answering"""
+    return {**leader.read_status(), "is_leader": leader.is_leader()}
+
+
+@ROUTER.post("/bindings/reload", tags=["Application"])
+async def reload_bindings() -> dict[str, _t.Any]:
+    """Reload the button bindings file without restarting"""
+    try:
+        return await bindings.reload()
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        LOGGER.exception("Failed to reload bindings")
+        raise HTTPException(422, f"Invalid bindings file: {e}")
+    except Exception:
+        LOGGER.exception("Failed to reload bindings")
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/bindings", tags=["Application"])
+async def get_bindings() -> dict[str, _t.Any]:
+    """Get the compiled button dispatch table"""
+    table = bindings.TABLE
+    return {
+        "loaded": table.loaded,
+        "speculation": table.speculation,
+        "entries": [
+            {"button_id": button_id, "gesture": gesture, **entry._asdict()}
+            for (button_id, gesture), entry in table.entries.items()
+        ],
+    }
+
+
+@ROUTER.post("/rules/reload", tags=["Application"])
+async def reload_rules() -> dict[str, _t.Any]:
+    """Reload the rules file without restarting"""
+    try:
+        return await rules.reload()
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        LOGGER.exception("Failed to reload rules")
+        raise HTTPException(422, f"Invalid rules file: {e}")
+    except HTTPException:
+        LOGGER.exception("Failed to reload rules")
+        raise
+    except Exception:
+        LOGGER.exception("Failed to reload rules")
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/rules", tags=["Application"])
+async def get_rules() -> list[dict[str, _t.Any]]:
+    """Get how often each rule was evaluated and matched, and how long evaluating it took"""
+    return rules.stats()
+
+
+@ROUTER.get("/schedule", tags=["Application"])
+async def get_schedule() -> list[dict[str, _t.Any]]:
+    """Get every scheduled job and when it runs next"""
+    return [
+        {**job.model_dump(), "next_due": scheduler.SCHEDULER.next_due(job_id)}
+        for job_id, job in scheduler.SCHEDULER.jobs.items()
+    ]
+
+
+@ROUTER.post("/schedule", status_code=201, tags=["Application"])
+async def add_scheduled_job(job: scheduler.Job) -> scheduler.Job:
+    """Schedule a job, or replace the job with the same ID"""
+    try:
+        return await scheduler.SCHEDULER.add(job)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    except Exception:
+        LOGGER.exception("Failed to schedule job %s", job.name)
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.delete("/schedule/{job_id}", status_code=204, tags=["Application"])
+async def remove_scheduled_job(job_id: str) -> None:
+    """Remove a scheduled job"""
+    try:
+        removed = await scheduler.SCHEDULER.remove(job_id)
+    except Exception:
+        LOGGER.exception("Failed to remove job %s", job_id)
+        raise HTTPException(500, "Internal service error")
+    if not removed:
+        raise HTTPException(404, f"Job {job_id} not found")
+
+
+def profiling_enabled() -> None:
+    if not settings.application_settings.profiling:
+        raise HTTPException(404, "Profiling is disabled")
+
+
+PROFILING = Depends(profiling_enabled)
+
+
+@ROUTER.get("/profile", tags=["Application"], dependencies=[PROFILING])
+async def get_profile() -> dict[str, _t.Any] | None:
+    """Get the status of the running or last profiling session of this worker"""
+    return profiling.LAST.status() if profiling.LAST else None
+
+
+@ROUTER.post("/profile/start", status_code=201, tags=["Application"], dependencies=[PROFILING])
+async def start_profile(
+    duration: _t.Annotated[float | None, Query(gt=0)] = None,
+    requests: _t.Annotated[int | None, Query(ge=1)] = None,
+    events: _t.Annotated[int | None, Query(ge=1)] = None,
+    interval: _t.Annotated[float, Query(ge=0.001, le=1.0)] = 0.005,
+    threads: profiling.Threads = "loop",
+) -> dict[str, _t.Any]:
+    """Start sampling this worker for `duration` seconds, or while it handles the next `requests`
+    HTTP requests or `events` button gestures. Samples are read from `/app/profile/stacks`."""
+    if requests is not None and events is not None:
+        raise HTTPException(422, "Profile either requests or events")
+    mode: profiling.Mode = "requests" if requests else "events" if events else "window"
+    max_duration = settings.application_settings.profile_max_duration
+    try:
+        session = profiling.start(
+            mode,
+            requests or events,
+            min(duration or max_duration, max_duration),
+            interval,
+            threads,
+        )
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    LOGGER.warning("Started profiling session: %s", session.status())
+    return session.status()
+
+
+@ROUTER.post("/profile/stop", tags=["Application"], dependencies=[PROFILING])
+async def stop_profile() -> dict[str, _t.Any] | None:
+    """Stop the running profiling session"""
+    session = await asyncio.to_thread(profiling.stop)
+    return session.status() if session else None
+
+
+@ROUTER.get(
+    "/profile/stacks",
+    response_class=PlainTextResponse,
+    tags=["Application"],
+    dependencies=[PROFILING],
+)
+async def get_profile_stacks(download: bool = False) -> PlainTextResponse:
+    """Get the sampled stacks of the running or last session in the collapsed format read by
+    flame graph tools such as speedscope, inferno or flamegraph.pl"""
+    session = profiling.LAST
+    if session is None:
+        raise HTTPException(404, "No profiling session has run")
+    headers = {}
+    if download:
+        name = time.strftime("mkhome-%Y%m%d-%H%M%S", time.localtime(session.started))
+        headers["Content-Disposition"] = f'attachment; filename="{name}.folded"'
+    return PlainTextResponse(session.collapsed(), headers=headers)
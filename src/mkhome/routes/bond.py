@@ -1,14 +1,24 @@
+import inspect
 import logging
+import typing as _t
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from pydantic import BaseModel, Field, ValidationError, validate_call
 
+from mkhome import reconcile
 from mkhome.bridges import bond
+from mkhome.state import HASH_HEADER, STORE
+from mkhome.utils import admission, deadlines
+from mkhome.utils.responses import json_response
 
 
 LOGGER = logging.getLogger(__name__)
 ROUTER = APIRouter(prefix="/bond")
 
+# Default request budgets for a single bridge call and for an action preceded by a state read
+DEADLINE = Depends(deadlines.request_deadline(5.0))
+COMPOSITE_DEADLINE = Depends(deadlines.request_deadline(10.0))
+
 
 class SetBreezeRequest(BaseModel):
     enabled: bool
@@ -19,7 +29,7 @@ class SetBreezeRequest(BaseModel):
     """Variability of fan speed for breeze mode"""
 
 
-@ROUTER.get("/devices", tags=["Bond"])
+@ROUTER.get("/devices", tags=["Bond"], dependencies=[DEADLINE])
 async def get_devices() -> list[str]:
     """Get all devices attached to Bond Bridge
 
@@ -36,8 +46,13 @@ async def get_devices() -> list[str]:
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.get("/devices/{device_id}", tags=["Bond"])
-async def get_device(device_id: str) -> bond.BondDevice:
+@ROUTER.get(
+    "/devices/{device_id}",
+    tags=["Bond"],
+    dependencies=[DEADLINE],
+    response_model=bond.BondDevice,
+)
+async def get_device(device_id: str) -> Response:
     """Retrieve the data for a device attached to the Bond Bridge by its `device_id`.
 
     Args:
@@ -47,7 +62,7 @@ async def get_device(device_id: str) -> bond.BondDevice:
         BondDevice: The data for the retrieved Bond Bridge device
     """
     try:
-        return await bond.get_device(device_id)
+        return json_response(await bond.get_device(device_id))
     except HTTPException as exc:
         LOGGER.exception("Failed to retrieve Bond Bridge device %s", device_id)
         if exc.status_code == 404:
@@ -58,10 +73,51 @@ async def get_device(device_id: str) -> bond.BondDevice:
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.get("/devices/{device_id}/state", tags=["Bond"])
-async def get_state(device_id: str) -> bond.BondDeviceState:
+@ROUTER.get(
+    "/devices/{device_id}/state",
+    tags=["Bond"],
+    dependencies=[DEADLINE],
+    response_model=bond.BondDeviceState,
+)
+async def get_state(
+    device_id: str,
+    max_age: _t.Annotated[
+        float, Query(ge=0, description="Serve shared state up to this many seconds old")
+    ] = 0,
+    wait: _t.Annotated[
+        float,
+        Query(
+            ge=0,
+            le=deadlines.MAX_BUDGET,
+            description="Wait up to this many seconds for the state to differ from `since`",
+        ),
+    ] = 0,
+    since: _t.Annotated[
+        str | None, Query(description=f"The `{HASH_HEADER}` of the state the client has")
+    ] = None,
+) -> Response:
+    """Get the state of a device, with its hash in the `X-State-Hash` header.
+
+    With `wait`, the request is held until the state no longer has the hash `since`, or for
+    `wait` seconds, and then returns the current state. Waiting requests are woken by commands
+    sent to the device (see `bond.apply_effect`) and by the state other requests read, and make
+    no bridge calls of their own unless no state is known for the device yet.
+    """
     try:
-        return await bond.get_state(device_id)
+        record = STORE.get("bond", device_id)
+        if wait:
+            if record is None:
+                await bond.get_state(device_id)
+            record = await STORE.wait("bond", device_id, since, wait)
+        elif not max_age or record is None or record.age > max_age:
+            state = await bond.get_state(device_id)
+            record = STORE.get("bond", device_id)
+            return json_response(state, headers={HASH_HEADER: record.hash} if record else None)
+        if record is None:
+            raise HTTPException(404, f"No state known for Bond device {device_id}")
+        # Shared state was dumped from a validated model
+        state = bond.BondDeviceState.model_construct(**record.data, device_id=device_id)
+        return json_response(state, headers={HASH_HEADER: record.hash})
     except HTTPException:
         LOGGER.exception("Failed to retrieve state of Bond Bridge device %s", device_id)
         raise
@@ -70,217 +126,179 @@ async def get_state(device_id: str) -> bond.BondDeviceState:
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.put("/devices/{device_id}/power-on", tags=["Bond"])
-async def power_on(device_id: str) -> None:
-    try:
-        return await bond.power_on(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to power on Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to power on Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/power-on", tags=["Bond"])
-async def power_off(device_id: str) -> None:
-    try:
-        return await bond.power_off(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to power off Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to power off Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
+### Reconciliation
 
 
-@ROUTER.put("/devices/{device_id}/toggle-power", tags=["Bond"])
-async def toggle_power(device_id: str) -> None:
-    try:
-        return await bond.toggle_power(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to toggle power for Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to toggle power for Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
+@ROUTER.get("/reconcile", tags=["Bond"])
+async def get_reconcile() -> dict[str, _t.Any]:
+    """Get the devices whose belief state is still to be checked against the commands sent"""
+    return reconcile.RECONCILER.status()
 
 
-@ROUTER.put("/devices/{device_id}/set-timer/{duration}", tags=["Bond"])
-async def set_timer(device_id: str, duration: int | None) -> None:
+@ROUTER.post("/reconcile", tags=["Bond"], dependencies=[COMPOSITE_DEADLINE])
+async def run_reconcile() -> dict[str, str]:
+    """Check the belief state of every settled device now and report those another client
+    changed"""
     try:
-        return await bond.set_timer(device_id, duration)
+        return await reconcile.RECONCILER.reconcile()
     except HTTPException:
-        LOGGER.exception("Failed to set timer for Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to reconcile Bond Bridge belief state")
         raise
     except Exception:
-        LOGGER.exception("Failed to set timer for Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to reconcile Bond Bridge belief state")
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.put("/devices/{device_id}/set-speed/{speed}", tags=["Bond"])
-async def set_speed(device_id: str, speed: int) -> None:
-    try:
-        return await bond.set_speed(device_id, speed)
-    except HTTPException:
-        LOGGER.exception("Failed to set speed of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to set speed of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/increase-speed/{step}", tags=["Bond"])
-async def increase_speed(device_id: str, step: int) -> None:
-    try:
-        return await bond.increase_speed(device_id, step)
-    except HTTPException:
-        LOGGER.exception("Failed to increase speed of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to increase speed of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/decrease-speed/{step}", tags=["Bond"])
-async def decrease_speed(device_id: str, step: int) -> None:
-    try:
-        return await bond.decrease_speed(device_id, step)
-    except HTTPException:
-        LOGGER.exception("Failed to decrease speed of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to decrease speed of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/breeze-on", tags=["Bond"])
-async def breeze_on(device_id: str) -> None:
-    try:
-        return await bond.breeze_on(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to turn on breeze for Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to turn on breeze for Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/breeze-off", tags=["Bond"])
-async def breeze_off(device_id: str) -> None:
-    try:
-        return await bond.breeze_off(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to turn off breeze for Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to turn off breeze for Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/set-breeze", tags=["Bond"])
-async def set_breeze(device_id: str, req: SetBreezeRequest) -> None:
-    try:
-        return await bond.set_breeze(device_id, req.enabled, req.mean, req.var)
-    except HTTPException:
-        LOGGER.exception("Failed to set breeze for Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to set breeze for Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/set-direction/{direction}", tags=["Bond"])
-async def set_direction(device_id: str, direction: bond.DIRECTION) -> None:
-    try:
-        return await bond.set_direction(device_id, direction)
-    except HTTPException:
-        LOGGER.exception("Failed to set direction of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to set direction of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/toggle-direction", tags=["Bond"])
-async def toggle_direction(device_id: str) -> None:
-    try:
-        return await bond.toggle_direction(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to toggle direction of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to toggle direction of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/light-on", tags=["Bond"])
-async def light_on(device_id: str) -> None:
-    try:
-        return await bond.light_on(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to turn light on for Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to turn light on for Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
+### Actions
+
+
+class ActionRoute(_t.NamedTuple):
+    call: _t.Callable[..., _t.Awaitable[None]]
+    """The `mkhome.bridges.bond` function, called with the device ID and the arguments"""
+    requires: tuple[str, ...]
+    """Bond actions the device must support, checked before any bridge call is made"""
+    description: str
+    """Completes the log message `Failed to ... Bond Bridge device`"""
+    deadline: _t.Any = DEADLINE
+    body: type[BaseModel] | None = None
+    """A model the arguments are read from as the request body, rather than path parameters"""
+
+
+ACTIONS: dict[str, ActionRoute] = {
+    "power-on": ActionRoute(bond.power_on, ("TurnOn",), "power on"),
+    "power-off": ActionRoute(bond.power_off, ("TurnOff",), "power off"),
+    "toggle-power": ActionRoute(bond.toggle_power, ("TogglePower",), "toggle power for"),
+    "set-timer": ActionRoute(bond.set_timer, ("SetTimer",), "set timer for"),
+    "set-speed": ActionRoute(bond.set_speed, ("SetSpeed",), "set speed of"),
+    "increase-speed": ActionRoute(bond.increase_speed, ("IncreaseSpeed",), "increase speed of"),
+    "decrease-speed": ActionRoute(
+        bond.decrease_speed, ("DecreaseSpeed",), "decrease speed of", COMPOSITE_DEADLINE
+    ),
+    "breeze-on": ActionRoute(bond.breeze_on, ("BreezeOn",), "turn on breeze for"),
+    "breeze-off": ActionRoute(bond.breeze_off, ("BreezeOff",), "turn off breeze for"),
+    "set-breeze": ActionRoute(
+        bond.set_breeze, ("SetBreeze",), "set breeze for", body=SetBreezeRequest
+    ),
+    "set-direction": ActionRoute(bond.set_direction, ("SetDirection",), "set direction of"),
+    "toggle-direction": ActionRoute(
+        bond.toggle_direction, ("ToggleDirection",), "toggle direction of"
+    ),
+    "light-on": ActionRoute(
+        bond.light_on, ("TurnLightOn",), "turn light on for", COMPOSITE_DEADLINE
+    ),
+    "light-off": ActionRoute(
+        bond.light_off, ("TurnLightOff",), "turn light off for", COMPOSITE_DEADLINE
+    ),
+    "toggle-light": ActionRoute(bond.toggle_light, ("ToggleLight",), "toggle light of"),
+    "set-brightness": ActionRoute(
+        bond.set_brightness, ("SetBrightness",), "set brightness of", COMPOSITE_DEADLINE
+    ),
+    "increase-brightness": ActionRoute(
+        bond.increase_brightness, ("IncreaseBrightness",), "increase brightness of"
+    ),
+    "decrease-brightness": ActionRoute(
+        bond.decrease_brightness, ("DecreaseBrightness",), "decrease brightness of"
+    ),
+    "dim-mode": ActionRoute(bond.dim_mode, ("DimMode",), "start dim mode for"),
+}
+"""Device actions by route name. Each is served at `/devices/{device_id}/actions/{name}` and at
+`/devices/{device_id}/{name}` followed by its arguments as path parameters."""
+
+_CALLS = {name: validate_call(route.call) for name, route in ACTIONS.items()}
+
+
+async def dispatch(name: str, device_id: str, args: _t.Mapping[str, _t.Any]) -> None:
+    """Run an action from `ACTIONS` on a device.
 
+    Args:
+        name (str): The route name of the action, e.g. `set-speed`
+        device_id (str): The ID of the device
+        args (Mapping[str, Any]): The action's arguments, e.g. `{"speed": 3}`
 
-@ROUTER.put("/devices/{device_id}/light-on", tags=["Bond"])
-async def light_off(device_id: str) -> None:
+    Raises:
+        HTTPException: A 400 if the device does not support the action, a 422 if the arguments
+            are invalid, or the error from the bridge
+    """
+    route = ACTIONS[name]
     try:
-        return await bond.light_off(device_id)
+        # The capability check and the state read some actions start with are part of the write
+        with admission.priority(admission.Priority.WRITE):
+            for action in route.requires:
+                await bond.check_action(device_id, action)
+            if route.body is not None:
+                args = route.body.model_validate(args).model_dump()
+            await _CALLS[name](device_id, **args)
+    except ValidationError as e:
+        LOGGER.warning(
+            "Invalid arguments to %s Bond Bridge device %s", route.description, device_id
+        )
+        raise HTTPException(422, e.errors(include_url=False, include_context=False)) from None
     except HTTPException:
-        LOGGER.exception("Failed to turn light on for Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to %s Bond Bridge device %s", route.description, device_id)
         raise
     except Exception:
-        LOGGER.exception("Failed to turn light on for Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to %s Bond Bridge device %s", route.description, device_id)
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.put("/devices/{device_id}/toggle-light", tags=["Bond"])
-async def toggle_light(device_id: str) -> None:
-    try:
-        return await bond.toggle_light(device_id)
-    except HTTPException:
-        LOGGER.exception("Failed to toggle light of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to toggle light of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
+@ROUTER.put(
+    "/devices/{device_id}/actions/{action}", tags=["Bond"], dependencies=[COMPOSITE_DEADLINE]
+)
+async def execute_action(
+    device_id: str,
+    action: str,
+    args: _t.Annotated[dict[str, _t.Any] | None, Body(description="The action's arguments")] = None,
+) -> None:
+    """Run an action on a device.
 
-@ROUTER.put("/devices/{device_id}/set-brightness/{brightness}", tags=["Bond"])
-async def set_brightness(device_id: str, brightness: int) -> None:
-    try:
-        return await bond.set_brightness(device_id, brightness)
-    except HTTPException:
-        LOGGER.exception("Failed to set brightness of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to set brightness of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
-
-
-@ROUTER.put("/devices/{device_id}/increase-brightness/{amount}", tags=["Bond"])
-async def increase_brightness(device_id: str, amount: int) -> None:
+    `action` is either a name from `ACTIONS`, e.g. `set-speed` with `{"speed": 3}`, or a Bond
+    action, e.g. `Open`, which is sent to the bridge with the body as its payload. Either way an
+    action the device does not support is rejected without contacting the bridge.
+    """
+    if action in ACTIONS:
+        return await dispatch(action, device_id, args or {})
+    if not action[:1].isupper():
+        raise HTTPException(404, f"Unknown action {action}")
     try:
-        return await bond.increase_brightness(device_id, amount)
+        with admission.priority(admission.Priority.WRITE):
+            await bond.send_action(device_id, action, args or {})
     except HTTPException:
-        LOGGER.exception("Failed to increase brightness of Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to run %s on Bond Bridge device %s", action, device_id)
         raise
     except Exception:
-        LOGGER.exception("Failed to increase brightness of Bond Bridge device %s", device_id)
+        LOGGER.exception("Failed to run %s on Bond Bridge device %s", action, device_id)
         raise HTTPException(500, "Internal service error")
 
 
-@ROUTER.put("/devices/{device_id}/decrease-brightness/{amount}", tags=["Bond"])
-async def decrease_brightness(device_id: str, amount: int) -> None:
-    try:
-        return await bond.decrease_brightness(device_id, amount)
-    except HTTPException:
-        LOGGER.exception("Failed to decrease brightness of Bond Bridge device %s", device_id)
-        raise
-    except Exception:
-        LOGGER.exception("Failed to decrease brightness of Bond Bridge device %s", device_id)
-        raise HTTPException(500, "Internal service error")
+def _action_endpoint(name: str, route: ActionRoute) -> tuple[str, _t.Callable[..., _t.Any]]:
+    """Build the path and endpoint serving an action with its arguments in the path."""
+    parameters = [inspect.Parameter("device_id", inspect.Parameter.KEYWORD_ONLY, annotation=str)]
+    if route.body is not None:
+        parameters.append(
+            inspect.Parameter("req", inspect.Parameter.KEYWORD_ONLY, annotation=route.body)
+        )
+        path_args = []
+    else:
+        path_args = [
+            p.replace(kind=inspect.Parameter.KEYWORD_ONLY)
+            for p in list(inspect.signature(route.call).parameters.values())[1:]
+        ]
+        parameters.extend(path_args)
+
+    async def endpoint(device_id: str, **args: _t.Any) -> None:
+        if "req" in args:
+            args = args["req"].model_dump()
+        await dispatch(name, device_id, args)
+
+    endpoint.__name__ = name.replace("-", "_")
+    endpoint.__doc__ = route.call.__doc__
+    endpoint.__signature__ = inspect.Signature(parameters, return_annotation=None)  # type: ignore
+    path = "/".join([f"/devices/{{device_id}}/{name}", *(f"{{{p.name}}}" for p in path_args)])
+    return path, endpoint
+
+
+for _name, _route in ACTIONS.items():
+    _path, _endpoint = _action_endpoint(_name, _route)
+    ROUTER.add_api_route(
+        _path, _endpoint, methods=["PUT"], tags=["Bond"], dependencies=[_route.deadline]
+    )
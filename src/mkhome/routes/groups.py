@@ -0,0 +1,67 @@
+import logging
+import typing as _t
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+
+from mkhome import groups
+from mkhome.utils import admission, deadlines
+
+
+LOGGER = logging.getLogger(__name__)
+ROUTER = APIRouter(prefix="/groups", dependencies=[Depends(deadlines.request_deadline(10.0))])
+
+
+@ROUTER.get("", tags=["Groups"])
+async def get_groups() -> list[groups.Group]:
+    try:
+        return list((await groups.get_groups()).values())
+    except HTTPException:
+        LOGGER.exception("Failed to retrieve groups")
+        raise
+    except Exception:
+        LOGGER.exception("Failed to retrieve groups")
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.get("/{name}", tags=["Groups"])
+async def get_group(name: str) -> groups.Group:
+    try:
+        return await groups.get_group(name)
+    except HTTPException:
+        LOGGER.exception("Failed to retrieve group %s", name)
+        raise
+    except Exception:
+        LOGGER.exception("Failed to retrieve group %s", name)
+        raise HTTPException(500, "Internal service error")
+
+
+async def run(name: str, command: groups.Command, value: int | None = None) -> groups.GroupResult:
+    try:
+        # The reads that decide each device's steps are part of the command
+        with admission.priority(admission.Priority.WRITE):
+            return await groups.run(name, command, value)
+    except HTTPException:
+        LOGGER.exception("Failed to run %s on group %s", command, name)
+        raise
+    except Exception:
+        LOGGER.exception("Failed to run %s on group %s", command, name)
+        raise HTTPException(500, "Internal service error")
+
+
+@ROUTER.put("/{name}/off", tags=["Groups"])
+async def turn_off(name: str) -> groups.GroupResult:
+    """Turn off every device in the group: fans, lights and Lutron zones."""
+    return await run(name, "off")
+
+
+@ROUTER.put("/{name}/set-speed/{speed}", tags=["Groups"])
+async def set_speed(name: str, speed: _t.Annotated[int, Path(ge=0)]) -> groups.GroupResult:
+    """Set the speed of every fan in the group. Zero turns them off. Lutron fan controllers have
+    four speeds, so higher speeds set them to high."""
+    return await run(name, "set-speed", speed)
+
+
+@ROUTER.put("/{name}/set-level/{level}", tags=["Groups"])
+async def set_level(name: str, level: _t.Annotated[int, Path(ge=0, le=100)]) -> groups.GroupResult:
+    """Set the level of every Lutron dimmer and the brightness of every Bond light in the group."""
+    return await run(name, "set-level", level)
@@ -1,21 +1,25 @@
 import logging
+import typing as _t
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
 from mkhome.bridges import lutron
+from mkhome.state import HASH_HEADER, STORE
+from mkhome.utils import deadlines
+from mkhome.utils.responses import json_response
 
 
 LOGGER = logging.getLogger(__name__)
-ROUTER = APIRouter(prefix="/lutron")
+ROUTER = APIRouter(prefix="/lutron", dependencies=[Depends(deadlines.request_deadline(5.0))])
 
 
 ### Devices
 
 
-@ROUTER.get("/devices", tags=["Lutron"])
-async def get_devices() -> list[lutron.LutronDevice]:
+@ROUTER.get("/devices", tags=["Lutron"], response_model=list[lutron.LutronDevice])
+async def get_devices() -> Response:
     try:
-        return await lutron.get_devices()
+        return json_response(await lutron.get_devices(), list[lutron.LutronDevice])
     except HTTPException:
         LOGGER.exception("Failed to retrieve Lutron devices")
         raise
@@ -36,6 +40,44 @@ async def get_device(device_id: str) -> lutron.LutronDevice:
         raise HTTPException(500, "Internal service error")
 
 
+@ROUTER.get("/devices/{device_id}/state", tags=["Lutron"], response_model=lutron.LutronDeviceState)
+async def get_state(
+    device_id: str,
+    wait: _t.Annotated[
+        float,
+        Query(
+            ge=0,
+            le=deadlines.MAX_BUDGET,
+            description="Wait up to this many seconds for the state to differ from `since`",
+        ),
+    ] = 0,
+    since: _t.Annotated[
+        str | None, Query(description=f"The `{HASH_HEADER}` of the state the client has")
+    ] = None,
+) -> Response:
+    """Get the level of a device, with its hash in the `X-State-Hash` header.
+
+    With `wait`, the request is held until the state no longer has the hash `since`, or for
+    `wait` seconds, and then returns the current state. The bridge pushes level changes, so
+    waiting requests never call it.
+    """
+    try:
+        # Read from the client's device table, so this refreshes the shared state for free
+        state = await lutron.get_state(device_id)
+        record = STORE.get("lutron", device_id)
+        if wait:
+            record = await STORE.wait("lutron", device_id, since, wait)
+            if record is not None:
+                state = lutron.LutronDeviceState.model_construct(**record.data, device_id=device_id)
+        return json_response(state, headers={HASH_HEADER: record.hash} if record else None)
+    except HTTPException:
+        LOGGER.exception("Failed to retrieve state of Lutron device %s", device_id)
+        raise
+    except Exception:
+        LOGGER.exception("Failed to retrieve state of Lutron device %s", device_id)
+        raise HTTPException(500, "Internal service error")
+
+
 ### Switches
 
 
@@ -66,10 +108,10 @@ async def turn_off_switch(device_id: str) -> None:
 ### Buttons
 
 
-@ROUTER.get("/buttons/", tags=["Lutron"])
-async def get_buttons() -> list[lutron.LutronButton]:
+@ROUTER.get("/buttons/", tags=["Lutron"], response_model=list[lutron.LutronButton])
+async def get_buttons() -> Response:
     try:
-        return await lutron.get_buttons()
+        return json_response(await lutron.get_buttons(), list[lutron.LutronButton])
     except HTTPException:
         LOGGER.exception("Failed to retrieve Lutron buttons")
         raise
@@ -1,7 +1,7 @@
 import logging
 import typing as _t
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from pydantic_settings import (
     BaseSettings as PydanticBaseSettings,
     PydanticBaseSettingsSource,
@@ -11,6 +11,15 @@ from pydantic_settings import (
 
 
 LOGGER = logging.getLogger(__name__)
+DEFAULT_BRIDGE = "default"
+"""The name of the bridge configured by the top-level settings of a bridge type"""
+
+
+def validate_bridge_names[T](bridges: dict[str, T]) -> dict[str, T]:
+    for name in bridges:
+        if name == DEFAULT_BRIDGE or not name or ":" in name:
+            raise ValueError(f"Invalid bridge name '{name}'")
+    return bridges
 
 
 class BaseSettings(PydanticBaseSettings):
@@ -27,12 +36,58 @@ class BaseSettings(PydanticBaseSettings):
         )
 
 
+class ExecutorSettings(BaseModel):
+    workers: int = 4
+    """Threads running blocking calls at once"""
+    queue_size: int = 64
+    """Calls that may wait for a thread before further calls are rejected"""
+
+
 class ApplicationSettings(BaseSettings):
     debug: bool = False
     title: str = "FastAPI"
     summary: str | None = None
     description: str = ""
     version: str = "0.1.0"
+    workers: int = 1
+    """Number of uvicorn worker processes, started by `mkhome.supervisor`"""
+    state_file: str = "mkhome.state.json"
+    """File the workers share device state through"""
+    leader_file: str = "mkhome.leader"
+    """Lock file (and `.json` status file) used to elect the worker that handles button events"""
+    leader_interval: float = 1.0
+    """Seconds between leadership attempts and heartbeats"""
+    bindings_file: str = "config/bindings.yaml"
+    """Button bindings, see `mkhome.automations.bindings`"""
+    rules_file: str = "config/rules.yaml"
+    """Conditional automations, see `mkhome.automations.rules`"""
+    scheduler_file: str = "mkhome.schedule.json"
+    """Scheduled jobs and their last runs, shared by the workers"""
+    latitude: float | None = None
+    """Degrees north, for sunrise and sunset schedules"""
+    longitude: float | None = None
+    """Degrees east, for sunrise and sunset schedules"""
+    history_size: int = 10000
+    """Gestures, commands and automation runs kept in memory for `/app/events`"""
+    recorder_dir: str = "mkhome.recorder"
+    """Directory the device state history is recorded to"""
+    recorder_segment_size: int = 65536
+    """Transitions per recorder segment file (16 bytes each)"""
+    recorder_retention_days: float = 400
+    """Days after which full recorder segments are deleted"""
+    groups_file: str = "config/groups.yaml"
+    """Device groups, see `mkhome.groups`"""
+    group_areas_ttl: float = 300.0
+    """Seconds the groups made from the bridges' rooms are cached before they are read again"""
+    profiling: bool = False
+    """Whether the `/app/profile` routes may sample the running process"""
+    profile_max_duration: float = 300.0
+    """Seconds after which a profiling session stops, however it was started"""
+    automation_executor: ExecutorSettings = Field(default_factory=ExecutorSettings)
+    """Threads for blocking event handlers and button listeners"""
+    bindings_watch_interval: float = 2.0
+    """Seconds between checks of the bindings, rules and schedule files for changes. Zero disables
+    it."""
 
     model_config = SettingsConfigDict(
         extra="ignore",
@@ -40,26 +95,178 @@ class ApplicationSettings(BaseSettings):
     )
 
 
+class ResilienceSettings(BaseModel):
+    connect_timeout: float = 2.0
+    """Seconds to wait for a connection to the bridge"""
+    read_timeout: float = 5.0
+    """Seconds to wait for the bridge to respond"""
+    retry_attempts: int = 3
+    """Total attempts for idempotent (read) calls"""
+    retry_max_wait: float = 1.0
+    """Upper bound in seconds of the jittered backoff between attempts"""
+    failure_threshold: int = 5
+    """Consecutive failures that open the circuit breaker"""
+    reset_timeout: float = 30.0
+    """Seconds an open circuit fails fast before letting a trial call through"""
+
+
+class HealthSettings(BaseModel):
+    min_interval: float = 2.0
+    """Seconds between probes while the bridge is slow or failing"""
+    max_interval: float = 30.0
+    """Seconds between probes while the bridge is healthy"""
+    degraded_rtt: float = 0.5
+    """Smoothed round-trip seconds above which the bridge counts as degraded"""
+    down_after: int = 3
+    """Consecutive failures after which the bridge counts as down and calls fail fast"""
+    adaptive_timeout: bool = False
+    """Derive the read timeout from the measured round-trip time instead of `read_timeout`"""
+    min_timeout: float = 1.0
+    """Lower bound in seconds of the adaptive read timeout"""
+
+
+class AdmissionSettings(BaseModel):
+    limit: int = 4
+    """Calls to the bridge in flight at once"""
+    reserved: int = 1
+    """Slots only button presses and automations may take, so they never wait behind the API"""
+    read_queue: int = 16
+    """API reads that may wait for a slot before further reads are rejected"""
+    read_max_wait: float = 1.0
+    """Seconds an API read may wait for a slot before it is rejected"""
+
+
+class ReconcileSettings(BaseModel):
+    interval: float = 5.0
+    """Seconds between checks of the belief state of the devices commands were sent to. Zero
+    disables it."""
+    settle: float = 2.0
+    """Seconds after the last command to a device before its belief state is checked"""
+    window: float = 60.0
+    """Seconds after the last command to a device after which it is no longer checked"""
+
+
+class ButtonTimingSettings(BaseModel):
+    long_press_duration: float = 1.0
+    """Seconds a button must be held to count as a long press"""
+    double_click_duration: float = 0.5
+    """Seconds after a release during which another press makes a double-click"""
+    adaptive: bool = False
+    """Tighten both durations to the press history of each button"""
+    min_samples: int = 20
+    """Presses to observe before adapting"""
+    halflife: int = 100
+    """Presses after which an observation counts half as much"""
+    quantile: float = 0.95
+    """Quantile of the observed double-click gaps and click holds the adapted durations must
+    cover"""
+    margin: float = 1.25
+    """Factor applied to the quantile for slack"""
+    min_double_click_duration: float = 0.2
+    min_long_press_duration: float = 0.5
+
+
+class BondBridgeConfig(BaseModel):
+    bridge_url: str
+    token: str | None = None
+    """The bridge's local token. Read from the bridge when unset, which it only allows shortly
+    after being powered on; startup fails if it is locked and this is unset."""
+
+
 class BondBridgeSettings(BaseSettings):
     bridge_url: str = Field(default=...)
+    token: str | None = None
+    """The local token of the bridge at `bridge_url`, from `token` under `[tool.project.bond]` or
+    the `BOND_TOKEN` environment variable. Required once the bridge is locked: it only gives out
+    its token shortly after being powered on, and startup fails without one."""
+    bridges: dict[str, BondBridgeConfig] = Field(default_factory=dict)
+    """Further bridges by name. Each gets its own threads, token and pacing, and the other
+    settings apply to each. Device IDs must be unique across bridges (Bond generates them)."""
+    resilience: ResilienceSettings = Field(default_factory=ResilienceSettings)
+    health: HealthSettings = Field(default_factory=HealthSettings)
+    executor: ExecutorSettings = Field(default_factory=ExecutorSettings)
+    """Threads for HTTP requests to the bridge"""
+    admission: AdmissionSettings = Field(default_factory=AdmissionSettings)
+    """Concurrency limit and priorities of the calls to the bridge"""
+    dedup_window: float = 2.5
+    """Seconds during which an action another source (a button, rule, job or the API) already
+    sent to the same device, or one undoing its step or toggle, is dropped. Repeats from the same
+    source are always sent."""
+    capabilities_ttl: float = 3600.0
+    """Seconds the actions a device supports are cached before they are read again"""
+    reconcile: ReconcileSettings = Field(default_factory=ReconcileSettings)
+    """Correction of the belief state the bridge keeps for devices without state feedback"""
 
     model_config = SettingsConfigDict(
         extra="ignore",
+        env_prefix="bond_",
         pyproject_toml_table_header=("tool", "project", "bond"),
     )
 
+    @field_validator("bridges")
+    @classmethod
+    def validate_bridges(cls, v: dict[str, BondBridgeConfig]) -> dict[str, BondBridgeConfig]:
+        return validate_bridge_names(v)
+
+    def configs(self) -> dict[str, BondBridgeConfig]:
+        """Every bridge by name, starting with the default one."""
+        default = BondBridgeConfig(bridge_url=self.bridge_url, token=self.token)
+        return {DEFAULT_BRIDGE: default, **self.bridges}
+
+
+class LutronBridgeConfig(BaseModel):
+    bridge_ip: str
+    client_key: str
+    client_certificate: str
+    bridge_certificate: str
+
 
 class LutronBridgeSettings(BaseSettings):
     bridge_ip: str = Field(default=...)
     client_key: str = Field(default=...)
     client_certificate: str = Field(default=...)
     bridge_certificate: str = Field(default=...)
+    bridges: dict[str, LutronBridgeConfig] = Field(default_factory=dict)
+    """Further bridges by name, each with its own connection and pacing. Their device, button
+    and area IDs are prefixed with the bridge name, e.g. `upstairs:12`, as every bridge numbers
+    its devices from 1."""
+    resilience: ResilienceSettings = Field(default_factory=ResilienceSettings)
+    executor: ExecutorSettings = Field(default_factory=lambda: ExecutorSettings(workers=2))
+    """Threads for reading the bridge client's device tables"""
+    admission: AdmissionSettings = Field(default_factory=AdmissionSettings)
+    """Concurrency limit and priorities of the commands sent to the bridge"""
+    button_timing: ButtonTimingSettings = Field(default_factory=ButtonTimingSettings)
+    button_timing_overrides: dict[str, ButtonTimingSettings] = Field(default_factory=dict)
+    """Gesture timing for specific buttons, keyed by button ID"""
+    supervise_interval: float = 1.0
+    """Seconds between checks of the bridge connection"""
+    reconnect_grace: float = 10.0
+    """Seconds the bridge client may take to reconnect by itself before it is reset"""
+    reconnect_max_wait: float = 60.0
+    """Upper bound in seconds of the jittered backoff between reconnection attempts"""
+    login_timeout: float = 30.0
+    """Seconds a connection attempt may take, including loading the devices"""
 
     model_config = SettingsConfigDict(
         extra="ignore",
         pyproject_toml_table_header=("tool", "project", "lutron"),
     )
 
+    @field_validator("bridges")
+    @classmethod
+    def validate_bridges(cls, v: dict[str, LutronBridgeConfig]) -> dict[str, LutronBridgeConfig]:
+        return validate_bridge_names(v)
+
+    def configs(self) -> dict[str, LutronBridgeConfig]:
+        """Every bridge by name, starting with the default one."""
+        default = LutronBridgeConfig(
+            bridge_ip=self.bridge_ip,
+            client_key=self.client_key,
+            client_certificate=self.client_certificate,
+            bridge_certificate=self.bridge_certificate,
+        )
+        return {DEFAULT_BRIDGE: default, **self.bridges}
+
 
 class Settings(BaseModel):
     application_settings: ApplicationSettings
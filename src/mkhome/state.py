@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import typing as _t
+
+from filelock import FileLock, Timeout
+from pydantic import BaseModel, TypeAdapter
+
+from mkhome.settings import settings
+from mkhome.utils import metrics
+
+
+LOGGER = logging.getLogger(__name__)
+HASH_HEADER = "X-State-Hash"
+
+
+def state_hash(data: _t.Mapping[str, _t.Any]) -> str:
+    """A short digest of a device's state, which changes whenever the state does."""
+    encoded = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.blake2s(encoded, digest_size=8).hexdigest()
+
+
+class DeviceRecord(BaseModel):
+    source: str
+    """The bridge the device belongs to, e.g. `bond` or `lutron`"""
+    device_id: str
+    data: dict[str, _t.Any]
+    """The last known state of the device"""
+    updated: float
+    """The `time.time()` the state was last changed"""
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.updated
+
+    @functools.cached_property
+    def hash(self) -> str:
+        return state_hash(self.data)
+
+
+_RECORDS = TypeAdapter(dict[str, DeviceRecord])
+
+
+class StateStore:
+    """Last known device state, shared by every worker through a JSON file.
+
+    Workers update their in-memory copy and a background task merges it with the file: local
+    changes are written (atomically, under a file lock) and changes written by other workers are
+    picked up when the file's modification time moves. The newest `updated` wins per device.
+    Reading the store never touches the file, and `wait` lets a coroutine sleep until a device's
+    state changes, whichever worker changed it.
+
+    Args:
+        path (str): The file shared by the workers
+        sync_interval (float): Seconds between synchronizations with the file
+    """
+
+    def __init__(self, path: str, sync_interval: float = 0.5) -> None:
+        self.path = path
+        self.sync_interval = sync_interval
+        self._file_lock = FileLock(f"{path}.lock")
+        self._records: dict[str, DeviceRecord] = {}
+        self._dirty: set[str] = set()
+        self._mtime_ns = 0
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._watchers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._waiting = metrics.gauge("state_waiters")
+
+    @staticmethod
+    def key(source: str, device_id: str | int) -> str:
+        return f"{source}:{device_id}"
+
+    def get(self, source: str, device_id: str | int) -> DeviceRecord | None:
+        return self._records.get(self.key(source, device_id))
+
+    def snapshot(self) -> list[DeviceRecord]:
+        return list(self._records.values())
+
+    def update(
+        self, source: str, device_id: str | int, data: _t.Mapping[str, _t.Any]
+    ) -> DeviceRecord:
+        """Merge `data` into the state of a device.
+
+        Args:
+            source (str): The bridge the device belongs to
+            device_id (str | int): The ID of the device on that bridge
+            data (Mapping): The changed state fields
+
+        Returns:
+            DeviceRecord: The updated record
+        """
+        key = self.key(source, device_id)
+        with self._lock:
+            previous = self._records.get(key)
+            merged = {**previous.data, **data} if previous else dict(data)
+            if previous is not None and merged == previous.data:
+                return previous
+            # Built from values already validated by the bridge modules
+            record = DeviceRecord.model_construct(
+                source=source, device_id=str(device_id), data=merged, updated=time.time()
+            )
+            self._records[key] = record
+            self._dirty.add(key)
+            self._notify(key)
+        return record
+
+    def _notify(self, key: str) -> None:
+        # Called with the lock held, from any thread
+        for loop, event in self._watchers.get(key, ()):
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(event.set)
+
+    async def wait(
+        self, source: str, device_id: str | int, since: str | None, timeout: float
+    ) -> DeviceRecord | None:
+        """Wait until the state of a device differs from the state with hash `since`.
+
+        Args:
+            source (str): The bridge the device belongs to
+            device_id (str | int): The ID of the device on that bridge
+            since (str | None): The `DeviceRecord.hash` the caller already has. None returns any
+                known state at once.
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            DeviceRecord | None: The current record, which is unchanged if the wait timed out
+        """
+        key = self.key(source, device_id)
+        watcher = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._watchers.setdefault(key, set()).add(watcher)
+        self._waiting.inc()
+        try:
+            async with asyncio.timeout(timeout):
+                while True:
+                    # Cleared before reading, so a change made in between still wakes us
+                    watcher[1].clear()
+                    record = self._records.get(key)
+                    if record is not None and record.hash != since:
+                        return record
+                    await watcher[1].wait()
+        except TimeoutError:
+            return self._records.get(key)
+        finally:
+            self._waiting.dec()
+            with self._lock:
+                watchers = self._watchers[key]
+                watchers.discard(watcher)
+                if not watchers:
+                    del self._watchers[key]
+
+    def _merge(self, records: dict[str, DeviceRecord]) -> None:
+        with self._lock:
+            for key, record in records.items():
+                current = self._records.get(key)
+                if current is None or record.updated > current.updated:
+                    self._records[key] = record
+                    self._notify(key)
+
+    def sync(self) -> None:
+        """Exchange changes with the shared file. Blocking, so run it in a thread."""
+        try:
+            with self._file_lock.acquire(timeout=self.sync_interval):
+                try:
+                    mtime_ns = os.stat(self.path).st_mtime_ns
+                except FileNotFoundError:
+                    mtime_ns = 0
+                if mtime_ns and mtime_ns != self._mtime_ns:
+                    with open(self.path, "rb") as f:
+                        self._merge(_RECORDS.validate_json(f.read()))
+                    self._mtime_ns = mtime_ns
+                with self._lock:
+                    if not self._dirty:
+                        return
+                    payload = _RECORDS.dump_json(self._records)
+                    self._dirty.clear()
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp, self.path)
+                self._mtime_ns = os.stat(self.path).st_mtime_ns
+        except Timeout:
+            LOGGER.debug("State file busy, synchronizing later")
+        except ValueError:
+            LOGGER.exception("Ignoring unreadable state file %s", self.path)
+            self._mtime_ns = mtime_ns
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception:
+                LOGGER.exception("Failed to synchronize device state")
+            await asyncio.sleep(self.sync_interval)
+
+    async def startup(self) -> None:
+        await asyncio.to_thread(self.sync)
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        await asyncio.to_thread(self.sync)
+
+
+STORE = StateStore(settings.application_settings.state_file)
+
+
+async def startup() -> None:
+    LOGGER.debug("Running device state startup hook")
+    await STORE.startup()
+
+
+async def shutdown() -> None:
+    LOGGER.debug("Running device state shutdown hook")
+    await STORE.shutdown()
@@ -0,0 +1,162 @@
+"""Keeps one server running on a listening socket and replaces it without dropping connections.
+
+Run as the service's main process (see `scripts/service.sh`):
+
+    python -m mkhome.supervisor --host 0.0.0.0 --port 8582
+
+The supervisor binds the socket and starts uvicorn on it with `--fd`, with as many workers as
+`application.workers`. On `SIGHUP` (sent by `/app/restart` and `/app/update`) it starts a
+successor server on the same socket, waits until every successor worker reports ready and then
+stops the old server, which finishes in-flight requests and resigns leadership on shutdown. If the
+successor never becomes ready it is killed and the old server keeps serving. Either way the
+supervisor stays the process the service manager tracks. Under systemd use `KillMode=mixed`, so a
+stop reaches the server through the supervisor.
+
+The supervisor only imports the settings, never the application or its bridges.
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+from mkhome.settings import settings
+
+
+LOGGER = logging.getLogger(__name__)
+
+SUPERVISOR_ENV = "MKHOME_SUPERVISOR"
+"""Set to the supervisor's pid in the environment of the servers it starts"""
+READY_FILE_ENV = "MKHOME_READY_FILE"
+READY_TIMEOUT = 120.0
+POLL_INTERVAL = 0.2
+
+
+def uvicorn_command(*args: str) -> list[str]:
+    workers = settings.application_settings.workers
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "mkhome:app",
+        *args,
+        *(("--workers", str(workers)) if workers > 1 else ()),
+        "--log-config",
+        "config/logging.yaml",
+        "--log-level",
+        "info",
+    ]
+
+
+class Supervisor:
+    """Runs the server on `sock` and hands the socket to a successor on `SIGHUP`.
+
+    Args:
+        sock (socket.socket): The bound, listening socket the servers accept connections on
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.restart_requested = False
+        self.stopping = False
+
+    def spawn(self, ready_file: str | None = None) -> subprocess.Popen:
+        fd = self.sock.fileno()
+        env = {**os.environ, SUPERVISOR_ENV: str(os.getpid())}
+        if ready_file is not None:
+            env[READY_FILE_ENV] = ready_file
+        return subprocess.Popen(uvicorn_command("--fd", str(fd)), pass_fds=(fd,), env=env)
+
+    def _on_restart(self, signum: int, frame: types.FrameType | None) -> None:
+        self.restart_requested = True
+
+    def _on_stop(self, signum: int, frame: types.FrameType | None) -> None:
+        self.stopping = True
+
+    def wait_ready(self, successor: subprocess.Popen, ready_file: str) -> bool:
+        """Wait until every worker of the successor has written its pid to `ready_file`."""
+        workers = settings.application_settings.workers
+        deadline = time.monotonic() + READY_TIMEOUT
+        while successor.poll() is None and not self.stopping and time.monotonic() < deadline:
+            with contextlib.suppress(FileNotFoundError):
+                with open(ready_file) as f:
+                    if len(f.read().split()) >= workers:
+                        return True
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def handoff(self, server: subprocess.Popen) -> subprocess.Popen:
+        """Start a successor to `server` and retire `server` once the successor is ready.
+
+        Returns:
+            Popen: The server now serving
+        """
+        with tempfile.TemporaryDirectory(prefix="mkhome-") as tmp:
+            ready_file = os.path.join(tmp, "ready")
+            successor = self.spawn(ready_file)
+            LOGGER.info(
+                "Started successor server %s, waiting for it to become ready", successor.pid
+            )
+            ready = self.wait_ready(successor, ready_file)
+        if not ready:
+            LOGGER.error(
+                "Successor server %s did not become ready, keeping the current one", successor.pid
+            )
+            if successor.poll() is None:
+                successor.kill()
+            successor.wait()
+            return server
+        LOGGER.info("Handed off to server %s, retiring server %s", successor.pid, server.pid)
+        server.terminate()
+        server.wait()
+        return successor
+
+    def run(self) -> int:
+        """Serve until stopped or until the server exits by itself.
+
+        Returns:
+            int: The exit status of the last server
+        """
+        signal.signal(signal.SIGHUP, self._on_restart)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        server = self.spawn()
+        LOGGER.info("Supervisor %s started server %s", os.getpid(), server.pid)
+        while True:
+            if self.restart_requested:
+                self.restart_requested = False
+                server = self.handoff(server)
+            if self.stopping:
+                LOGGER.info("Stopping server %s", server.pid)
+                server.terminate()
+                return server.wait()
+            status = server.poll()
+            if status is not None:
+                LOGGER.error("Server %s exited with status %s", server.pid, status)
+                return status
+            time.sleep(POLL_INTERVAL)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8582)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: [supervisor] %(message)s")
+
+    family = socket.AF_INET6 if ":" in args.host else socket.AF_INET
+    sock = socket.create_server((args.host, args.port), family=family, backlog=2048)
+    sock.set_inheritable(True)
+    with sock:
+        sys.exit(Supervisor(sock).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import asyncio
+import contextlib
+import contextvars
+import enum
+import heapq
+import itertools
+import time
+import typing as _t
+
+from fastapi import HTTPException
+
+from mkhome.utils import deadlines, metrics
+
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Priority(enum.IntEnum):
+    """Who a bridge call is made for. Lower values are admitted first."""
+
+    BUTTON = 0
+    """Someone pressed a button"""
+    SCENE = 1
+    """An automation rule or scheduled job"""
+    WRITE = 2
+    """An API command"""
+    READ = 3
+    """An API read, e.g. dashboard polling"""
+
+
+CURRENT: contextvars.ContextVar[Priority | None] = contextvars.ContextVar(
+    "mkhome_priority", default=None
+)
+
+
+@contextlib.contextmanager
+def priority(level: Priority) -> _t.Iterator[None]:
+    """Make the bridge calls in this block, and in tasks started from it, at `level`."""
+    token = CURRENT.set(level)
+    try:
+        yield
+    finally:
+        CURRENT.reset(token)
+
+
+def classify(write: bool) -> Priority:
+    """Get the priority of a bridge call: the one set by `priority`, else an API read or write."""
+    level = CURRENT.get()
+    if level is not None:
+        return level
+    return Priority.WRITE if write else Priority.READ
+
+
+class AdmissionRejectedError(HTTPException):
+    """Raised without contacting the bridge when a low priority call is shed."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(503, f"{name} bridge is busy", headers={"Retry-After": "1"})
+
+
+class AdmissionController:
+    """Limits the calls in flight to one bridge and admits waiting calls by priority.
+
+    A call starts at once while a slot is free and nothing more urgent is waiting; otherwise it
+    waits in a priority queue and takes the next slot released. `reserved` slots are only ever
+    given to button presses and scenes, so they start at once even while API traffic fills the
+    other slots. Under load API reads are shed rather than delayed without bound: once
+    `read_queue` of them are waiting, or after one waited `read_max_wait` seconds. Other calls wait
+    for as long as their request deadline allows.
+
+    Args:
+        name (str): The bridge name used in errors and metric labels
+        limit (int): Calls in flight at once
+        reserved (int): Slots held back from API reads and writes
+        read_queue (int): API reads that may wait for a slot
+        read_max_wait (float): Seconds an API read may wait for a slot
+    """
+
+    def __init__(
+        self, name: str, limit: int, reserved: int, read_queue: int, read_max_wait: float
+    ) -> None:
+        if not 0 <= reserved < limit:
+            raise ValueError("At least one slot must be left for API calls")
+        self.name = name
+        self.limit = limit
+        self.reserved = reserved
+        self.read_queue = read_queue
+        self.read_max_wait = read_max_wait
+        self.active = 0
+        self.queued = dict.fromkeys(Priority, 0)
+        self._waiters: list[tuple[Priority, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()
+        self._active = metrics.gauge("admission_active", bridge=name)
+        self._queued = {
+            level: metrics.gauge("admission_queued", bridge=name, priority=level.name.lower())
+            for level in Priority
+        }
+        self._wait = {
+            level: metrics.histogram(
+                "admission_wait_seconds", WAIT_BUCKETS, bridge=name, priority=level.name.lower()
+            )
+            for level in Priority
+        }
+
+    def status(self) -> dict[str, _t.Any]:
+        return {
+            "limit": self.limit,
+            "reserved": self.reserved,
+            "active": self.active,
+            "queued": {level.name.lower(): n for level, n in self.queued.items()},
+        }
+
+    def _free(self, level: Priority) -> bool:
+        available = self.limit - self.active
+        if level >= Priority.WRITE:
+            available -= self.reserved
+        return available > 0
+
+    def _shed(self, level: Priority, reason: str) -> AdmissionRejectedError:
+        metrics.counter(
+            "admission_shed_total", bridge=self.name, priority=level.name.lower(), reason=reason
+        ).inc()
+        return AdmissionRejectedError(self.name)
+
+    def _set_active(self, delta: int) -> None:
+        self.active += delta
+        self._active.set(self.active)
+
+    def _set_queued(self, level: Priority, delta: int) -> None:
+        self.queued[level] += delta
+        self._queued[level].set(self.queued[level])
+
+    def _admit_waiters(self) -> None:
+        # The first waiter is the most urgent: if it cannot start, nothing behind it can
+        while self._waiters and self._free(self._waiters[0][0]):
+            level, _, future = heapq.heappop(self._waiters)
+            self._set_queued(level, -1)
+            self._set_active(1)
+            future.set_result(None)
+
+    async def acquire(self, level: Priority) -> None:
+        """Wait for a slot. Must be called on the event loop.
+
+        Raises:
+            AdmissionRejectedError: If `level` is `READ` and the call is shed
+            DeadlineExceededError: If the request deadline runs out while waiting
+        """
+        started = time.monotonic()
+        if (not self._waiters or self._waiters[0][0] > level) and self._free(level):
+            self._set_active(1)
+            self._wait[level].observe(0.0)
+            return
+        if level == Priority.READ and self.queued[level] >= self.read_queue:
+            raise self._shed(level, "queue_full")
+        timeout = self.read_max_wait if level == Priority.READ else None
+        deadline = deadlines.current()
+        if deadline is not None:
+            remaining = deadline.remaining()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        entry = (level, next(self._order), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        self._set_queued(level, 1)
+        try:
+            async with asyncio.timeout(timeout):
+                await entry[2]
+        except BaseException as e:
+            admitted = entry[2].done() and not entry[2].cancelled()
+            if admitted and isinstance(e, TimeoutError):
+                # Admitted just as the wait ran out
+                return
+            if admitted:
+                self.release()
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._set_queued(level, -1)
+            if not isinstance(e, TimeoutError):
+                raise
+            if deadline is not None and deadline.expired:
+                raise deadlines.DeadlineExceededError(deadline) from e
+            raise self._shed(level, "timeout") from e
+        finally:
+            self._wait[level].observe(time.monotonic() - started)
+
+    def release(self) -> None:
+        self._set_active(-1)
+        self._admit_waiters()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, level: Priority) -> _t.AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+CONTROLLERS: dict[str, AdmissionController] = {}
+
+
+def controller(
+    name: str, limit: int, reserved: int, read_queue: int, read_max_wait: float
+) -> AdmissionController:
+    """Get or create the admission controller of the bridge `name`."""
+    if name not in CONTROLLERS:
+        CONTROLLERS[name] = AdmissionController(name, limit, reserved, read_queue, read_max_wait)
+    return CONTROLLERS[name]
+
+
+def status() -> dict[str, dict[str, _t.Any]]:
+    return {name: c.status() for name, c in CONTROLLERS.items()}
@@ -17,6 +17,20 @@ def async_wraps[**P, T](
 
 
 def run_sync[T](coroutine: _Coro[T]) -> T:
+    """Run a coroutine to completion from synchronous code.
+
+    On a thread without an event loop, e.g. an executor thread, the coroutine runs on a new loop
+    in that thread; only a thread already running a loop has to start another thread for it.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
     def run(coroutine: _Coro, queue: Queue[tuple[T, Exception | None]]) -> None:
         try:
             loop = asyncio.new_event_loop()
@@ -0,0 +1,116 @@
+import contextvars
+import time
+import typing as _t
+
+from fastapi import Header, HTTPException, Query
+
+
+HEADER = "X-Request-Timeout"
+MAX_BUDGET = 120.0
+
+
+class Deadline:
+    """A time budget for one request, shared by every bridge call made on its behalf.
+
+    Args:
+        budget (float): Seconds the request may take in total
+    """
+
+    def __init__(self, budget: float) -> None:
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires = self.started + budget
+        self.calls: list[dict[str, _t.Any]] = []
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)."""
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def record(self, call: str, started: float, outcome: str) -> None:
+        """Record the timing of a sub-call made under this deadline.
+
+        Args:
+            call (str): A description of the call, e.g. `bond GET /v2/devices/{id}/state`
+            started (float): The `time.monotonic()` value when the call started
+            outcome (str): How the call ended
+        """
+        self.calls.append(
+            {
+                "call": call,
+                "start": round(started - self.started, 4),
+                "elapsed": round(time.monotonic() - started, 4),
+                "outcome": outcome,
+            }
+        )
+
+    def timing(self) -> dict[str, _t.Any]:
+        return {
+            "budget": self.budget,
+            "elapsed": round(time.monotonic() - self.started, 4),
+            "calls": self.calls,
+        }
+
+
+class DeadlineExceededError(HTTPException):
+    """Raised when a request runs out of budget, with the timing of the calls made so far."""
+
+    def __init__(self, deadline: Deadline) -> None:
+        super().__init__(504, {"message": "Request deadline exceeded", **deadline.timing()})
+
+
+CURRENT: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "mkhome_deadline", default=None
+)
+
+
+def current() -> Deadline | None:
+    """Get the deadline of the request being handled, if there is one."""
+    return CURRENT.get()
+
+
+def clamp(timeout: float) -> float:
+    """Limit `timeout` to what is left of the current deadline.
+
+    Raises:
+        DeadlineExceededError: If the current deadline has already expired
+
+    Returns:
+        float: `timeout`, or the remaining budget if that is smaller
+    """
+    deadline = CURRENT.get()
+    if deadline is None:
+        return timeout
+    if deadline.expired:
+        raise DeadlineExceededError(deadline)
+    return min(timeout, deadline.remaining())
+
+
+def request_deadline(default: float) -> _t.Callable[..., _t.Awaitable[Deadline]]:
+    """Create a route dependency that starts a deadline for the request.
+
+    The budget is taken from the `timeout` query parameter, then the `X-Request-Timeout` header,
+    then `default`. The dependency is async so the deadline is set in the context the endpoint
+    runs in.
+
+    Args:
+        default (float): The budget in seconds when the client does not send one
+
+    Returns:
+        Callable: The dependency to pass to `fastapi.Depends`
+    """
+
+    async def dependency(
+        timeout: _t.Annotated[
+            float | None, Query(gt=0, le=MAX_BUDGET, description="Request budget in seconds")
+        ] = None,
+        header: _t.Annotated[float | None, Header(alias=HEADER, gt=0, le=MAX_BUDGET)] = None,
+    ) -> Deadline:
+        deadline = Deadline(timeout or header or default)
+        CURRENT.set(deadline)
+        return deadline
+
+    return dependency
@@ -0,0 +1,109 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+import typing as _t
+
+from mkhome.utils import metrics
+
+
+LOGGER = logging.getLogger(__name__)
+
+API = "api"
+
+SOURCE: contextvars.ContextVar[str] = contextvars.ContextVar("mkhome_command_source", default=API)
+
+
+@contextlib.contextmanager
+def source(name: str) -> _t.Iterator[None]:
+    """Attribute the commands sent in this block, and in tasks started from it, to `name`."""
+    token = SOURCE.set(name)
+    try:
+        yield
+    finally:
+        SOURCE.reset(token)
+
+
+class CommandDeduplicator:
+    """Suppress a command that repeats or cancels one another source just sent to the same target.
+
+    A button bound to a device and an API client or automation reacting to the same moment can
+    send the same command at nearly the same time, e.g. both turning a light on; the second is
+    wasted airtime. Two remotes bound to the same light pressed together both toggle it, and the
+    second toggle undoes the first. Within `window` seconds of an accepted command, a different
+    source's identical command is dropped, and so is the inverse of a relative command (a step
+    the other way, or a toggle of the same thing). Everything else is sent: a repeat from the same
+    source is deliberate (two presses of "speed up"), and an absolute command that is different
+    or inverse corrects the previous one.
+
+    The source is set with `source`, e.g. by button bindings, and defaults to `API`.
+
+    Args:
+        name (str): The bridge name used in logs and metric labels
+        window (float): Seconds after an accepted command during which repeats are dropped.
+            Zero disables suppression.
+        relative (Mapping[str, str]): Commands whose effect depends on the target's current
+            state, each with the command that undoes it. Toggles undo themselves.
+    """
+
+    def __init__(
+        self, name: str, window: float, relative: _t.Mapping[str, str] | None = None
+    ) -> None:
+        self.name = name
+        self.window = window
+        self.relative = dict(relative or {})
+        self._last: dict[str, tuple[float, str, tuple, str]] = {}
+        self._lock = threading.Lock()
+
+    def _suppress(self, target: str, command: str, reason: str, origin: str) -> bool:
+        metrics.counter("commands_suppressed_total", bridge=self.name, reason=reason).inc()
+        LOGGER.info(
+            "Suppressed %s command %s to %s (%s, after %s)",
+            self.name,
+            command,
+            target,
+            reason,
+            origin,
+        )
+        return False
+
+    def admit(self, target: str, command: str, args: _t.Mapping[str, _t.Any]) -> bool:
+        """Check whether a command should be sent, recording it if so.
+
+        Args:
+            target (str): The device the command is for
+            command (str): The command name
+            args (Mapping[str, Any]): The command arguments
+
+        Returns:
+            bool: False if another source sent the same command, or a relative command this one
+                undoes, within the window
+        """
+        if self.window <= 0:
+            return True
+        key = tuple(sorted(args.items()))
+        origin = SOURCE.get()
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(target)
+            if (
+                last is not None
+                and now - last[0] < self.window
+                and key == last[2]
+                and origin != last[3]
+            ):
+                last_command = last[1]
+                if command == last_command:
+                    reason = "cancelling" if self.relative.get(command) == command else "duplicate"
+                    return self._suppress(target, command, reason, last[3])
+                if last_command in self.relative and self.relative[last_command] == command:
+                    return self._suppress(target, command, "cancelling", last[3])
+            self._last[target] = (now, command, key, origin)
+        metrics.counter("commands_admitted_total", bridge=self.name).inc()
+        return True
+
+    def forget(self, target: str) -> None:
+        """Forget the last command to `target`, e.g. because sending it failed."""
+        with self._lock:
+            self._last.pop(target, None)
@@ -0,0 +1,124 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+import typing as _t
+
+from fastapi import HTTPException
+
+from mkhome.utils import metrics
+
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+_LOCAL = threading.local()
+
+
+class ExecutorSaturatedError(HTTPException):
+    """Raised without running a call when every thread and queue slot of its executor is taken."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(503, f"{name} executor is saturated", headers={"Retry-After": "1"})
+
+
+class BoundedExecutor:
+    """A named pool of threads for blocking calls, with a bounded queue in front of it.
+
+    Each subsystem gets its own pool, so a slow bridge can only tie up its own threads; once
+    `workers` calls are running and `queue_size` are waiting, further calls are rejected instead of
+    queueing without limit. Calls made from one of the pool's own threads run inline, as waiting
+    for a free thread from inside the pool can deadlock it.
+
+    Args:
+        name (str): The name used in thread names, errors and metric labels
+        workers (int): Threads running calls at once
+        queue_size (int): Calls that may wait for a thread
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        self._pool = concurrent.futures.ThreadPoolExecutor(workers, f"mkhome-{name}")
+        self._lock = threading.Lock()
+        self._active = metrics.gauge("executor_active", executor=name)
+        self._queued = metrics.gauge("executor_queued", executor=name)
+        self._rejected = metrics.counter("executor_rejected_total", executor=name)
+        self._wait = metrics.histogram("executor_queue_wait_seconds", WAIT_BUCKETS, executor=name)
+
+    def status(self) -> dict[str, _t.Any]:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": self.queued,
+            "rejected": self._rejected.value,
+        }
+
+    def _update(self, active: int, queued: int) -> None:
+        with self._lock:
+            self.active += active
+            self.queued += queued
+            self._active.set(self.active)
+            self._queued.set(self.queued)
+
+    def _call[T](
+        self, submitted: float, func: _t.Callable[..., T], args: tuple, kwargs: dict[str, _t.Any]
+    ) -> T:
+        self._wait.observe(time.monotonic() - submitted)
+        self._update(1, -1)
+        _LOCAL.executor = self
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _LOCAL.executor = None
+            self._update(-1, 0)
+
+    def _done(self, future: concurrent.futures.Future) -> None:
+        if future.cancelled():
+            # Cancelled while queued, so `_call` never ran
+            self._update(0, -1)
+
+    async def run[T](self, func: _t.Callable[..., T], /, *args: _t.Any, **kwargs: _t.Any) -> T:
+        """Run a blocking call on the pool, like `asyncio.to_thread`.
+
+        Raises:
+            ExecutorSaturatedError: If every thread and queue slot is taken
+        """
+        if getattr(_LOCAL, "executor", None) is self:
+            return func(*args, **kwargs)
+        with self._lock:
+            if self.active + self.queued >= self.workers + self.queue_size:
+                self._rejected.inc()
+                raise ExecutorSaturatedError(self.name)
+            self.queued += 1
+            self._queued.set(self.queued)
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._call, time.monotonic(), func, args, kwargs)
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+EXECUTORS: dict[str, BoundedExecutor] = {}
+
+
+def executor(name: str, workers: int, queue_size: int) -> BoundedExecutor:
+    """Get or create the executor `name`."""
+    if name not in EXECUTORS:
+        EXECUTORS[name] = BoundedExecutor(name, workers, queue_size)
+    return EXECUTORS[name]
+
+
+def status() -> dict[str, dict[str, _t.Any]]:
+    return {name: e.status() for name, e in EXECUTORS.items()}
+
+
+def shutdown() -> None:
+    for e in EXECUTORS.values():
+        e.shutdown()
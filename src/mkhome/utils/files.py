@@ -0,0 +1,34 @@
+import asyncio
+import logging
+import os
+import typing as _t
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+async def watch(path: str, interval: float, reload: _t.Callable[[str], _t.Awaitable[_t.Any]]):
+    """Call `reload(path)` whenever the file's modification time changes. Runs until cancelled.
+
+    Args:
+        path (str): The file to watch
+        interval (float): Seconds between checks
+        reload (Callable): Loads the file. Exceptions are logged and the watch continues.
+    """
+    last = await asyncio.to_thread(mtime_ns, path)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            current = await asyncio.to_thread(mtime_ns, path)
+            if current != last:
+                last = current
+                await reload(path)
+        except Exception:
+            LOGGER.exception("Failed to reload %s", path)
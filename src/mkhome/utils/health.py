@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import logging
+import time
+import typing as _t
+
+from mkhome.utils import metrics
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+Health = _t.Literal["up", "degraded", "down"]
+_HEALTH_VALUES: dict[Health, int] = {"up": 0, "degraded": 1, "down": 2}
+
+
+class RttEstimator:
+    """A smoothed round-trip time and its variation, as TCP estimates them (RFC 6298).
+
+    Args:
+        min_timeout (float): The lowest timeout to suggest
+        max_timeout (float): The highest timeout to suggest
+    """
+
+    def __init__(self, min_timeout: float, max_timeout: float) -> None:
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+
+    def observe(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def timeout(self) -> float:
+        """A timeout that a healthy response almost never exceeds: `srtt + 4 * rttvar`."""
+        if self.srtt is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.srtt + 4 * self.rttvar))
+
+
+class HealthMonitor:
+    """Probes a bridge in the background and classifies it as up, degraded or down.
+
+    The probe interval adapts: it doubles after every healthy probe up to `max_interval` and
+    drops back to `min_interval` as soon as the bridge is slow or failing. Successful calls made
+    by the application also feed the round-trip estimate through `observe`, so a busy bridge
+    needs fewer probes.
+
+    Args:
+        name (str): The bridge name used in logs and metric labels
+        probe (Callable): Makes one cheap call to the bridge, raising if it fails
+        min_interval (float): Seconds between probes while the bridge is unhealthy
+        max_interval (float): Seconds between probes while the bridge is healthy
+        degraded_rtt (float): Smoothed round-trip seconds above which the bridge is degraded
+        down_after (int): Consecutive failed probes after which the bridge is down
+        timeouts (RttEstimator): Tracks the round-trip time
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: _t.Callable[[], _t.Awaitable[_t.Any]],
+        *,
+        min_interval: float,
+        max_interval: float,
+        degraded_rtt: float,
+        down_after: int,
+        timeouts: RttEstimator,
+    ) -> None:
+        self.name = name
+        self.probe = probe
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.degraded_rtt = degraded_rtt
+        self.down_after = down_after
+        self.rtt = timeouts
+        self.state: Health = "up"
+        self.failures = 0
+        self.interval = min_interval
+        self.last_success: float | None = None
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._state_gauge = metrics.gauge("bridge_health", bridge=name)
+        self._rtt_gauge = metrics.gauge("bridge_rtt_seconds", bridge=name)
+        self._probes = metrics.histogram("bridge_probe_seconds", bridge=name)
+
+    def status(self) -> dict[str, _t.Any]:
+        return {
+            "state": self.state,
+            "rtt": self.rtt.srtt,
+            "rtt_variation": self.rtt.rttvar,
+            "timeout": self.rtt.timeout,
+            "failures": self.failures,
+            "last_success": self.last_success,
+            "probe_interval": self.interval,
+        }
+
+    def _set_state(self, state: Health) -> None:
+        if state != self.state:
+            LOGGER.warning("%s bridge health %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._state_gauge.set(_HEALTH_VALUES[state])
+
+    def observe(self, rtt: float) -> None:
+        """Record a successful call to the bridge and how long it took."""
+        self.rtt.observe(rtt)
+        self._rtt_gauge.set(self.rtt.srtt or 0.0)
+        self.failures = 0
+        self.last_success = time.time()
+        self._set_state("degraded" if (self.rtt.srtt or 0.0) > self.degraded_rtt else "up")
+
+    def fail(self) -> None:
+        """Record a failed call to the bridge."""
+        previous = self.state
+        self.failures += 1
+        metrics.counter("bridge_health_failures_total", bridge=self.name).inc()
+        self._set_state("down" if self.failures >= self.down_after else "degraded")
+        if self.state != previous:
+            # Probe now rather than after a healthy interval, to notice the recovery sooner
+            self._wake.set()
+
+    async def check(self) -> Health:
+        """Probe the bridge once."""
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.rtt.max_timeout):
+                await self.probe()
+        except Exception as e:
+            LOGGER.debug("%s bridge probe failed: %r", self.name, e)
+            self.fail()
+        else:
+            elapsed = time.monotonic() - started
+            self._probes.observe(elapsed)
+            self.observe(elapsed)
+        return self.state
+
+    async def _run(self) -> None:
+        while True:
+            idle = time.time() - (self.last_success or 0.0)
+            if self.state == "up" and idle < self.interval:
+                # Calls made since the last probe already show the bridge is healthy
+                delay = self.interval - idle
+            elif await self.check() == "up":
+                delay = self.interval = min(self.max_interval, self.interval * 2)
+            else:
+                delay = self.interval = self.min_interval
+            self._wake.clear()
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(delay):
+                    await self._wake.wait()
+
+    async def startup(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
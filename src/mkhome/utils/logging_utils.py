@@ -0,0 +1,90 @@
+import atexit
+import logging
+import logging.handlers
+import typing as _t
+
+
+class LazyStr:
+    """Defer building an expensive log argument until a handler formats the record.
+
+    `Logger.debug` and friends check the level before formatting, so a `LazyStr` passed as a
+    `%s` argument is never rendered when the level is disabled.
+    """
+
+    __slots__ = ("args", "func", "kwargs")
+
+    def __init__(self, func: _t.Callable[..., _t.Any], /, *args: _t.Any, **kwargs: _t.Any) -> None:
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+def lazy(func: _t.Callable[..., _t.Any], /, *args: _t.Any, **kwargs: _t.Any) -> LazyStr:
+    """Wrap `func(*args, **kwargs)` so it only runs if the log record is emitted.
+
+    Args:
+        func (Callable): The function producing the log argument
+
+    Returns:
+        LazyStr: A placeholder rendered with `str()` by the formatter
+    """
+    return LazyStr(func, *args, **kwargs)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """A `QueueHandler` that leaves formatting to the listener thread.
+
+    The standard handler formats each record before enqueuing it, so that it can be pickled,
+    which renders `lazy` arguments on the calling thread. These records never leave the process,
+    so they are enqueued as they are and formatted by the listener's handlers.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_RUNNING: list[logging.handlers.QueueListener] = []
+"""The listeners started by `start_queue_listeners`"""
+
+
+def get_queue_listeners() -> list[logging.handlers.QueueListener]:
+    """Get the listeners of every configured `QueueHandler`.
+
+    `logging.config.dictConfig` builds a `QueueListener` for each `QueueHandler` declared with a
+    `handlers` list but leaves it stopped.
+
+    Returns:
+        list[QueueListener]: The listeners attached to named queue handlers
+    """
+    listeners = []
+    for name in logging.getHandlerNames():
+        handler = logging.getHandlerByName(name)
+        listener = getattr(handler, "listener", None)
+        if isinstance(handler, logging.handlers.QueueHandler) and listener is not None:
+            listeners.append(listener)
+    return listeners
+
+
+def start_queue_listeners() -> None:
+    """Start the background threads draining the logging queues.
+
+    Safe to call more than once. The listeners are stopped (and their queues flushed) at
+    interpreter exit so records logged during shutdown are not lost.
+    """
+    for listener in get_queue_listeners():
+        if listener not in _RUNNING:
+            listener.start()
+            _RUNNING.append(listener)
+    atexit.unregister(stop_queue_listeners)
+    atexit.register(stop_queue_listeners)
+
+
+def stop_queue_listeners() -> None:
+    """Flush and stop the background logging threads."""
+    while _RUNNING:
+        _RUNNING.pop().stop()
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import typing as _t
+
+
+type Labels = dict[str, str]
+
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)  # fmt: skip
+
+
+def _key(name: str, labels: Labels) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+class Counter:
+    """A monotonically increasing count."""
+
+    def __init__(self, name: str, labels: Labels) -> None:
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Gauge:
+    """A value that can go up and down."""
+
+    def __init__(self, name: str, labels: Labels) -> None:
+        self.name = name
+        self.labels = labels
+        self.value: float = 0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class Histogram:
+    """A fixed-bucket histogram of observed values (seconds by default).
+
+    With `decay` below 1, every observation first scales the existing counts by `decay`, so the
+    histogram describes recent values: an observation's weight halves every
+    `log(0.5) / log(decay)` observations.
+    """
+
+    def __init__(
+        self, name: str, labels: Labels, buckets: _t.Sequence[float], decay: float = 1.0
+    ) -> None:
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.decay = decay
+        self.counts: list[float] = [0] * (len(self.buckets) + 1)
+        self.count: float = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if self.decay < 1:
+                self.counts = [count * self.decay for count in self.counts]
+                self.count *= self.decay
+                self.sum *= self.decay
+            self.counts[index] += 1
+            self.count += 1
+            if value != float("inf"):
+                self.sum += value
+
+    def quantile(self, q: float, bounded: bool = False) -> float | None:
+        """Estimate a quantile as the upper bound of the bucket containing it.
+
+        Args:
+            q (float): The quantile, between 0 and 1
+            bounded (bool): Ignore observations above the last bucket. Defaults to False.
+        """
+        total = self.count - self.counts[-1] if bounded else self.count
+        if total <= 0:
+            return None
+        rank = q * total
+        seen: float = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict[str, _t.Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+type Metric = Counter | Gauge | Histogram
+
+
+REGISTRY: dict[str, Metric] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _get_or_create[M: Metric](key: str, factory: _t.Callable[[], M]) -> M:
+    metric = REGISTRY.get(key)
+    if metric is None:
+        with _REGISTRY_LOCK:
+            metric = REGISTRY.setdefault(key, factory())
+    return metric  # type: ignore[return-value]
+
+
+def counter(name: str, **labels: str) -> Counter:
+    """Get or create the counter `name` with the given labels."""
+    return _get_or_create(_key(name, labels), lambda: Counter(name, labels))
+
+
+def gauge(name: str, **labels: str) -> Gauge:
+    """Get or create the gauge `name` with the given labels."""
+    return _get_or_create(_key(name, labels), lambda: Gauge(name, labels))
+
+
+def histogram(name: str, buckets: _t.Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> Histogram:
+    """Get or create the histogram `name` with the given labels."""
+    return _get_or_create(_key(name, labels), lambda: Histogram(name, labels, buckets))
+
+
+def rolling_histogram(
+    name: str, buckets: _t.Sequence[float], halflife: int, **labels: str
+) -> Histogram:
+    """Get or create a histogram of recent values, where weights halve every `halflife` values."""
+    decay = 0.5 ** (1 / halflife)
+    return _get_or_create(_key(name, labels), lambda: Histogram(name, labels, buckets, decay))
+
+
+def snapshot() -> dict[str, _t.Any]:
+    """Get the current value of every registered metric, keyed by name and labels."""
+    return {key: metric.snapshot() for key, metric in sorted(REGISTRY.items())}
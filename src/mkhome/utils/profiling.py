@@ -0,0 +1,211 @@
+import collections
+import contextlib
+import sys
+import threading
+import time
+import types
+import typing as _t
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+Mode = _t.Literal["window", "requests", "events"]
+"""What a session profiles.
+
+- `window`: everything the process does until the session is stopped or its duration is up.
+- `requests`: the process while HTTP requests are being handled, until `limit` have completed.
+- `events`: the process while button gestures are being handled, until `limit` have completed.
+"""
+Threads = _t.Literal["loop", "all"]
+
+
+_LABELS: dict[types.CodeType, str] = {}
+
+
+def _label(frame: types.FrameType) -> str:
+    code = frame.f_code
+    label = _LABELS.get(code)
+    if label is None:
+        label = _LABELS[code] = f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+    return label
+
+
+def collapse(frame: types.FrameType | None) -> str:
+    """Render a stack outermost frame first, in the collapsed format flame graph tools read."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Session:
+    """Samples the stacks of the process's threads from a background thread.
+
+    Sampling costs nothing between sessions: no thread runs and the hooks in `track` return
+    immediately. While it runs, a sample is taken every `interval` seconds, and in `requests` or
+    `events` mode only while one is in progress (which, in an event loop, includes whatever else
+    the loop does meanwhile).
+
+    Args:
+        mode (Mode): What to profile
+        limit (int | None): The requests or events to profile in those modes
+        duration (float): Seconds after which the session stops regardless
+        interval (float): Seconds between samples
+        threads (Threads): Sample only the event loop thread, or every thread
+    """
+
+    def __init__(
+        self,
+        mode: Mode,
+        limit: int | None,
+        duration: float,
+        interval: float,
+        threads: Threads,
+    ) -> None:
+        self.mode = mode
+        self.limit = limit
+        self.duration = duration
+        self.interval = interval
+        self.threads = threads
+        self.loop_thread = threading.get_ident()
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self.samples = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.started = time.time()
+        self.stopped: float | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mkhome-profiler", daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self.stopped is None
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def status(self) -> dict[str, _t.Any]:
+        return {
+            "running": self.running,
+            "mode": self.mode,
+            "limit": self.limit,
+            "completed": self.completed,
+            "interval": self.interval,
+            "threads": self.threads,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "started": self.started,
+            "elapsed": round((self.stopped or time.time()) - self.started, 3),
+        }
+
+    def collapsed(self) -> str:
+        """The sampled stacks as `frame;frame;frame count` lines."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _sample(self) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()} if self.threads == "all" else {}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            if self.threads == "loop":
+                if ident != self.loop_thread:
+                    continue
+                self.stacks[collapse(frame)] += 1
+            else:
+                self.stacks[f"{names.get(ident, ident)};{collapse(frame)}"] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        global SESSION
+        expires = time.monotonic() + self.duration
+        try:
+            while not self._stop.wait(self.interval) and time.monotonic() < expires:
+                if self.mode == "window" or self.in_flight:
+                    self._sample()
+        finally:
+            self.stopped = time.time()
+            if SESSION is self:
+                SESSION = None
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> None:
+        self._thread.join()
+
+
+SESSION: Session | None = None
+"""The session running, if any"""
+LAST: Session | None = None
+"""The session that ran last, possibly still running"""
+
+
+def start(
+    mode: Mode,
+    limit: int | None = None,
+    duration: float = 60.0,
+    interval: float = 0.005,
+    threads: Threads = "loop",
+) -> Session:
+    """Start a profiling session. Must be called from the event loop thread.
+
+    Raises:
+        RuntimeError: If a session is already running
+    """
+    global SESSION, LAST
+    if SESSION is not None:
+        raise RuntimeError("A profiling session is already running")
+    SESSION = LAST = Session(mode, limit, duration, interval, threads)
+    SESSION.start()
+    return SESSION
+
+
+def stop() -> Session | None:
+    """Stop the running session, if any, and return the last session."""
+    session = SESSION
+    if session is not None:
+        session.stop()
+        session.join()
+    return LAST
+
+
+@contextlib.contextmanager
+def _tracked(session: Session) -> _t.Iterator[None]:
+    session.in_flight += 1
+    try:
+        yield
+    finally:
+        session.in_flight -= 1
+        session.completed += 1
+        if session.limit is not None and session.completed >= session.limit:
+            session.stop()
+
+
+_UNTRACKED = contextlib.nullcontext()
+
+
+def track(mode: Mode) -> _t.ContextManager[None]:
+    """Mark a request or event as in progress for a session profiling them."""
+    session = SESSION
+    if session is None or session.mode != mode or session.stopping:
+        return _UNTRACKED
+    return _tracked(session)
+
+
+class ProfilingMiddleware:
+    """Tracks HTTP requests for `requests` sessions, except those to the profiling routes."""
+
+    def __init__(self, app: ASGIApp, exclude: str = "/app/profile") -> None:
+        self.app = app
+        self.exclude = exclude
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if SESSION is None or scope["type"] != "http" or scope["path"].startswith(self.exclude):
+            return await self.app(scope, receive, send)
+        with track("requests"):
+            await self.app(scope, receive, send)
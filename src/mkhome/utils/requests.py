@@ -1,10 +1,12 @@
 import asyncio
+import typing as _t
 
 import requests
 from requests.auth import AuthBase
-from requests import PreparedRequest
+from requests import PreparedRequest, Response
 
 from mkhome.utils import async_utils
+from mkhome.utils.executors import BoundedExecutor
 
 
 @async_utils.async_wraps(requests.get)
@@ -32,4 +34,9 @@ async def request(*args, **kwargs):
     return await asyncio.to_thread(requests.request, *args, **kwargs)
 
 
-__all__ = ["get", "post", "put", "request", "AuthBase", "PreparedRequest"]
+async def send(executor: BoundedExecutor, method: str, url: str, **kwargs: _t.Any) -> Response:
+    """Send a request on `executor`, so a slow server only ties up that executor's threads."""
+    return await executor.run(requests.request, method, url, **kwargs)
+
+
+__all__ = ["get", "post", "put", "request", "send", "AuthBase", "PreparedRequest", "Response"]
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import threading
+import time
+import typing as _t
+
+import requests
+from fastapi import HTTPException
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from mkhome.utils import admission, deadlines, executors, metrics
+from mkhome.utils.health import RttEstimator
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+CircuitState = _t.Literal["closed", "open", "half_open"]
+_STATE_VALUES: dict[CircuitState, int] = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(HTTPException):
+    """Raised without contacting the bridge while its circuit breaker is open."""
+
+    def __init__(self, bridge: str, retry_after: float) -> None:
+        super().__init__(
+            503,
+            f"{bridge} bridge is unavailable",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+class BridgeDownError(HTTPException):
+    """Raised without contacting the bridge while its health monitor reports it down."""
+
+    def __init__(self, bridge: str, retry_after: float) -> None:
+        super().__init__(
+            503,
+            f"{bridge} bridge is down",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+class BridgeTimeoutError(HTTPException):
+    """Raised when a bridge call exceeds its timeout."""
+
+    def __init__(self, bridge: str) -> None:
+        super().__init__(504, f"{bridge} bridge timed out")
+
+
+class CircuitBreaker:
+    """A consecutive-failure circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail fast for
+    `reset_timeout` seconds. The first call after that is let through as a trial: success closes
+    the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state: CircuitState = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        self._state_gauge = metrics.gauge("bridge_circuit_state", bridge=name)
+        self._opened = metrics.counter("bridge_circuit_opened_total", bridge=name)
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state != self.state:
+            LOGGER.warning("%s bridge circuit %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._state_gauge.set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Check whether a call may be made, moving an expired open circuit to half-open."""
+        with self._lock:
+            match self.state:
+                case "closed":
+                    return True
+                case "open" | "half_open" if self.retry_after <= 0:
+                    # An abandoned trial call is replaced after another reset_timeout
+                    self.opened_at = time.monotonic()
+                    self._set_state("half_open")
+                    return True
+                case _:
+                    return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._opened.inc()
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Check whether a failed bridge call is worth retrying and counts against the breaker.
+
+    Args:
+        exc (BaseException): The exception raised by the call
+
+    Returns:
+        bool: True for timeouts, connection errors and 5xx responses from the bridge
+    """
+    # Raised without contacting the bridge
+    local = (
+        CircuitOpenError,
+        BridgeDownError,
+        deadlines.DeadlineExceededError,
+        executors.ExecutorSaturatedError,
+        admission.AdmissionRejectedError,
+    )
+    if isinstance(exc, local):
+        return False
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return isinstance(exc, (TimeoutError, ConnectionError, requests.RequestException))
+
+
+class BridgeGuard:
+    """Timeouts, bounded retries and circuit breaking for the calls made to one bridge.
+
+    Args:
+        name (str): The bridge name used in logs, errors and metric labels
+        connect_timeout (float): Seconds to wait for a connection to the bridge
+        read_timeout (float): Seconds to wait for the bridge to respond
+        retry_attempts (int): Total attempts for idempotent calls
+        retry_max_wait (float): Upper bound of the jittered backoff between attempts
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds an open circuit fails fast before a trial call
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        connect_timeout: float,
+        read_timeout: float,
+        retry_attempts: int,
+        retry_max_wait: float,
+        failure_threshold: int,
+        reset_timeout: float,
+    ) -> None:
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_attempts = retry_attempts
+        self.retry_max_wait = retry_max_wait
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.rtt: RttEstimator | None = None
+        """When set, the read timeout follows the measured round-trip time instead"""
+        self._latency = metrics.histogram("bridge_call_seconds", bridge=name)
+        self._retries = metrics.counter("bridge_retries_total", bridge=name)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """The `(connect, read)` timeout to pass to `requests`, limited by the request deadline."""
+        return deadlines.clamp(self.connect_timeout), deadlines.clamp(self.current_read_timeout)
+
+    @property
+    def current_read_timeout(self) -> float:
+        return self.rtt.timeout if self.rtt is not None else self.read_timeout
+
+    def _outcome(self, outcome: str) -> None:
+        metrics.counter("bridge_calls_total", bridge=self.name, outcome=outcome).inc()
+
+    def _before_sleep(self, retry_state: RetryCallState) -> None:
+        self._retries.inc()
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        LOGGER.warning(
+            "%s bridge call failed (attempt %s): %r", self.name, retry_state.attempt_number, exc
+        )
+
+    async def _attempt[T](self, func: _t.Callable[[], _t.Awaitable[T]], label: str) -> T:
+        deadline = deadlines.current()
+        if not self.breaker.allow():
+            self._outcome("rejected")
+            raise CircuitOpenError(self.name, self.breaker.retry_after)
+        budget = deadlines.clamp(self.connect_timeout + self.current_read_timeout)
+        started = time.monotonic()
+        outcome = "cancelled"
+        try:
+            async with asyncio.timeout(budget):
+                result = await func()
+        except asyncio.CancelledError:
+            raise
+        except deadlines.DeadlineExceededError:
+            outcome = "deadline"
+            raise
+        except (TimeoutError, requests.Timeout) as exc:
+            if deadline is not None and deadline.expired:
+                # The client's budget ran out, which says nothing about the bridge's health
+                outcome = "deadline"
+                raise deadlines.DeadlineExceededError(deadline) from exc
+            self.breaker.record_failure()
+            outcome = "timeout"
+            raise BridgeTimeoutError(self.name) from exc
+        except BaseException as exc:
+            if is_transient(exc):
+                self.breaker.record_failure()
+                outcome = "failure"
+                if not isinstance(exc, HTTPException):
+                    raise HTTPException(502, f"{self.name} bridge is unreachable") from exc
+            else:
+                self.breaker.record_success()
+                outcome = "error"
+            raise
+        else:
+            self.breaker.record_success()
+            outcome = "success"
+            return result
+        finally:
+            self._outcome(outcome)
+            self._latency.observe(time.monotonic() - started)
+            if deadline is not None:
+                deadline.record(f"{self.name} {label}".rstrip(), started, outcome)
+
+    async def call[T](
+        self, func: _t.Callable[[], _t.Awaitable[T]], *, idempotent: bool = False, label: str = ""
+    ) -> T:
+        """Call the bridge through the breaker, retrying idempotent calls on transient errors.
+
+        Each attempt only gets what is left of the current request deadline, if there is one.
+
+        Args:
+            func (Callable): A zero-argument coroutine function performing one bridge call
+            idempotent (bool): Whether the call is safe to repeat. Defaults to False.
+            label (str): A description of the call for deadline timing. Defaults to "".
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            BridgeTimeoutError: If the final attempt timed out
+            DeadlineExceededError: If the request deadline ran out
+
+        Returns:
+            T: The result of `func`
+        """
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.retry_attempts if idempotent else 1),
+            wait=wait_random_exponential(multiplier=0.1, max=self.retry_max_wait),
+            retry=retry_if_exception(is_transient),
+            before_sleep=self._before_sleep,
+            reraise=True,
+        )
+        return await retrying(self._attempt, func, label)
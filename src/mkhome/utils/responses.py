@@ -0,0 +1,36 @@
+import typing as _t
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+_ADAPTERS: dict[_t.Any, TypeAdapter] = {}
+
+
+def adapter(tp: _t.Any) -> TypeAdapter:
+    """Get a prebuilt `TypeAdapter` for `tp`, e.g. `list[LutronDevice]`."""
+    if tp not in _ADAPTERS:
+        _ADAPTERS[tp] = TypeAdapter(tp)
+    return _ADAPTERS[tp]
+
+
+def json_response(
+    value: _t.Any, tp: _t.Any = None, headers: _t.Mapping[str, str] | None = None
+) -> Response:
+    """Serialize a value straight to JSON bytes.
+
+    FastAPI validates a route's return value against its response model, converts it to Python
+    objects and only then encodes them. For values that are already validated models that is
+    three passes over the data; this is one. Declare the model with the route's `response_model`
+    so the schema is still documented.
+
+    Args:
+        value (Any): A validated model, or list or dict of them
+        tp (Any): The type of `value`. Defaults to `type(value)`, which suits single models.
+        headers (Mapping[str, str] | None): Extra response headers
+    """
+    return Response(
+        adapter(tp or type(value)).dump_json(value),
+        headers=headers,
+        media_type="application/json",
+    )
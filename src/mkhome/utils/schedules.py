@@ -0,0 +1,123 @@
+import datetime
+import math
+
+
+### Cron
+
+
+class CronExpression:
+    """A five field cron expression (minute, hour, day of month, month, day of week).
+
+    Fields accept `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps (`*/15`, `0-30/10`).
+    Days of the week run from 0 (Sunday) to 6, and 7 is also Sunday. As in cron, when both the
+    day of month and the day of week are restricted a day matching either is used.
+
+    Args:
+        expression (str): The expression, e.g. `30 6 * * 1-5`
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields")
+        self.expression = expression
+        parsed = [self._parse(field, *bounds) for field, bounds in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def __str__(self) -> str:
+        return self.expression
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> tuple[int, ...]:
+        values: set[int] = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            if span == "*":
+                start, stop = low, high
+            elif "-" in span:
+                start, stop = map(int, span.split("-", 1))
+            else:
+                start = stop = int(span)
+            if not (low <= start <= stop <= high) or (step and int(step) < 1):
+                raise ValueError(f"Invalid cron field '{field}'")
+            values.update(range(start, stop + 1, int(step) if step else 1))
+        return tuple(sorted(values))
+
+    def _matches_day(self, day: datetime.date) -> bool:
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, after: datetime.datetime) -> datetime.datetime:
+        """Get the first matching minute after `after` (naive local time).
+
+        Raises:
+            ValueError: If nothing matches within five years, e.g. `0 0 31 2 *`
+        """
+        start = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        for offset in range(5 * 366):
+            day = start.date() + datetime.timedelta(days=offset)
+            if not self._matches_day(day):
+                continue
+            for hour in self.hours:
+                if offset == 0 and hour < start.hour:
+                    continue
+                for minute in self.minutes:
+                    candidate = datetime.datetime.combine(day, datetime.time(hour, minute))
+                    if candidate >= start:
+                        return candidate
+        raise ValueError(f"Cron expression '{self}' never matches")
+
+
+### Sun
+
+
+def sun_times(
+    day: datetime.date, latitude: float, longitude: float
+) -> tuple[datetime.datetime | None, datetime.datetime | None]:
+    """Compute sunrise and sunset with the sunrise equation, to within a minute or two.
+
+    Args:
+        day (datetime.date): The local date
+        latitude (float): Degrees north
+        longitude (float): Degrees east
+
+    Returns:
+        tuple: Sunrise and sunset as aware UTC datetimes, or None during polar day or night
+    """
+    # Julian day number of the day's noon, counted from 2000-01-01 12:00 UTC
+    n = day.toordinal() - datetime.date(2000, 1, 1).toordinal()
+    mean_solar_noon = n - longitude / 360
+    anomaly = math.radians((357.5291 + 0.98560028 * mean_solar_noon) % 360)
+    center = (
+        1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) + 0.0003 * math.sin(3 * anomaly)
+    )
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = (
+        2451545.0 + mean_solar_noon + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+    )
+    declination = math.asin(math.sin(ecliptic) * math.sin(math.radians(23.4397)))
+    phi = math.radians(latitude)
+    cos_hour_angle = (math.sin(math.radians(-0.833)) - math.sin(phi) * math.sin(declination)) / (
+        math.cos(phi) * math.cos(declination)
+    )
+    if not -1 <= cos_hour_angle <= 1:
+        return None, None
+    hour_angle = math.degrees(math.acos(cos_hour_angle)) / 360
+
+    def to_datetime(julian: float) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp((julian - 2440587.5) * 86400, datetime.UTC)
+
+    return to_datetime(transit - hour_angle), to_datetime(transit + hour_angle)
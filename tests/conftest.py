@@ -0,0 +1,9 @@
+import asyncio
+
+
+def pytest_configure() -> None:
+    # The Lutron bridge client is created on import and needs a running event loop
+    async def load() -> None:
+        import mkhome.bridges  # noqa: F401
+
+    asyncio.run(load())
@@ -0,0 +1,60 @@
+import asyncio
+import pathlib
+
+import pytest
+from filelock import FileLock, Timeout
+
+from mkhome.automations import actions
+
+
+@pytest.fixture
+def lock_file(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    path = str(tmp_path / "mkhome.lock")
+    monkeypatch.setattr(actions, "EVENT_LOCK", FileLock(path, thread_local=False))
+    return path
+
+
+def test_event_lock_excludes_other_processes(lock_file: str) -> None:
+    async def main() -> None:
+        other = FileLock(lock_file, thread_local=False, is_singleton=False)
+        async with actions.event_lock():
+            # Another open file description, as another worker would have
+            with pytest.raises(Timeout):
+                other.acquire(blocking=False)
+        other.acquire(blocking=False)
+        other.release()
+
+    asyncio.run(main())
+
+
+def test_event_lock_serializes_tasks(lock_file: str) -> None:
+    held: list[int] = []
+    overlaps: list[int] = []
+
+    async def automation(i: int) -> None:
+        async with actions.event_lock():
+            if held:
+                overlaps.append(i)
+            held.append(i)
+            await asyncio.sleep(0.01)
+            held.remove(i)
+
+    async def main() -> None:
+        await asyncio.gather(*(automation(i) for i in range(3)))
+
+    asyncio.run(main())
+    assert overlaps == []
+
+
+def test_event_lock_waits_for_other_process(lock_file: str) -> None:
+    other = FileLock(lock_file, thread_local=False, is_singleton=False)
+
+    async def main() -> None:
+        other.acquire()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, other.release)
+        start = loop.time()
+        async with actions.event_lock():
+            assert loop.time() - start >= 0.05
+
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+import asyncio
+import itertools
+import typing as _t
+
+import pytest
+
+from mkhome.utils import deadlines
+from mkhome.utils.admission import AdmissionController, AdmissionRejectedError, Priority
+
+
+NAMES = itertools.count()
+
+type Coro[T] = _t.Coroutine[_t.Any, _t.Any, T]
+
+
+def controller(
+    limit: int = 2, reserved: int = 1, read_queue: int = 2, read_max_wait: float = 10.0
+) -> AdmissionController:
+    return AdmissionController(f"test-{next(NAMES)}", limit, reserved, read_queue, read_max_wait)
+
+
+def run[T](main: _t.Callable[[], Coro[T]]) -> T:
+    return asyncio.run(main())
+
+
+async def settle() -> None:
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_button_starts_at_once_while_reads_wait() -> None:
+    async def main() -> None:
+        c = controller(limit=3, reserved=1, read_queue=2)
+        for _ in range(2):
+            await c.acquire(Priority.READ)
+        waiting = [asyncio.create_task(c.acquire(Priority.READ)) for _ in range(2)]
+        await settle()
+        assert c.active == 2 and c.queued[Priority.READ] == 2
+
+        # The reserved slot takes the button press without waiting behind the reads
+        button = asyncio.create_task(c.acquire(Priority.BUTTON))
+        await asyncio.sleep(0)
+        assert button.done() and c.active == 3
+
+        # And further reads are shed rather than queued
+        with pytest.raises(AdmissionRejectedError):
+            await c.acquire(Priority.READ)
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert c.queued[Priority.READ] == 0
+
+    run(main)
+
+
+def test_button_jumps_the_queue_without_reserved_slots() -> None:
+    async def main() -> list[Priority]:
+        c = controller(limit=1, reserved=0, read_queue=4)
+        order: list[Priority] = []
+
+        async def call(level: Priority) -> None:
+            async with c.slot(level):
+                order.append(level)
+
+        await c.acquire(Priority.READ)
+        tasks = [asyncio.create_task(call(level)) for level in (Priority.READ, Priority.WRITE)]
+        await settle()
+        tasks.append(asyncio.create_task(call(Priority.BUTTON)))
+        await settle()
+        c.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(main) == [Priority.BUTTON, Priority.WRITE, Priority.READ]
+
+
+def test_reserved_slots_are_not_given_to_api_calls() -> None:
+    async def main() -> None:
+        c = controller(limit=3, reserved=2)
+        await c.acquire(Priority.WRITE)
+        write = asyncio.create_task(c.acquire(Priority.WRITE))
+        await settle()
+        assert not write.done()
+        await c.acquire(Priority.SCENE)
+        await c.acquire(Priority.BUTTON)
+        assert c.active == 3
+        c.release()
+        c.release()
+        await settle()
+        # A write only starts once a slot outside the reserved ones is free
+        assert not write.done()
+        c.release()
+        await write
+        assert c.active == 1
+
+    run(main)
+
+
+def test_read_shed_after_max_wait() -> None:
+    async def main() -> None:
+        c = controller(limit=2, reserved=1, read_max_wait=0.01)
+        await c.acquire(Priority.READ)
+        with pytest.raises(AdmissionRejectedError):
+            await c.acquire(Priority.READ)
+        assert c.queued[Priority.READ] == 0 and c.active == 1
+
+    run(main)
+
+
+def test_deadline_bounds_the_wait() -> None:
+    async def main() -> None:
+        c = controller(limit=2, reserved=1)
+        await c.acquire(Priority.WRITE)
+        token = deadlines.CURRENT.set(deadlines.Deadline(0.01))
+        try:
+            with pytest.raises(deadlines.DeadlineExceededError):
+                await c.acquire(Priority.WRITE)
+        finally:
+            deadlines.CURRENT.reset(token)
+        assert c.queued[Priority.WRITE] == 0 and c.active == 1
+
+    run(main)
+
+
+def test_admitted_as_the_wait_times_out_keeps_the_slot() -> None:
+    async def main() -> None:
+        # With no time to wait the timeout fires on the next loop iteration
+        c = controller(limit=2, reserved=1, read_max_wait=0.0)
+        await c.acquire(Priority.READ)
+        waiter = asyncio.create_task(c.acquire(Priority.READ))
+        await asyncio.sleep(0)
+        # Admit the waiter after its timeout is scheduled but before it resumes
+        c.release()
+        await waiter
+        assert c.active == 1 and c.queued[Priority.READ] == 0
+
+    run(main)
+
+
+def test_cancelled_after_admission_gives_the_slot_back() -> None:
+    async def main() -> None:
+        c = controller(limit=2, reserved=1)
+        await c.acquire(Priority.WRITE)
+        waiter = asyncio.create_task(c.acquire(Priority.WRITE))
+        await asyncio.sleep(0)
+        c.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert c.active == 0 and c.queued[Priority.WRITE] == 0
+
+    run(main)
@@ -0,0 +1,30 @@
+import asyncio
+import pathlib
+
+import pytest
+
+from mkhome.automations import bindings
+from mkhome.bus import EventBus
+from mkhome.settings import settings
+
+
+@pytest.mark.parametrize(
+    "content", ["bindings: [\n  - name: unclosed\n", "bindings: [{button: 1}]\n"]
+)
+def test_startup_survives_invalid_file(
+    content: str, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "bindings.yaml"
+    path.write_text(content)
+    monkeypatch.setattr(settings.application_settings, "bindings_file", str(path))
+    monkeypatch.setattr(settings.application_settings, "bindings_watch_interval", 0.0)
+    monkeypatch.setattr(bindings, "BUS", EventBus())
+    empty = bindings.DispatchTable({}, {}, 0.0)
+    monkeypatch.setattr(bindings, "TABLE", empty)
+
+    async def main() -> None:
+        await bindings.startup()
+        await bindings.shutdown()
+
+    asyncio.run(main())
+    assert bindings.TABLE is empty
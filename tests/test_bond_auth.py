@@ -0,0 +1,82 @@
+import asyncio
+import typing as _t
+
+import pytest
+from fastapi import HTTPException
+
+from mkhome.bridges import bond
+from mkhome.settings import BondBridgeSettings
+
+
+class Response:
+    def __init__(self, status_code: int, body: _t.Any) -> None:
+        self.status_code = status_code
+        self.text = str(body)
+        self._body = body
+
+    def json(self) -> _t.Any:
+        return self._body
+
+
+@pytest.fixture
+def answer(monkeypatch: pytest.MonkeyPatch) -> list[Response]:
+    """The response of the bridge to the next token request."""
+    responses = [Response(200, {"locked": 1})]
+
+    async def get(url: str, **kwargs: _t.Any) -> Response:
+        return responses[-1]
+
+    monkeypatch.setattr(bond.requests, "get", get)
+    monkeypatch.setattr(bond.BRIDGE.auth, "token", None)
+    return responses
+
+
+def test_unlocked_bridge_gives_out_its_token(answer: list[Response]) -> None:
+    answer.append(Response(200, {"token": "abc"}))
+    asyncio.run(bond.BRIDGE.check_token())
+    assert bond.BRIDGE.auth.token == "abc"
+
+
+def test_locked_bridge_is_an_authorization_error(answer: list[Response]) -> None:
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(bond.BRIDGE.auth.fetch_token())
+    assert exc.value.status_code == 401
+    assert "BOND_TOKEN" in exc.value.detail
+
+
+def test_failed_token_read_is_a_gateway_error(answer: list[Response]) -> None:
+    answer.append(Response(404, "Not Found"))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(bond.BRIDGE.auth.fetch_token())
+    assert exc.value.status_code == 502
+
+
+def test_startup_fails_without_a_token_for_a_locked_bridge(answer: list[Response]) -> None:
+    with pytest.raises(RuntimeError, match="has no token"):
+        asyncio.run(bond.BRIDGE.check_token())
+
+
+def test_startup_continues_while_the_bridge_is_unreachable(
+    answer: list[Response], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def unreachable(url: str, **kwargs: _t.Any) -> Response:
+        raise TimeoutError
+
+    monkeypatch.setattr(bond.requests, "get", unreachable)
+    asyncio.run(bond.BRIDGE.check_token())
+    assert bond.BRIDGE.auth.token is None
+
+
+def test_configured_token_is_not_read(
+    answer: list[Response], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(bond.BRIDGE.auth, "token", "configured")
+    asyncio.run(bond.BRIDGE.check_token())
+    assert bond.BRIDGE.auth.token == "configured"
+
+
+def test_token_comes_from_the_bond_environment_variable(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TOKEN", "unrelated")
+    assert BondBridgeSettings().token is None
+    monkeypatch.setenv("BOND_TOKEN", "abc")
+    assert BondBridgeSettings().token == "abc"
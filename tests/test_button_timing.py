@@ -0,0 +1,54 @@
+import itertools
+
+from mkhome.bridges.lutron import ButtonTiming
+from mkhome.settings import ButtonTimingSettings
+
+
+BUTTON_IDS = itertools.count()
+CONFIG = ButtonTimingSettings(adaptive=True, min_samples=10)
+
+
+def timing() -> ButtonTiming:
+    return ButtonTiming(f"test-{next(BUTTON_IDS)}", CONFIG)
+
+
+def press(timing: ButtonTiming, now: float, hold: float, long_press: bool = False) -> float:
+    timing.record_press(now)
+    timing.record_release(now + hold, now, long_press)
+    return now + hold + 2.0
+
+
+def test_defaults_before_enough_presses() -> None:
+    t = timing()
+    now = 0.0
+    for _ in range(CONFIG.min_samples - 1):
+        now = press(t, now, 0.2)
+    assert t.long_press_duration == CONFIG.long_press_duration
+
+
+def test_threshold_covers_clicks() -> None:
+    t = timing()
+    now = 0.0
+    for i in range(50):
+        now = press(t, now, 0.3 + 0.1 * (i % 2))
+    assert 0.4 < t.long_press_duration < CONFIG.long_press_duration
+
+
+def test_long_presses_are_not_learned() -> None:
+    t = timing()
+    now = 0.0
+    for _ in range(50):
+        now = press(t, now, 0.6)
+    adapted, clicks = t.long_press_duration, t.holds.count
+    for _ in range(50):
+        now = press(t, now, 1.5, long_press=True)
+    assert t.long_press_duration == adapted
+    assert t.holds.count == clicks
+
+
+def test_threshold_floored() -> None:
+    t = timing()
+    now = 0.0
+    for _ in range(50):
+        now = press(t, now, 0.1)
+    assert t.long_press_duration == CONFIG.min_long_press_duration
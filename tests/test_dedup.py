@@ -0,0 +1,139 @@
+import pytest
+
+from mkhome.utils import dedup, metrics
+from mkhome.utils.dedup import CommandDeduplicator
+
+
+RELATIVE = {
+    "ToggleLight": "ToggleLight",
+    "IncreaseSpeed": "DecreaseSpeed",
+    "DecreaseSpeed": "IncreaseSpeed",
+}
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(dedup.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def deduplicator() -> CommandDeduplicator:
+    return CommandDeduplicator("test", 2.5, RELATIVE)
+
+
+def admit_from(source: str, d: CommandDeduplicator, command: str, **args: int) -> bool:
+    with dedup.source(source):
+        return d.admit("cf", command, args)
+
+
+def test_repeats_from_the_same_source_are_sent(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert deduplicator.admit("cf", "TurnLightOn", {})
+    assert deduplicator.admit("cf", "TurnLightOn", {})
+    assert admit_from("button:140", deduplicator, "SetSpeed", argument=3)
+    assert admit_from("button:140", deduplicator, "SetSpeed", argument=3)
+
+
+def test_same_command_from_another_source_is_suppressed(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "TurnLightOn")
+    assert not deduplicator.admit("cf", "TurnLightOn", {})
+    assert not admit_from("rule:sunset", deduplicator, "TurnLightOn")
+
+
+def test_other_arguments_are_not_duplicates(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "SetSpeed", argument=3)
+    assert deduplicator.admit("cf", "SetSpeed", {"argument": 4})
+
+
+def suppressed(reason: str) -> int:
+    return metrics.counter("commands_suppressed_total", bridge="test", reason=reason).value
+
+
+def test_steps_from_the_same_source_are_sent(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "IncreaseSpeed")
+    assert admit_from("button:140", deduplicator, "IncreaseSpeed")
+    assert admit_from("button:140", deduplicator, "DecreaseSpeed")
+
+
+def test_same_step_from_another_source_is_collapsed(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    before = suppressed("duplicate")
+    assert admit_from("button:140", deduplicator, "IncreaseSpeed")
+    assert not deduplicator.admit("cf", "IncreaseSpeed", {})
+    assert suppressed("duplicate") == before + 1
+
+
+def test_second_remote_toggle_is_suppressed(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    # Two remotes bound to the same light pressed at once would turn it on and off again
+    before = suppressed("cancelling")
+    assert admit_from("button:126", deduplicator, "ToggleLight")
+    assert not admit_from("button:131", deduplicator, "ToggleLight")
+    assert not deduplicator.admit("cf", "ToggleLight", {})
+    assert suppressed("cancelling") == before + 2
+    # A second press of the same remote is deliberate
+    assert admit_from("button:126", deduplicator, "ToggleLight")
+
+
+def test_step_undone_by_another_source_is_suppressed(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "IncreaseSpeed")
+    assert not admit_from("button:141", deduplicator, "DecreaseSpeed")
+
+
+def test_inverse_commands_are_corrections(clock: Clock, deduplicator: CommandDeduplicator) -> None:
+    assert deduplicator.admit("cf", "TurnLightOn", {})
+    assert deduplicator.admit("cf", "TurnLightOff", {})
+    assert admit_from("button:140", deduplicator, "TurnLightOn")
+    assert admit_from("button:140", deduplicator, "TurnLightOff")
+
+
+def test_duplicates_are_sent_after_the_window(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "TurnLightOn")
+    clock.now += 2.4
+    assert not deduplicator.admit("cf", "TurnLightOn", {})
+    clock.now += 0.2
+    assert deduplicator.admit("cf", "TurnLightOn", {})
+
+
+def test_targets_are_independent(clock: Clock, deduplicator: CommandDeduplicator) -> None:
+    assert admit_from("button:140", deduplicator, "TurnLightOn")
+    assert deduplicator.admit("other", "TurnLightOn", {})
+
+
+def test_forget_lets_a_failed_command_be_retried(
+    clock: Clock, deduplicator: CommandDeduplicator
+) -> None:
+    assert admit_from("button:140", deduplicator, "TurnLightOn")
+    deduplicator.forget("cf")
+    assert deduplicator.admit("cf", "TurnLightOn", {})
+
+
+def test_zero_window_disables_suppression(clock: Clock) -> None:
+    d = CommandDeduplicator("test", 0.0, RELATIVE)
+    assert admit_from("button:140", d, "TurnLightOn")
+    assert d.admit("cf", "TurnLightOn", {})
+    assert d.admit("cf", "ToggleLight", {})
+    assert admit_from("button:140", d, "ToggleLight")
@@ -0,0 +1,88 @@
+import asyncio
+import itertools
+import threading
+import typing as _t
+
+import pytest
+
+from mkhome.utils.executors import BoundedExecutor, ExecutorSaturatedError
+
+
+NAMES = itertools.count()
+
+
+def executor(workers: int = 1, queue_size: int = 1) -> BoundedExecutor:
+    return BoundedExecutor(f"test-{next(NAMES)}", workers, queue_size)
+
+
+async def until(condition: _t.Callable[[], bool]) -> None:
+    async with asyncio.timeout(1.0):
+        while not condition():
+            await asyncio.sleep(0.001)
+
+
+def test_calls_run_on_the_pool() -> None:
+    e = executor()
+    name = asyncio.run(e.run(lambda: threading.current_thread().name))
+    assert name.startswith(f"mkhome-{e.name}")
+    assert e.active == 0 and e.queued == 0
+
+
+def test_rejects_calls_beyond_workers_and_queue() -> None:
+    e = executor(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def main() -> None:
+        running = asyncio.create_task(e.run(release.wait))
+        waiting = asyncio.create_task(e.run(release.wait))
+        await until(lambda: e.active == 1 and e.queued == 1)
+        with pytest.raises(ExecutorSaturatedError) as exc:
+            await e.run(release.wait)
+        assert exc.value.status_code == 503
+        release.set()
+        await asyncio.gather(running, waiting)
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+    assert e.status()["rejected"] == 1
+    assert e.active == 0 and e.queued == 0
+
+
+def test_calls_from_the_pool_run_inline() -> None:
+    e = executor(workers=1, queue_size=0)
+
+    def outer() -> tuple[str, str]:
+        # Waiting for the only thread from that thread would never finish
+        inner = asyncio.run(e.run(lambda: threading.current_thread().name))
+        return threading.current_thread().name, inner
+
+    outer_thread, inner_thread = asyncio.run(e.run(outer))
+    assert inner_thread == outer_thread
+
+
+def test_cancelled_while_queued_frees_its_queue_slot() -> None:
+    e = executor(workers=1, queue_size=1)
+    release = threading.Event()
+    ran: list[str] = []
+
+    async def main() -> None:
+        running = asyncio.create_task(e.run(release.wait))
+        waiting = asyncio.create_task(e.run(ran.append, "queued"))
+        await until(lambda: e.active == 1 and e.queued == 1)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert e.queued == 0
+        # The slot is free again
+        release.set()
+        await running
+        await e.run(ran.append, "after")
+
+    try:
+        asyncio.run(main())
+    finally:
+        release.set()
+    assert ran == ["after"]
+    assert e.active == 0 and e.queued == 0
@@ -0,0 +1,106 @@
+import asyncio
+import math
+import typing as _t
+
+import pytest
+
+from mkhome import groups
+from mkhome.bridges import bond, lutron
+
+
+def lutron_device(device_id: str, **fields: _t.Any) -> lutron.LutronDevice:
+    return lutron.LutronDevice(device_id=device_id, current_state=0, zone=1, **fields)
+
+
+def run_step(step: groups.Step, device_id: str) -> None:
+    async def main() -> None:
+        await step(device_id)
+
+    asyncio.run(main())
+
+
+class Levels:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, int]] = []
+
+    async def __call__(self, device_id: str, level: int) -> None:
+        self.calls.append((device_id, level))
+
+
+@pytest.fixture
+def levels(monkeypatch: pytest.MonkeyPatch) -> Levels:
+    levels = Levels()
+    monkeypatch.setattr(lutron, "set_level", levels)
+    return levels
+
+
+@pytest.mark.parametrize(("speed", "level"), [(0, 0), (1, 25), (3, 75), (4, 100), (6, 100)])
+def test_lutron_fan_set_speed(speed: int, level: int, levels: Levels) -> None:
+    fan = lutron_device("7", fan_speed="Off", type="CasetaFanSpeedController")
+    (step,) = groups.lutron_steps(fan, "set-speed", speed)
+    run_step(step, "7")
+    assert levels.calls == [("7", level)]
+
+
+def test_lutron_set_level_skips_fans(levels: Levels) -> None:
+    fan = lutron_device("7", fan_speed="Low")
+    dimmer = lutron_device("8", type="WallDimmer")
+    assert groups.lutron_steps(fan, "set-level", 50) == []
+    assert groups.lutron_steps(dimmer, "set-speed", 2) == []
+    (step,) = groups.lutron_steps(dimmer, "set-level", 50)
+    run_step(step, "8")
+    assert levels.calls == [("8", 50)]
+
+
+class Bridges:
+    def __init__(self) -> None:
+        self.bond_reads = 0
+        self.bond_up = False
+
+    async def bond_devices(self) -> list[str]:
+        self.bond_reads += 1
+        if not self.bond_up:
+            raise RuntimeError("Bond Bridge unreachable")
+        return ["fan1"]
+
+    async def bond_device(self, device_id: str) -> _t.Any:
+        return bond.BondDevice.model_validate(
+            {"device_id": device_id, "name": "Fan", "type": "CF", "location": "Office"}
+        )
+
+    async def lutron_devices(self) -> list[lutron.LutronDevice]:
+        return [lutron_device("5", area="1")]
+
+
+@pytest.fixture
+def bridges(monkeypatch: pytest.MonkeyPatch) -> Bridges:
+    bridges = Bridges()
+    monkeypatch.setattr(bond, "get_devices", bridges.bond_devices)
+    monkeypatch.setattr(bond, "get_device", bridges.bond_device)
+    monkeypatch.setattr(lutron, "get_devices", bridges.lutron_devices)
+    monkeypatch.setattr(lutron, "get_area_name", lambda area_id: "Office")
+    monkeypatch.setattr(groups, "_AREA_GROUPS", (-math.inf, {}))
+    return bridges
+
+
+def members(group: groups.Group) -> list[tuple[str, str]]:
+    return [(member.bridge, member.device) for member in group.members]
+
+
+def test_area_groups_cache_partial_result_briefly(
+    bridges: Bridges, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    partial = asyncio.run(groups.area_groups())
+    assert members(partial["office"]) == [("lutron", "5")]
+    # Cached, so the unreachable Bond Bridge is not read again right away
+    assert asyncio.run(groups.area_groups()) is partial
+    assert bridges.bond_reads == 1
+
+    expires, _ = groups._AREA_GROUPS
+    assert expires - groups.time.monotonic() <= groups.PARTIAL_AREAS_TTL
+    bridges.bond_up = True
+    monkeypatch.setattr(groups, "_AREA_GROUPS", (-math.inf, partial))
+    complete = asyncio.run(groups.area_groups())
+    assert members(complete["office"]) == [("bond", "fan1"), ("lutron", "5")]
+    assert asyncio.run(groups.area_groups()) is complete
+    assert bridges.bond_reads == 2
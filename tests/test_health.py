@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import typing as _t
+
+import pytest
+
+from mkhome.bridges import bond
+from mkhome.utils import resilience
+from mkhome.utils.health import HealthMonitor, RttEstimator
+
+
+NAMES = itertools.count()
+
+
+class Probe:
+    def __init__(self) -> None:
+        self.error: Exception | None = None
+        self.delay = 0.0
+        self.calls = 0
+
+    async def __call__(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+
+
+def monitor(probe: Probe, max_timeout: float = 1.0) -> HealthMonitor:
+    return HealthMonitor(
+        f"test-{next(NAMES)}",
+        probe,
+        min_interval=1.0,
+        max_interval=8.0,
+        degraded_rtt=0.5,
+        down_after=3,
+        timeouts=RttEstimator(0.1, max_timeout),
+    )
+
+
+def test_slow_calls_degrade_and_fast_ones_recover() -> None:
+    m = monitor(Probe())
+    m.observe(0.1)
+    assert m.state == "up"
+    for _ in range(10):
+        m.observe(2.0)
+    assert m.state == "degraded"
+    for _ in range(30):
+        m.observe(0.1)
+    assert m.state == "up"
+
+
+def test_consecutive_failures_take_the_bridge_down() -> None:
+    m = monitor(Probe())
+    m.fail()
+    m.fail()
+    assert m.state == "degraded" and m.failures == 2
+    m.fail()
+    assert m.state == "down"
+    # One success brings it back
+    m.observe(0.1)
+    assert m.state == "up" and m.failures == 0
+
+
+def test_state_change_wakes_the_prober() -> None:
+    m = monitor(Probe())
+    m.fail()
+    assert m._wake.is_set()
+    m._wake.clear()
+    m.fail()
+    assert not m._wake.is_set()
+
+
+def test_failed_and_timed_out_probes_count_as_failures() -> None:
+    probe = Probe()
+    m = monitor(probe, max_timeout=0.01)
+    probe.error = ConnectionError()
+    assert asyncio.run(m.check()) == "degraded"
+    probe.error, probe.delay = None, 1.0
+    assert asyncio.run(m.check()) == "degraded"
+    assert asyncio.run(m.check()) == "down"
+    probe.delay = 0.0
+    assert asyncio.run(m.check()) == "up"
+
+
+def test_rtt_timeout_stays_within_bounds() -> None:
+    rtt = RttEstimator(0.1, 2.0)
+    assert rtt.timeout == 2.0
+    rtt.observe(0.001)
+    assert rtt.timeout == 0.1
+    for _ in range(5):
+        rtt.observe(5.0)
+    assert rtt.timeout == 2.0
+
+
+def test_down_bridge_fails_fast(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent: list[str] = []
+
+    async def send(executor: _t.Any, method: str, url: str, **kwargs: _t.Any) -> None:
+        sent.append(url)
+
+    monkeypatch.setattr(bond.requests, "send", send)
+    monkeypatch.setattr(bond.BRIDGE.health, "state", "down")
+    with pytest.raises(resilience.BridgeDownError) as exc:
+        asyncio.run(bond.BRIDGE.send_request("GET", "/v2/devices"))
+    assert exc.value.status_code == 503
+    assert exc.value.headers is not None and "Retry-After" in exc.value.headers
+    assert sent == []
@@ -0,0 +1,100 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from mkhome import leader
+from mkhome.bridges import lutron
+from mkhome.bridges.lutron import DispatchGate, GestureStamp
+
+
+@pytest.fixture
+def gate(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> DispatchGate:
+    gate = DispatchGate()
+    gate.acknowledge = leader.acknowledge
+    gate.hold()
+    monkeypatch.setattr(lutron, "GATE", gate)
+    monkeypatch.setattr(leader, "STATUS_FILE", str(tmp_path / "leader.json"))
+    monkeypatch.setattr(leader, "is_leader", lambda: True)
+    monkeypatch.setattr(leader, "_SINCE", float("-inf"))
+    monkeypatch.setattr(leader, "_DISPATCHED", leader.deque())
+    return gate
+
+
+def hold(gate: DispatchGate, stamp: GestureStamp, dispatched: list[GestureStamp]) -> None:
+    gate.submit(stamp, lambda: dispatched.append(stamp))
+
+
+def test_stamps_match_within_tolerance() -> None:
+    stamp = GestureStamp("b", "140", "SINGLE_CLICK", 100.0)
+    assert stamp.matches(stamp._replace(started=100.05))
+    assert not stamp.matches(stamp._replace(started=100.5))
+    assert not stamp.matches(stamp._replace(action="DOUBLE_CLICK"))
+    assert not stamp.matches(stamp._replace(binding="other"))
+
+
+def test_dispatch_is_acknowledged_first() -> None:
+    gate = DispatchGate()
+    events: list[str] = []
+    gate.acknowledge = lambda stamp: events.append("ack")
+    gate.submit(GestureStamp("b", "140", "SINGLE_CLICK", 1.0), lambda: events.append("dispatch"))
+    assert events == ["ack", "dispatch"]
+
+
+def test_failover_replays_only_unacknowledged_gestures(gate: DispatchGate) -> None:
+    now = time.time()
+    handled = GestureStamp("b", "140", "SINGLE_CLICK", now - 0.5)
+    missed = GestureStamp("b", "141", "SINGLE_CLICK", now - 0.4)
+    # The dead leader dispatched `handled` after its last heartbeat, seen slightly later here
+    leader.write_status(heartbeat=now - 2)
+    status = json.loads(Path(leader.STATUS_FILE).read_text())
+    status["dispatched"] = [list(handled)]
+    Path(leader.STATUS_FILE).write_text(json.dumps(status))
+
+    dispatched: list[GestureStamp] = []
+    hold(gate, handled._replace(started=handled.started + 0.02), dispatched)
+    hold(gate, missed, dispatched)
+    leader._promote()
+
+    assert dispatched == [missed]
+    recorded = [GestureStamp(*s) for s in leader.read_status()["dispatched"]]
+    assert recorded == [handled, missed]
+
+
+def test_handoff_replays_gestures_after_the_resignation(gate: DispatchGate) -> None:
+    now = time.time()
+    before = GestureStamp("b", "140", "SINGLE_CLICK", now - 1.0)
+    after = GestureStamp("b", "140", "SINGLE_CLICK", now - 0.2)
+    leader.write_status(heartbeat=now - 0.5, resigned=True)
+
+    dispatched: list[GestureStamp] = []
+    hold(gate, before, dispatched)
+    hold(gate, after, dispatched)
+    leader._promote()
+
+    assert dispatched == [after]
+
+
+def test_old_acknowledgements_are_dropped(gate: DispatchGate) -> None:
+    now = time.time()
+    old = GestureStamp("b", "140", "SINGLE_CLICK", now - leader.DISPATCH_WINDOW - 1)
+    leader.acknowledge(old)
+    recent = GestureStamp("b", "140", "SINGLE_CLICK", now)
+    leader.acknowledge(recent)
+
+    status = leader.read_status()
+    assert [GestureStamp(*s) for s in status["dispatched"]] == [recent]
+    assert status["since"] > old.started
+
+
+@pytest.mark.parametrize(
+    ("argv", "workers"),
+    [
+        (["uvicorn", "mkhome:app", "--fd", "3"], 1),
+        (["uvicorn", "mkhome:app", "--workers", "4"], 4),
+        (["uvicorn", "mkhome:app", "--workers=2"], 2),
+    ],
+)
+def test_uvicorn_workers(argv: list[str], workers: int) -> None:
+    assert leader.uvicorn_workers(argv) == workers
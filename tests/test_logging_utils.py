@@ -0,0 +1,70 @@
+import logging
+import logging.handlers
+import queue
+import threading
+
+from mkhome.utils import logging_utils
+from mkhome.utils.logging_utils import DeferredQueueHandler, lazy
+
+
+class Recorder(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(self.format(record))
+
+
+def test_prepare_enqueues_the_record_unformatted() -> None:
+    q: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = DeferredQueueHandler(q)
+    renders: list[str] = []
+
+    def render() -> str:
+        renders.append(threading.current_thread().name)
+        return "payload"
+
+    arg = lazy(render)
+    record = logging.LogRecord("mkhome.test", logging.DEBUG, __file__, 1, "state %s", (arg,), None)
+
+    handler.handle(record)
+
+    assert q.get_nowait() is record
+    assert renders == []
+
+
+def test_lazy_arguments_render_on_the_listener_thread() -> None:
+    q: queue.Queue[logging.LogRecord] = queue.Queue()
+    recorder = Recorder()
+    listener = logging.handlers.QueueListener(q, recorder)
+    logger = logging.getLogger("mkhome.test.deferred")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = DeferredQueueHandler(q)
+    logger.addHandler(handler)
+    listener.start()
+    listener_thread = listener._thread.name  # type: ignore[union-attr]
+    try:
+        logger.debug("rendered on %s", lazy(lambda: threading.current_thread().name))
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+
+    assert recorder.messages == [f"rendered on {listener_thread}"]
+
+
+def test_listeners_start_and_stop_once() -> None:
+    q: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = DeferredQueueHandler(q)
+    handler.set_name("mkhome_test_queue")
+    handler.listener = logging.handlers.QueueListener(q, Recorder())  # type: ignore[attr-defined]
+    try:
+        logging_utils.start_queue_listeners()
+        logging_utils.start_queue_listeners()
+        assert logging_utils._RUNNING.count(handler.listener) == 1  # type: ignore[attr-defined]
+        logging_utils.stop_queue_listeners()
+        logging_utils.stop_queue_listeners()
+        assert logging_utils._RUNNING == []
+    finally:
+        handler.close()
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import pathlib
+import typing as _t
+
+import pytest
+
+from mkhome.bridges import bond
+from mkhome.routes import bond as routes
+from mkhome.state import HASH_HEADER, StateStore
+
+
+class Response:
+    def __init__(self, body: dict[str, _t.Any]) -> None:
+        self.status_code = 200
+        self.text = json.dumps(body)
+        self._body = body
+
+    def json(self) -> dict[str, _t.Any]:
+        return self._body
+
+
+class Bridge:
+    """A Bond bridge that updates its belief state on every command it accepts."""
+
+    TOGGLES = {"ToggleLight": "light", "TogglePower": "power"}
+
+    def __init__(self) -> None:
+        self.state: dict[str, _t.Any] = {"power": 1, "speed": 1, "light": 0, "_": "0"}
+        self.reads = 0
+
+    async def send_request(self, method: str, endpoint: str, **kwargs: _t.Any) -> Response:
+        if method == "GET":
+            self.reads += 1
+            return Response(dict(self.state))
+        action = endpoint.rsplit("/", 1)[-1]
+        if action == "SetSpeed":
+            self.state.update(power=1, speed=kwargs["json"]["argument"])
+        elif action in self.TOGGLES:
+            field = self.TOGGLES[action]
+            self.state[field] = int(not self.state[field])
+        self.state["_"] = str(int(self.state["_"]) + 1)
+        return Response({})
+
+
+@pytest.fixture
+def bridge(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> Bridge:
+    bridge = Bridge()
+    store = StateStore(str(tmp_path / "state.json"))
+    monkeypatch.setattr(bond, "STORE", store)
+    monkeypatch.setattr(routes, "STORE", store)
+    monkeypatch.setattr(bond, "_STATES", {})
+    monkeypatch.setattr(bond.BRIDGE, "send_request", bridge.send_request)
+
+    async def route(device_id: str) -> bond.BondBridge:
+        return bond.BRIDGE
+
+    async def check_action(device_id: str, action: str) -> None:
+        pass
+
+    monkeypatch.setattr(bond, "route", route)
+    monkeypatch.setattr(bond, "check_action", check_action)
+    return bridge
+
+
+async def poll(since: str, wait: float = 5.0) -> tuple[dict[str, _t.Any], str]:
+    response = await routes.get_state("cf", max_age=0, wait=wait, since=since)
+    return json.loads(bytes(response.body)), response.headers[HASH_HEADER]
+
+
+def test_absolute_command_wakes_waiters_without_a_read(bridge: Bridge) -> None:
+    async def main() -> None:
+        _, known = await poll(since="none", wait=1.0)
+        reads = bridge.reads
+        waiters = [asyncio.create_task(poll(known)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert not any(waiter.done() for waiter in waiters)
+
+        await bond.set_speed("cf", 4)
+        for state, current in await asyncio.wait_for(asyncio.gather(*waiters), 1.0):
+            assert state["speed"] == 4 and current != known
+        assert bridge.reads == reads
+
+    asyncio.run(main())
+
+
+def test_relative_command_wakes_waiters_with_one_read(bridge: Bridge) -> None:
+    async def main() -> None:
+        _, known = await poll(since="none", wait=1.0)
+        reads = bridge.reads
+        waiters = [asyncio.create_task(poll(known)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        await bond.toggle_light("cf")
+        for state, _ in await asyncio.wait_for(asyncio.gather(*waiters), 1.0):
+            assert state["light"] == 1
+        assert bridge.reads == reads + 1
+
+    asyncio.run(main())
+
+
+def test_refresh_after_commands_in_quick_succession(bridge: Bridge) -> None:
+    async def main() -> None:
+        _, known = await poll(since="none", wait=1.0)
+        reads = bridge.reads
+        for _ in range(3):
+            await bond.toggle_light("cf")
+        while bond._REFRESHES:
+            await asyncio.sleep(0.01)
+        # The read that follows the last command sees its effect
+        state, _ = await poll(known, wait=0.1)
+        assert state["light"] == 1
+        assert bridge.reads <= reads + 2
+
+    asyncio.run(main())
+
+
+def test_waiter_times_out_without_a_change(bridge: Bridge) -> None:
+    async def main() -> None:
+        first, known = await poll(since="none", wait=1.0)
+        state, current = await poll(known, wait=0.05)
+        assert state == first and current == known
+
+    asyncio.run(main())
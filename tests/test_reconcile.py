@@ -0,0 +1,127 @@
+import asyncio
+import time
+import typing as _t
+
+import pytest
+
+from mkhome.bridges import bond
+from mkhome.bus import BondCommandSent
+from mkhome.reconcile import Reconciler
+
+
+class Bridge:
+    """The belief state the fake bridge reports, and the state updates sent to it."""
+
+    def __init__(self) -> None:
+        self.states: dict[str, dict[str, _t.Any]] = {}
+        self.updates: list[tuple[str, dict[str, _t.Any]]] = []
+        self.during_read: _t.Callable[[], _t.Awaitable[None]] | None = None
+
+    async def get_state(self, device_id: str) -> bond.BondDeviceState:
+        if self.during_read is not None:
+            await self.during_read()
+        return bond.BondDeviceState(device_id=device_id, **self.states.get(device_id, {}))
+
+    async def update_state(self, device_id: str, **state: _t.Any) -> None:
+        self.updates.append((device_id, state))
+
+
+@pytest.fixture
+def bridge(monkeypatch: pytest.MonkeyPatch) -> Bridge:
+    bridge = Bridge()
+    monkeypatch.setattr(bond, "get_state", bridge.get_state)
+    monkeypatch.setattr(bond, "update_state", bridge.update_state)
+    return bridge
+
+
+def sent(device_id: str, action: str, age: float = 10.0, **args: _t.Any) -> BondCommandSent:
+    return BondCommandSent(
+        device_id=device_id,
+        action=action,
+        args=args,
+        state_hash=None,
+        published=time.monotonic() - age,
+    )
+
+
+def reconciler() -> Reconciler:
+    return Reconciler(interval=5.0, settle=2.0, window=60.0)
+
+
+def test_expect_tracks_absolute_fields() -> None:
+    r = reconciler()
+    asyncio.run(r.expect(sent("fan", "SetSpeed", argument=3)))
+    asyncio.run(r.expect(sent("fan", "TurnLightOn")))
+    assert r.expected["fan"].fields == {"power": True, "speed": 3, "light": 1}
+    asyncio.run(r.expect(sent("fan", "GetTimer")))
+    assert r.expected["fan"].fields == {"power": True, "speed": 3, "light": 1}
+
+
+def test_relative_commands_make_fields_unknown() -> None:
+    r = reconciler()
+    asyncio.run(r.expect(sent("fan", "SetSpeed", argument=3)))
+    asyncio.run(r.expect(sent("fan", "TurnLightOn")))
+    asyncio.run(r.expect(sent("fan", "IncreaseSpeed")))
+    assert r.expected["fan"].fields == {"light": 1}
+    asyncio.run(r.expect(sent("fan", "ToggleLight")))
+    assert "fan" not in r.expected
+
+
+def test_check_confirms_matching_state(bridge: Bridge) -> None:
+    r = reconciler()
+    bridge.states["fan"] = {"power": True, "speed": 3}
+    asyncio.run(r.expect(sent("fan", "SetSpeed", argument=3)))
+    assert asyncio.run(r.reconcile()) == {"fan": "match"}
+    assert r.expected == {}
+
+
+def test_check_reports_external_change_without_reverting(bridge: Bridge) -> None:
+    r = reconciler()
+    # Someone turned the light back off with the Bond app after our command
+    bridge.states["fan"] = {"light": 0}
+    asyncio.run(r.expect(sent("fan", "TurnLightOn")))
+    assert asyncio.run(r.reconcile()) == {"fan": "changed"}
+    assert bridge.updates == []
+    # Not checked again until the next command
+    assert r.expected == {}
+    assert asyncio.run(r.reconcile()) == {}
+
+
+def test_unsettled_devices_wait(bridge: Bridge) -> None:
+    r = reconciler()
+    asyncio.run(r.expect(sent("fan", "TurnLightOn", age=0.0)))
+    assert asyncio.run(r.reconcile()) == {}
+    assert "fan" in r.expected
+
+
+def test_expectations_expire(bridge: Bridge) -> None:
+    r = reconciler()
+    asyncio.run(r.expect(sent("fan", "TurnLightOn", age=61.0)))
+    assert asyncio.run(r.reconcile()) == {}
+    assert r.expected == {}
+
+
+def test_command_during_check_supersedes_it(bridge: Bridge) -> None:
+    r = reconciler()
+    bridge.states["fan"] = {"light": 0}
+
+    async def command() -> None:
+        bridge.during_read = None
+        await r.expect(sent("fan", "TurnLightOff", age=0.0))
+
+    bridge.during_read = command
+    asyncio.run(r.expect(sent("fan", "TurnLightOn")))
+    assert asyncio.run(r.reconcile()) == {"fan": "superseded"}
+    assert r.expected["fan"].fields == {"light": 0}
+
+
+def test_failed_read_is_retried(bridge: Bridge, monkeypatch: pytest.MonkeyPatch) -> None:
+    r = reconciler()
+
+    async def unreachable(device_id: str) -> bond.BondDeviceState:
+        raise TimeoutError
+
+    monkeypatch.setattr(bond, "get_state", unreachable)
+    asyncio.run(r.expect(sent("fan", "TurnLightOn")))
+    assert asyncio.run(r.reconcile()) == {"fan": "error"}
+    assert "fan" in r.expected
@@ -0,0 +1,152 @@
+import asyncio
+import pathlib
+import threading
+import time
+import typing as _t
+
+import pytest
+
+from mkhome import recorder
+from mkhome.bus import BondStateChanged
+from mkhome.recorder import Recorder, Transitions
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(recorder.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def rec(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Recorder:
+    rec = Recorder(str(tmp_path / "recorder"), segment_size=4, retention=86400)
+    monkeypatch.setattr(recorder, "RECORDER", rec)
+    monkeypatch.setattr(recorder, "_SEALED", {})
+    monkeypatch.setattr(recorder, "_MERGED", ((), Transitions.empty()))
+    return rec
+
+
+def play(
+    rec: Recorder, clock: Clock, changes: _t.Iterable[tuple[float, str, dict[str, _t.Any]]]
+) -> float:
+    start = clock.now
+    for offset, device_id, state in changes:
+        clock.now = start + offset
+        rec.record("bond", device_id, state)
+    return start
+
+
+def test_on_time(rec: Recorder, clock: Clock) -> None:
+    start = play(
+        rec,
+        clock,
+        [
+            (0, "fan", {"power": 1}),
+            (600, "fan", {"power": 0}),
+            (1000, "fan", {"power": 1}),
+            (0, "lamp", {"power": 0}),
+        ],
+    )
+    result = recorder.on_time("power", start, start + 1600)
+    assert result == {"bond:fan": 1200.0, "bond:lamp": 0.0}
+    # Only the part of a span inside the range counts
+    assert recorder.on_time("power", start + 300, start + 800) == {
+        "bond:fan": 300.0,
+        "bond:lamp": 0.0,
+    }
+
+
+def test_time_at_value(rec: Recorder, clock: Clock) -> None:
+    start = play(
+        rec,
+        clock,
+        [
+            (0, "fan", {"speed": 1}),
+            (300, "fan", {"speed": 3}),
+            (900, "fan", {"speed": 1}),
+            (0, "other", {"speed": 6}),
+        ],
+    )
+    result = recorder.time_at_value("speed", start, start + 1000)
+    assert result == {"bond:fan": {"1": 400.0, "3": 600.0}, "bond:other": {"6": 1000.0}}
+
+
+def test_activity_counts_changes_by_local_hour(rec: Recorder, clock: Clock) -> None:
+    start = play(
+        rec,
+        clock,
+        [
+            (0, "fan", {"power": 1, "speed": 2}),
+            (60, "fan", {"power": 1}),  # Unchanged, not recorded
+            (3600, "fan", {"power": 0}),
+        ],
+    )
+    hours = [time.localtime(start).tm_hour, time.localtime(start + 3600).tm_hour]
+    expected = [0] * 24
+    for hour in (hours[0], hours[0], hours[1]):
+        expected[hour] += 1
+    assert recorder.activity(start, start + 7200) == {"bond:fan": expected}
+    expected[hours[0]] -= 1
+    assert recorder.activity(start, start + 7200, "power") == {"bond:fan": expected}
+
+
+def test_segments_rotate_and_expire(rec: Recorder, clock: Clock) -> None:
+    play(rec, clock, [(i, "fan", {"speed": i % 3}) for i in range(10)])
+    assert len(rec.segments()) == 3
+    assert len(rec.load().timestamp) == 10
+
+    clock.now += rec.retention + 60
+    rec.prune()
+    # Only the segment still being written is kept
+    assert len(rec.segments()) == 1
+
+
+def test_writes_run_off_the_event_loop(rec: Recorder, monkeypatch: pytest.MonkeyPatch) -> None:
+    threads: list[str] = []
+    rotate = rec._rotate
+
+    def tracked_rotate() -> recorder.Segment:
+        threads.append(threading.current_thread().name)
+        return rotate()
+
+    monkeypatch.setattr(rec, "_rotate", tracked_rotate)
+    event = BondStateChanged(device_id="fan", state={"power": 1})
+    asyncio.run(recorder.record(event))
+    assert threads and threads[0].startswith("mkhome-recorder")
+    assert threads[0] != threading.current_thread().name
+    assert len(rec.load().timestamp) == 1
+
+
+def test_prune_skips_segments_another_worker_changes(
+    rec: Recorder, clock: Clock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    play(rec, clock, [(i, "fan", {"speed": i % 3}) for i in range(10)])
+    expired, other, active = rec.segments()
+    clock.now += rec.retention + 60
+    # A segment another worker is creating has no header yet
+    new = pathlib.Path(rec.directory, "0-1.seg")
+    new.write_bytes(b"")
+    segments = rec.segments
+
+    def listed_before_another_worker_pruned() -> list[str]:
+        paths = segments()
+        pathlib.Path(expired).unlink()
+        return paths
+
+    monkeypatch.setattr(rec, "segments", listed_before_another_worker_pruned)
+    rec.prune()
+    monkeypatch.setattr(rec, "segments", segments)
+    assert rec.segments() == sorted([str(new), active])
+    # Rotating prunes too, and the transition that triggered it is still recorded
+    play(rec, clock, [(i, "fan", {"speed": 3 + i}) for i in range(3)])
+    assert len(rec.segments()) == 3
+    assert rec.load().value[-1] == 5
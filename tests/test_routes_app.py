@@ -0,0 +1,22 @@
+import asyncio
+import pathlib
+
+import pytest
+from fastapi import HTTPException
+
+from mkhome.routes import app
+from mkhome.settings import settings
+
+
+BAD_YAML = "bindings: [\n  - name: unclosed\n"
+
+
+def test_reload_bindings_rejects_malformed_yaml(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "bindings.yaml"
+    path.write_text(BAD_YAML)
+    monkeypatch.setattr(settings.application_settings, "bindings_file", str(path))
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(app.reload_bindings())
+    assert raised.value.status_code == 422
@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import json
+import pathlib
+import typing as _t
+
+import pytest
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+from mkhome.bridges import bond
+from mkhome.routes import bond as routes
+from mkhome.state import StateStore
+from mkhome.utils.admission import AdmissionController, AdmissionRejectedError, Priority
+from mkhome.utils.dedup import CommandDeduplicator
+
+
+NAMES = itertools.count()
+
+
+class Response:
+    def __init__(self, body: _t.Any, status_code: int = 200) -> None:
+        self.status_code = status_code
+        self.text = json.dumps(body)
+        self._body = body
+
+    def json(self) -> _t.Any:
+        return self._body
+
+
+class Bridge:
+    """A Bond bridge with one ceiling fan, recording the actions sent to it."""
+
+    def __init__(self) -> None:
+        self.device: dict[str, _t.Any] = {
+            "name": "Fan",
+            "type": "CF",
+            "actions": [
+                "TurnOn",
+                "TurnOff",
+                "SetSpeed",
+                "DecreaseSpeed",
+                "TurnLightOn",
+                "TurnLightOff",
+                "SetBrightness",
+            ],
+            "_": "d1",
+        }
+        self.state: dict[str, _t.Any] = {"power": 1, "speed": 2, "light": 1, "_": "s1"}
+        self.sent: list[tuple[str, dict[str, _t.Any]]] = []
+        self.reads = 0
+
+    async def send(self, executor: _t.Any, method: str, url: str, **kwargs: _t.Any) -> Response:
+        path = url.removeprefix(bond.BRIDGE.url)
+        if path == "/v2/devices/cf":
+            self.reads += 1
+            return Response(self.device)
+        if path == "/v2/devices/cf/state":
+            return Response(self.state)
+        if path.startswith("/v2/devices/cf/actions/"):
+            self.sent.append((path.rsplit("/", 1)[-1], kwargs.get("json", {})))
+            return Response({})
+        return Response({}, 404)
+
+
+@pytest.fixture
+def bridge(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> Bridge:
+    bridge = Bridge()
+    monkeypatch.setattr(bond.requests, "send", bridge.send)
+    monkeypatch.setattr(bond.BRIDGE.auth, "token", "test")
+    monkeypatch.setattr(bond.BRIDGE, "dedup", CommandDeduplicator("test", 0.0))
+    monkeypatch.setattr(bond, "STORE", StateStore(str(tmp_path / "state.json")))
+    for cache in ("_DEVICES", "_STATES", "_CAPABILITIES"):
+        monkeypatch.setattr(bond, cache, {})
+    return bridge
+
+
+def test_write_reads_are_not_shed_while_the_read_queue_is_full(
+    bridge: Bridge, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    c = AdmissionController(f"test-{next(NAMES)}", 2, 1, 1, 10.0)
+    monkeypatch.setattr(bond.BRIDGE, "admission", c)
+    bridge.state["light"] = 0
+
+    async def read() -> None:
+        async with c.slot(Priority.READ):
+            pass
+
+    async def main() -> None:
+        await c.acquire(Priority.READ)
+        queued = asyncio.create_task(read())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError):
+            await c.acquire(Priority.READ)
+
+        # light-on reads the capabilities and the state before it turns the light on
+        write = asyncio.create_task(routes.dispatch("light-on", "cf", {}))
+        await asyncio.sleep(0.01)
+        assert not write.done()
+        c.release()
+        await asyncio.wait_for(asyncio.gather(write, queued), 1.0)
+
+    asyncio.run(main())
+    assert bridge.sent == [("TurnLightOn", {})]
+
+
+def test_listed_actions_decide_support() -> None:
+    capabilities = bond.Capabilities("CF", frozenset({"TurnOn"}), 0.0)
+    assert capabilities.supports("TurnOn")
+    assert not capabilities.supports("TurnOff")
+
+
+def test_device_type_decides_support_without_a_list() -> None:
+    fireplace = bond.Capabilities("FP", frozenset(), 0.0)
+    assert fireplace.supports("TurnLightOn")
+    assert not fireplace.supports("SetSpeed")
+    # Actions not tied to a type, and devices of unknown type, are left to the bridge
+    assert fireplace.supports("Open")
+    assert bond.Capabilities(None, frozenset(), 0.0).supports("SetSpeed")
+
+
+def test_unsupported_action_is_rejected_without_sending_it(bridge: Bridge) -> None:
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(routes.dispatch("set-breeze", "cf", {"enabled": True}))
+    assert exc.value.status_code == 400
+    assert "SetBreeze" in exc.value.detail
+    asyncio.run(bond.check_action("cf", "TurnOn"))
+    # The capabilities were read once and cached
+    assert bridge.reads == 1 and bridge.sent == []
+
+
+def endpoint(path: str) -> _t.Callable[..., _t.Coroutine[_t.Any, _t.Any, None]]:
+    for route in routes.ROUTER.routes:
+        if isinstance(route, APIRoute) and route.path == f"/bond/devices/{{device_id}}/{path}":
+            return route.endpoint
+    raise LookupError(path)
+
+
+@pytest.mark.parametrize(
+    ("path", "args", "action"),
+    [
+        ("power-on", {}, ("TurnOn", {})),
+        ("power-off", {}, ("TurnOff", {})),
+        ("light-off", {}, ("TurnLightOff", {})),
+        ("set-speed/{speed}", {"speed": 3}, ("SetSpeed", {"argument": 3})),
+        # Decreasing from the lowest speed and a brightness of zero turn the device off
+        ("decrease-speed/{step}", {"step": 1}, ("TurnOff", {})),
+        ("set-brightness/{brightness}", {"brightness": 0}, ("TurnLightOff", {})),
+    ],
+)
+def test_action_routes_send_their_action(
+    bridge: Bridge, path: str, args: dict[str, _t.Any], action: tuple[str, dict[str, _t.Any]]
+) -> None:
+    bridge.state.update(speed=1, light=1)
+    asyncio.run(endpoint(path)(device_id="cf", **args))
+    assert bridge.sent == [action]
+
+
+def test_light_on_is_skipped_when_already_on(bridge: Bridge) -> None:
+    asyncio.run(endpoint("light-on")(device_id="cf"))
+    assert bridge.sent == []
+
+
+def test_invalid_arguments_are_rejected(bridge: Bridge) -> None:
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(routes.execute_action("cf", "set-speed", {"speed": "fast"}))
+    assert exc.value.status_code == 422
+    assert bridge.sent == []
+
+
+@pytest.mark.parametrize("payload", [{"dedup": False}, {"device_id": "other", "action": "X"}])
+def test_raw_action_body_is_the_payload(bridge: Bridge, payload: dict[str, _t.Any]) -> None:
+    asyncio.run(routes.execute_action("cf", "TurnOn", payload))
+    assert bridge.sent == [("TurnOn", payload)]
+
+
+def test_unknown_action_is_not_found(bridge: Bridge) -> None:
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(routes.execute_action("cf", "spin", None))
+    assert exc.value.status_code == 404
@@ -0,0 +1,118 @@
+import asyncio
+import math
+import typing as _t
+
+import pytest
+from fastapi import HTTPException
+
+from mkhome.bridges import bond, lutron
+from mkhome.settings import DEFAULT_BRIDGE
+
+
+class BondBridge:
+    """A Bond bridge that lists the devices paired with it."""
+
+    def __init__(self, name: str, *device_ids: str) -> None:
+        self.name = name
+        self.device_ids = list(device_ids)
+        self.listings = 0
+        self.up = True
+
+    def __str__(self) -> str:
+        return f"Bond {self.name} bridge"
+
+    async def list_devices(self) -> list[str]:
+        self.listings += 1
+        if not self.up:
+            raise TimeoutError
+        return list(self.device_ids)
+
+
+@pytest.fixture
+def bridges(monkeypatch: pytest.MonkeyPatch) -> dict[str, BondBridge]:
+    bridges = {
+        DEFAULT_BRIDGE: BondBridge(DEFAULT_BRIDGE, "fan1", "fan2"),
+        "upstairs": BondBridge("upstairs", "fan3"),
+    }
+    monkeypatch.setattr(bond, "BRIDGES", bridges)
+    monkeypatch.setattr(bond, "BRIDGE", bridges[DEFAULT_BRIDGE])
+    monkeypatch.setattr(bond, "ROUTES", {})
+    monkeypatch.setattr(bond, "_MISSES", {})
+    return bridges
+
+
+def route(device_id: str) -> _t.Any:
+    return asyncio.run(bond.route(device_id))
+
+
+def test_bond_routes_devices_to_their_bridge(bridges: dict[str, BondBridge]) -> None:
+    assert route("fan3") is bridges["upstairs"]
+    assert route("fan1") is bridges[DEFAULT_BRIDGE]
+    # One listing of every bridge routes all their devices
+    assert [bridge.listings for bridge in bridges.values()] == [1, 1]
+
+
+def test_bond_single_bridge_needs_no_lookup(
+    bridges: dict[str, BondBridge], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    default = bridges[DEFAULT_BRIDGE]
+    monkeypatch.setattr(bond, "BRIDGES", {DEFAULT_BRIDGE: default})
+    assert route("anything") is default
+    assert default.listings == 0
+
+
+def test_bond_get_devices_skips_an_unreachable_bridge(bridges: dict[str, BondBridge]) -> None:
+    bridges["upstairs"].up = False
+    assert asyncio.run(bond.get_devices()) == ["fan1", "fan2"]
+    bridges[DEFAULT_BRIDGE].up = False
+    with pytest.raises(TimeoutError):
+        asyncio.run(bond.get_devices())
+
+
+def test_bond_misses_are_cached_briefly(
+    bridges: dict[str, BondBridge], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc:
+            route("fan4")
+        assert exc.value.status_code == 404
+    assert bridges["upstairs"].listings == 1
+
+    # Paired since, and found once the miss expires
+    bridges["upstairs"].device_ids.append("fan4")
+    monkeypatch.setitem(bond._MISSES, "fan4", -math.inf)
+    assert route("fan4") is bridges["upstairs"]
+    assert bridges["upstairs"].listings == 2
+    assert "fan4" not in bond._MISSES
+
+
+def test_bond_expired_misses_are_dropped(
+    bridges: dict[str, BondBridge], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setitem(bond._MISSES, "gone", -math.inf)
+    with pytest.raises(HTTPException):
+        route("fan4")
+    assert list(bond._MISSES) == ["fan4"]
+
+
+@pytest.fixture
+def lutron_bridges(monkeypatch: pytest.MonkeyPatch) -> dict[str, _t.Any]:
+    bridges = {DEFAULT_BRIDGE: object(), "upstairs": object()}
+    monkeypatch.setattr(lutron, "BRIDGES", bridges)
+    return bridges
+
+
+@pytest.mark.parametrize(
+    ("qualified_id", "name", "local_id"),
+    [("12", DEFAULT_BRIDGE, "12"), ("upstairs:12", "upstairs", "12"), (12, DEFAULT_BRIDGE, "12")],
+)
+def test_lutron_routes_by_prefix(
+    lutron_bridges: dict[str, _t.Any], qualified_id: _t.Any, name: str, local_id: str
+) -> None:
+    assert lutron.route(qualified_id) == (lutron_bridges[name], local_id)
+
+
+def test_lutron_unknown_bridge_is_not_found(lutron_bridges: dict[str, _t.Any]) -> None:
+    with pytest.raises(HTTPException) as exc:
+        lutron.route("downstairs:12")
+    assert exc.value.status_code == 404
@@ -0,0 +1,110 @@
+import asyncio
+import pathlib
+import time
+import typing as _t
+
+import pytest
+
+from mkhome.automations import actions, rules
+from mkhome.bridges import lutron
+from mkhome.bus import BondStateChanged, EventBus
+from mkhome.settings import settings
+
+
+class Runs:
+    def __init__(self) -> None:
+        self.devices: list[str] = []
+
+    async def __call__(self, device: str, steps: _t.Any, pause: float = 0.0) -> None:
+        self.devices.append(device)
+
+
+@pytest.fixture
+def runs(monkeypatch: pytest.MonkeyPatch) -> Runs:
+    runs = Runs()
+    monkeypatch.setattr(actions, "run", runs)
+    monkeypatch.setattr(actions, "_DEVICE_IDS", {"fan": "fan", "lamp": "lamp"})
+    return runs
+
+
+def install(monkeypatch: pytest.MonkeyPatch, *specs: dict[str, _t.Any]) -> None:
+    config = rules.RulesFile.model_validate({"rules": list(specs)})
+    monkeypatch.setattr(rules, "TABLE", asyncio.run(rules.compile_rules(config)))
+
+
+def changed(device_id: str) -> BondStateChanged:
+    return BondStateChanged(device_id=device_id, state={"light": 1})
+
+
+def test_rule_ignores_its_own_state_change(runs: Runs, monkeypatch: pytest.MonkeyPatch) -> None:
+    install(
+        monkeypatch,
+        {
+            "name": "echo",
+            "trigger": {"source": "bond", "device": "fan"},
+            "device": "fan",
+            "actions": "toggle_light",
+        },
+    )
+    asyncio.run(rules.dispatch(changed("fan")))
+    asyncio.run(rules.dispatch(changed("fan")))
+    assert runs.devices == ["fan"]
+
+    (compiled,) = rules.TABLE[("bond", "fan")]
+    compiled.acted = time.monotonic() - rules.SELF_TRIGGER_WINDOW
+    asyncio.run(rules.dispatch(changed("fan")))
+    assert runs.devices == ["fan", "fan"]
+
+
+def test_rule_on_other_device_fires_every_time(runs: Runs, monkeypatch: pytest.MonkeyPatch) -> None:
+    install(
+        monkeypatch,
+        {
+            "name": "follow",
+            "trigger": {"source": "bond", "device": "fan"},
+            "device": "lamp",
+            "actions": "light_on",
+        },
+    )
+    asyncio.run(rules.dispatch(changed("fan")))
+    asyncio.run(rules.dispatch(changed("fan")))
+    assert runs.devices == ["lamp", "lamp"]
+
+
+@pytest.mark.parametrize("content", ["rules: [\n  - name: unclosed\n", "rules: [{name: 1}]\n"])
+def test_startup_survives_invalid_file(
+    content: str, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "rules.yaml"
+    path.write_text(content)
+    monkeypatch.setattr(settings.application_settings, "rules_file", str(path))
+    monkeypatch.setattr(settings.application_settings, "bindings_watch_interval", 0.0)
+    monkeypatch.setattr(rules, "BUS", EventBus())
+    monkeypatch.setattr(rules, "TABLE", {})
+
+    async def main() -> None:
+        await rules.startup()
+        await rules.shutdown()
+
+    asyncio.run(main())
+    assert rules.TABLE == {}
+
+
+def test_bindings_and_rules_share_a_button(monkeypatch: pytest.MonkeyPatch) -> None:
+    subscribers: list[tuple[str, _t.Callable[[str], None]]] = []
+    monkeypatch.setattr(lutron, "HANDLERS", {})
+    monkeypatch.setattr(lutron, "BUTTONS", {})
+    monkeypatch.setattr(
+        lutron.BRIDGE.client,
+        "add_button_subscriber",
+        lambda button_id, callback: subscribers.append((button_id, callback)),
+    )
+
+    async def main() -> list[int]:
+        lutron.watch_button("990", "bindings")
+        lutron.watch_button("990", rules.BINDING)
+        ((_, callback),) = subscribers
+        callback("Press")
+        return [handler._click_count for handler in lutron.BUTTONS["990"]]
+
+    assert asyncio.run(main()) == [1, 1]
@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+import pathlib
+import time
+import typing as _t
+
+import pytest
+
+from mkhome.automations import actions
+from mkhome.automations.scheduler import Cron, Interval, Job, Once, Scheduler, Solar
+from mkhome.bridges import lutron
+from mkhome.settings import settings
+from mkhome.utils.schedules import sun_times
+
+
+class Runs:
+    def __init__(self) -> None:
+        self.devices: list[str] = []
+
+    async def __call__(self, device: str, steps: _t.Any, pause: float = 0.0) -> None:
+        self.devices.append(device)
+
+
+@pytest.fixture
+def runs(monkeypatch: pytest.MonkeyPatch) -> Runs:
+    runs = Runs()
+    monkeypatch.setattr(actions, "run", runs)
+    monkeypatch.setattr(lutron, "GATE", lutron.DispatchGate())
+    return runs
+
+
+def job(name: str, trigger: _t.Any, **fields: _t.Any) -> Job:
+    return Job(name=name, trigger=trigger, device=name, actions="light_on", **fields)
+
+
+def once(delay: float) -> Once:
+    return Once(at=datetime.datetime.fromtimestamp(time.time() + delay))
+
+
+def test_runs_in_due_order(runs: Runs, tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        s = Scheduler(str(tmp_path / "schedule.json"))
+        await s.startup()
+        for j in (job("c", once(0.15)), job("a", once(0.05)), job("b", once(0.1))):
+            await s.add(j)
+        await asyncio.sleep(0.3)
+        await s.shutdown()
+
+    asyncio.run(main())
+    assert runs.devices == ["a", "b", "c"]
+
+
+def test_rescheduled_job_runs_at_new_time(runs: Runs, tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        s = Scheduler(str(tmp_path / "schedule.json"))
+        await s.startup()
+        first = await s.add(job("first", once(0.1)))
+        await s.add(job("second", once(0.15)))
+        # The stale heap entry for `first` must be skipped, not run
+        await s.add(first.model_copy(update={"trigger": once(0.25)}))
+        await asyncio.sleep(0.35)
+        await s.shutdown()
+
+    asyncio.run(main())
+    assert runs.devices == ["second", "first"]
+
+
+def test_misfired_run_is_skipped(runs: Runs, tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        s = Scheduler(str(tmp_path / "schedule.json"))
+        late = job("late", Interval(every=3600), misfire_grace=10)
+        s._fire(late, time.time() - 60)
+        await asyncio.sleep(0)
+        assert late.next_after(time.time()) == s.next_due(late.id)
+
+    asyncio.run(main())
+    assert runs.devices == []
+
+
+def test_catch_up_missed_run() -> None:
+    now = time.time()
+    created = now - 1000
+    hourly = job("hourly", Interval(every=300), created=created, last_run=created + 300)
+    # Runs were due at +600 and +900; the first missed one is caught up on
+    assert hourly.first_due(now) == created + 600
+
+
+def test_catch_up_disabled_or_too_late() -> None:
+    now = time.time()
+    created = now - 1000
+    skipped = job("skipped", Interval(every=300), created=created, catch_up=False)
+    assert skipped.first_due(now) == created + 1200
+    stale = job("stale", Interval(every=300), created=created, misfire_grace=60)
+    assert stale.first_due(now) == created + 1200
+
+
+def test_once_in_the_past_never_runs() -> None:
+    past = job("past", once(-60), created=time.time() - 120, last_run=time.time() - 30)
+    assert past.first_due(time.time()) is None
+
+
+def test_cron_trigger_expansion() -> None:
+    start = datetime.datetime(2024, 3, 1, 7, 0).timestamp()
+    assert Cron(cron="30 6 * * 1-5").next_after(start) == (
+        datetime.datetime(2024, 3, 4, 6, 30).timestamp()
+    )
+
+
+def test_solar_trigger_expansion(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.application_settings, "latitude", 51.5)
+    monkeypatch.setattr(settings.application_settings, "longitude", -0.13)
+    trigger = Solar(event="sunset", offset=-1800)
+    noon = datetime.datetime(2024, 6, 21, 12, 0, tzinfo=datetime.UTC).timestamp()
+    _, sunset = sun_times(datetime.date(2024, 6, 21), 51.5, -0.13)
+    assert sunset is not None
+    assert trigger.next_after(noon) == sunset.timestamp() - 1800
+    # Once today's has passed, the next is tomorrow's
+    _, tomorrow = sun_times(datetime.date(2024, 6, 22), 51.5, -0.13)
+    assert tomorrow is not None
+    assert trigger.next_after(sunset.timestamp()) == tomorrow.timestamp() - 1800
+
+
+def test_solar_trigger_needs_location(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.application_settings, "latitude", None)
+    with pytest.raises(ValueError):
+        Solar(event="sunrise").next_after(time.time())
@@ -0,0 +1,67 @@
+import datetime
+
+import pytest
+
+from mkhome.utils.schedules import CronExpression, sun_times
+
+
+at = datetime.datetime
+
+
+@pytest.mark.parametrize(
+    ("expression", "after", "expected"),
+    [
+        ("*/15 * * * *", at(2024, 3, 1, 10, 7, 30), at(2024, 3, 1, 10, 15)),
+        ("0 * * * *", at(2024, 3, 1, 10, 0), at(2024, 3, 1, 11, 0)),
+        # Friday evening to Monday morning
+        ("30 6 * * 1-5", at(2024, 3, 1, 7, 0), at(2024, 3, 4, 6, 30)),
+        ("0 0 * * 7", at(2024, 3, 1, 0, 0), at(2024, 3, 3, 0, 0)),
+        ("0 12 1,15 * *", at(2024, 3, 2, 0, 0), at(2024, 3, 15, 12, 0)),
+        ("0 0 29 2 *", at(2024, 3, 1, 0, 0), at(2028, 2, 29, 0, 0)),
+        ("0 23 31 12 *", at(2024, 12, 31, 23, 30), at(2025, 12, 31, 23, 0)),
+    ],
+)
+def test_next_after(expression: str, after: datetime.datetime, expected: datetime.datetime) -> None:
+    assert CronExpression(expression).next_after(after) == expected
+
+
+def test_day_of_month_or_day_of_week() -> None:
+    # The 13th of the month or any Friday, whichever comes first
+    expression = CronExpression("0 0 13 * 5")
+    assert expression.next_after(at(2024, 3, 2, 0, 0)) == at(2024, 3, 8, 0, 0)
+    assert expression.next_after(at(2024, 3, 9, 0, 0)) == at(2024, 3, 13, 0, 0)
+
+
+def test_expansion_is_consecutive() -> None:
+    expression = CronExpression("0,30 8-9 * * *")
+    runs, current = [], at(2024, 3, 1, 0, 0)
+    for _ in range(5):
+        current = expression.next_after(current)
+        runs.append(current.strftime("%d %H:%M"))
+    assert runs == ["01 08:00", "01 08:30", "01 09:00", "01 09:30", "02 08:00"]
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "5-1 * * * *", "*/0 * * * *"])
+def test_invalid_expression(expression: str) -> None:
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_never_matches() -> None:
+    with pytest.raises(ValueError):
+        CronExpression("0 0 31 2 *").next_after(at(2024, 1, 1, 0, 0))
+
+
+def test_sun_times_london_midsummer() -> None:
+    sunrise, sunset = sun_times(datetime.date(2024, 6, 21), 51.5, -0.13)
+    assert sunrise is not None and sunset is not None
+    # 04:43 and 21:21 BST
+    expected_sunrise = datetime.datetime(2024, 6, 21, 3, 43, tzinfo=datetime.UTC)
+    expected_sunset = datetime.datetime(2024, 6, 21, 20, 21, tzinfo=datetime.UTC)
+    assert abs(sunrise - expected_sunrise) < datetime.timedelta(minutes=3)
+    assert abs(sunset - expected_sunset) < datetime.timedelta(minutes=3)
+
+
+def test_sun_times_polar() -> None:
+    assert sun_times(datetime.date(2024, 6, 21), 78.2, 15.6) == (None, None)
+    assert sun_times(datetime.date(2024, 12, 21), 78.2, 15.6) == (None, None)
@@ -0,0 +1,90 @@
+import os
+import socket
+import sys
+import typing as _t
+
+import pytest
+
+from mkhome import supervisor
+from mkhome.supervisor import Supervisor
+
+
+SERVER = """
+import os, sys, time
+ready = os.environ.get("MKHOME_READY_FILE")
+if ready and sys.argv[1] == "fail":
+    sys.exit(1)
+if ready:
+    with open(ready, "a") as f:
+        f.write(f"{os.getpid()}\\n")
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def sock() -> _t.Iterator[socket.socket]:
+    with socket.create_server(("127.0.0.1", 0)) as s:
+        s.set_inheritable(True)
+        yield s
+
+
+def fake_server(monkeypatch: pytest.MonkeyPatch, mode: str) -> None:
+    monkeypatch.setattr(
+        supervisor, "uvicorn_command", lambda *args: [sys.executable, "-c", SERVER, mode]
+    )
+    monkeypatch.setattr(supervisor, "POLL_INTERVAL", 0.01)
+
+
+def test_handoff_retires_the_server_once_the_successor_is_ready(
+    monkeypatch: pytest.MonkeyPatch, sock: socket.socket
+) -> None:
+    fake_server(monkeypatch, "ok")
+    sup = Supervisor(sock)
+    server = sup.spawn()
+    try:
+        successor = sup.handoff(server)
+        assert successor is not server
+        assert server.returncode is not None
+        assert successor.poll() is None
+    finally:
+        for proc in (server, successor):
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def test_handoff_keeps_the_server_if_the_successor_fails(
+    monkeypatch: pytest.MonkeyPatch, sock: socket.socket
+) -> None:
+    fake_server(monkeypatch, "fail")
+    sup = Supervisor(sock)
+    server = sup.spawn()
+    try:
+        assert sup.handoff(server) is server
+        assert server.poll() is None
+    finally:
+        server.kill()
+        server.wait()
+
+
+def test_servers_know_their_supervisor(
+    monkeypatch: pytest.MonkeyPatch, sock: socket.socket
+) -> None:
+    commands: list[tuple[str, ...]] = []
+
+    def uvicorn_command(*args: str) -> list[str]:
+        commands.append(args)
+        return []
+
+    monkeypatch.setattr(supervisor, "uvicorn_command", uvicorn_command)
+    environments: list[dict[str, str]] = []
+
+    def popen(cmd: list[str], pass_fds: tuple[int, ...], env: dict[str, str]) -> None:
+        assert pass_fds == (sock.fileno(),)
+        environments.append(env)
+
+    monkeypatch.setattr(supervisor.subprocess, "Popen", popen)
+    Supervisor(sock).spawn()
+
+    assert commands == [("--fd", str(sock.fileno()))]
+    assert environments[0][supervisor.SUPERVISOR_ENV] == str(os.getpid())